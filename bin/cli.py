@@ -2,14 +2,15 @@
 
 import argparse
 from collections import namedtuple
+import importlib
+import sys
 
-from esprov.functions import \
-    fetch, list_stages, index, \
-    INDEX_OPERATION_NAMES, LIST_STAGES_TIMESPANS
+from esprov.options import \
+    INDEX_OPERATION_NAMES, LINEAGE_DIRECTIONS, LIST_STAGES_TIMESPANS
 
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-10"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -29,6 +30,23 @@ Argument.__new__.__defaults__ = (None, ) * len(Argument._fields)
 # TODO: write tests around the help texts, descriptions, and error conditions.
 
 
+class _LazyFunction(object):
+    """ CLI function that's imported only when it's called. """
+
+    def __init__(self, path):
+        """
+        :param str path: module and name of function, as module:name
+        """
+        self.module_name, _, self.__name__ = path.partition(":")
+
+
+    def __call__(self, es_client, args):
+        function = getattr(importlib.import_module(self.module_name),
+                           self.__name__)
+        return function(es_client, args)
+
+
+
 class _Subparser(object):
     """ Argument parser for specific CLI function """
 
@@ -36,15 +54,18 @@ class _Subparser(object):
         """
         Function, argument names, and description define a CLI subparser.
 
-        :param callable function: CLI subcommand/program/function to
-            invoke as a result of a command
+        :param callable | str function: CLI subcommand/program/function to
+            invoke as a result of a command, or its module and name, as
+            module:name, to defer its import until it's invoked
         :param collections.abc.Iterable(str) argument_names: names of
             arguments that the given function accepts
-        :param str description: subcommand functional description, optional;
-            if absent, description will be created from parsing the
-            function's __doc__ attribute
+        :param str description: subcommand functional description; optional
+            for a function given as a callable, if absent, description will
+            be created from parsing the function's __doc__ attribute
         """
         # TODO: test the derivation from __doc__ of the description/help.
+        if not callable(function):
+            function = _LazyFunction(function)
         self.function = function
         self.argument_names = argument_names
         # Describe the
@@ -81,7 +102,23 @@ class CLIFactory(object):
         # Arguments shared but valid only for SOME CLI functions
         "doctype": Argument(
                 flags=("--doctype", ),
-                help="Document type to query"
+                help="Document type to query; several may be given, "
+                     "comma-separated, to look up each"
+        ),
+        "instances": Argument(
+                flags=("--instances", ),
+                help="Path to file of instance IDs, one per line, "
+                     "to look up each"
+        ),
+        "document": Argument(
+                flags=("--document", ),
+                help="Document ID(s) to which to restrict results, "
+                     "comma-separated"
+        ),
+        "namespace": Argument(
+                flags=("--namespace", ),
+                help="Namespace of instance to which to restrict results, "
+                     "e.g. code"
         ),
         "duplicate": Argument(
                 flags=("--duplicate", ),
@@ -89,6 +126,47 @@ class CLIFactory(object):
                 action="store_true"
         ),
 
+        "fields": Argument(
+                flags=("--fields", ),
+                help="Comma-separated names of the fields of each record "
+                     "to produce, e.g. instance,@timestamp"
+        ),
+        "parallel": Argument(
+                flags=("--parallel", ),
+                help="Number of slices in which to scan all hits at once; "
+                     "best no more than the number of shards searched",
+                type=int
+        ),
+        "cache": Argument(
+                flags=("--cache", ),
+                help="Serve result from local cache (in ESPROV_CACHE_DIR, "
+                     "default ~/.esprov/cache) if indices are unchanged, "
+                     "or for lineage, if no new edges extend it; a lineage "
+                     "is traced, and cached, only to --depth",
+                action="store_true"
+        ),
+        "count": Argument(
+                flags=("--count", ),
+                help="Report only the number of matches",
+                action="store_true"
+        ),
+        "exists": Argument(
+                flags=("--exists", ),
+                help="Report only whether there's any match",
+                action="store_true"
+        ),
+        "ordered": Argument(
+                flags=("--ordered", ),
+                help="Produce hits in time order, paging with a cursor "
+                     "rather than holding a scroll open",
+                action="store_true"
+        ),
+        "cursor": Argument(
+                flags=("--cursor", ),
+                help="Resume ordered hits after the one that this cursor, "
+                     "as produced last by a previous call, denotes"
+        ),
+
         # 'list_stages' family of arguments
         # Time lags are specified acc. to Elasticsearch format & "date math":
         # https://www.elastic.co/guide/en/elasticsearch/reference/current/
@@ -117,6 +195,12 @@ class CLIFactory(object):
                 help="Integer number of minutes of lag",
                 type=int
         ),
+        "stats": Argument(
+                flags=("--stats", ),
+                help="Report record count and first and last times seen "
+                     "for each distinct stage",
+                action="store_true"
+        ),
         "id": Argument(
                 flags=("--id", ),
                 help="Only report activity/stage ID, not full document",
@@ -136,33 +220,174 @@ class CLIFactory(object):
                 help="Name of Elasticsearch Index for Index operation"
         ),
 
+        # Arguments relevant to the 'lineage' subcommand
+        "direction": Argument(
+                flags=("direction", ),
+                help="Whether to trace what the instance(s) derive from "
+                     "(upstream) or what derives from them (downstream)",
+                choices=list(LINEAGE_DIRECTIONS)
+        ),
+        "instance": Argument(
+                flags=("instance", ),
+                help="ID(s) of instance(s) from which to trace, "
+                     "comma-separated"
+        ),
+        "depth": Argument(
+                flags=("--depth", ),
+                help="Maximum number of relationships to follow in sequence",
+                type=int
+        ),
+        "fanout": Argument(
+                flags=("--fanout", ),
+                help="Maximum number of neighbors to follow from any one "
+                     "instance",
+                type=int
+        ),
+        "relations": Argument(
+                flags=("--relations", ),
+                help="Relationship types to follow, comma-separated "
+                     "(default used,wasGeneratedBy,wasInfluencedBy,"
+                     "hadMember)"
+        ),
+
+        # Arguments relevant to the 'load' subcommand
+        "path": Argument(
+                flags=("path", ),
+                help="Path to JSON-lines file of provda records, e.g. "
+                     "the logstash 'file' output"
+        ),
+        "load_index": Argument(
+                # Loading needs a concrete target rather than '_all'.
+                flags=("-i", "--index"),
+                help="Index into which to load records; if omitted, "
+                     "records are routed to daily partitions by timestamp"
+        ),
+        "chunk_size": Argument(
+                flags=("--chunk_size", ),
+                help="Number of records per bulk request",
+                type=int
+        ),
+        "workers": Argument(
+                flags=("--workers", ),
+                help="Number of processes among which to shard the file",
+                type=int
+        ),
+
+        # Arguments relevant to the 'collect' subcommand
+        "listen_host": Argument(
+                flags=("--listen_host", ),
+                help="Address on which to accept records (default 0.0.0.0)"
+        ),
+        "listen_port": Argument(
+                flags=("--listen_port", ),
+                help="Port on which to accept records (default 5000)",
+                type=int
+        ),
+        "batch_size": Argument(
+                flags=("--batch_size", ),
+                help="Maximum number of records per bulk request",
+                type=int
+        ),
+        "flush_interval": Argument(
+                flags=("--flush_interval", ),
+                help="Maximum seconds to hold a partial batch",
+                type=float
+        ),
+        "max_pending": Argument(
+                flags=("--max_pending", ),
+                help="Maximum number of records awaiting storage before "
+                     "reading from senders pauses",
+                type=int
+        ),
+        "spool_dir": Argument(
+                flags=("--spool_dir", ),
+                help="Folder in which to durably spool records until "
+                     "they're stored"
+        ),
+
+        # Arguments relevant to the 'serve' subcommand
+        "socket": Argument(
+                flags=("--socket", ),
+                help="Path of Unix socket on which to serve (default "
+                     "ESPROV_SOCKET, or else ~/.esprov/esprov.sock)"
+        ),
+
     }
 
     # Shared and valid for all CLI functions
     BASE_ARGS = ("index", "num_docs")
 
+    # Valid for CLI functions that search for records
+    ORDERING_ARGS = ("ordered", "cursor")
+    RESULT_MODE_ARGS = ("count", "exists", "cache")
+
     # There should be a subparser for each CLI function that is supported.
     subparsers = (
         _Subparser(
                 # Document type (in provenance model) is a
                 # valid filter for the 'fetch' subcommand.
-                fetch,
-                argument_names=BASE_ARGS + ("doctype", )
+                "esprov.functions:fetch",
+                description="Perform Elasticsearch TERM-level query, "
+                            "fetching matching documents.",
+                argument_names=
+                BASE_ARGS + ("doctype", "instances", "document", "namespace",
+                             "fields", "parallel") +
+                ORDERING_ARGS + RESULT_MODE_ARGS
         ),
         _Subparser(
                 # Document ID and whether or nor to retain duplicate
                 # documents in the result(s) are valid additional
                 # arguments for the 'list_stages' subcommand.
-                list_stages,
+                "esprov.functions:list_stages",
+                description="Use given client to query Elasticsearch for "
+                            "documents",
                 argument_names=
-                ("duplicate", "id") + BASE_ARGS + LIST_STAGES_TIMESPANS
+                ("duplicate", "id", "fields", "stats", "namespace") +
+                BASE_ARGS + LIST_STAGES_TIMESPANS +
+                ORDERING_ARGS + RESULT_MODE_ARGS
         ),
         _Subparser(
                 # The name of the operation to perform and the name of the
                 # index on/in which to perform it are REQUIRED arguments
                 # for the 'index' subcommand.
-                index,
+                "esprov.functions:index",
+                description="Perform Elasticsearch Index-related",
                 argument_names=("index_operation", "index_target"),
+        ),
+        _Subparser(
+                # Direction and starting instance(s) are required; limits
+                # and relationship types to follow are optional.
+                "esprov.functions:lineage",
+                description="Trace what instances derive from, or what "
+                            "derives from them.",
+                argument_names=
+                ("direction", "instance", "depth", "fanout", "relations",
+                 "cache") + BASE_ARGS
+        ),
+        _Subparser(
+                # Path to the records file is required; target index,
+                # bulk request size, and process count are optional.
+                "esprov.functions:load",
+                description="Bulk-load a JSON-lines file of provda records "
+                            "into an index.",
+                argument_names=("path", "load_index", "chunk_size", "workers")
+        ),
+        _Subparser(
+                # Listening address, target index, batching
+                # parameters, and spool location are all optional.
+                "esprov.functions:collect",
+                description="Receive provda records over TCP and store "
+                            "them, in place of logstash.",
+                argument_names=("listen_host", "listen_port", "load_index",
+                                "batch_size", "flush_interval", "max_pending",
+                                "spool_dir")
+        ),
+        _Subparser(
+                # Socket location is optional.
+                "esprov.daemon:serve",
+                description="Serve CLI queries over a Unix socket until "
+                            "interrupted or terminated.",
+                argument_names=("socket", )
         )
     )
 
@@ -210,3 +435,50 @@ class CLIFactory(object):
             sp.set_defaults(func=subparser.function)
 
         return parser
+
+
+
+def main(argv=None):
+    """
+    Run a CLI command: esprov <subcommand> <flags/options>
+
+    Arguments are parsed here, so that help and argument errors are
+    reported by this process. Then a command that a running server
+    ('esprov serve') answers is forwarded to it; otherwise, it's run
+    in-process. Only then are the Elasticsearch libraries imported, so that
+    --help and argument errors are quick.
+
+    :param list[str] argv: command-line arguments, less the program name;
+        those of this process by default
+    :return int: exit status
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # Parsing is cheap, so help and argument errors are always handled here.
+    args = CLIFactory.get_parser().parse_args(argv)
+
+    from esprov.daemon import forward, result_lines, SERVED_SUBCOMMANDS
+    # Hand the command to a running server, if there is one, before paying
+    # for the imports and connections it already has.
+    if args.subcommand in SERVED_SUBCOMMANDS:
+        status = forward(argv)
+        if status is not None:
+            return status
+
+    from esprov import setup_logger
+    from esprov.client import shared_client
+    logger = setup_logger()
+    logger.info("Args: {}".format(args))
+
+    # Connection settings come from the config file (see esprov.client).
+    es_client = shared_client()
+
+    logger.info("Querying elasticsearch...")
+    for line in result_lines(args.func(es_client, args)):
+        print(line)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
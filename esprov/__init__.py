@@ -4,7 +4,7 @@ import logging
 import sys
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-19"
+__modified__ = "2026-10-18"
 __modname__ = "esprov.esprov.__init__"
 
 
@@ -15,7 +15,16 @@ LOGGING_MESSAGE_FORMAT = \
 
 
 def setup_logger():
+    """
+    Have the package's messages logged to standard output. This is for the
+    CLI to call; a library user's own logging configuration is left alone.
+
+    :return logging.Logger: the package's logger, configured
+    """
     logger = logging.getLogger(__modname__.split(".")[-2])
+    if logger.handlers:
+        # Already configured, e.g. by an earlier run within this process.
+        return logger
     logger.propagate = False
     logger.setLevel(LOGGING_LEVEL)
     handler = logging.StreamHandler(sys.stdout)
@@ -25,12 +34,12 @@ def setup_logger():
     return logger
 
 
-LOGGER = setup_logger()
+# Importing the package has no side effect on logging configuration.
+LOGGER = logging.getLogger(__modname__.split(".")[-2])
 
 
-# TODO: allow these to be configurable, favoring filepath (like airflow.cfg).
-# TODO: user should be able to set these once, not need to do so for each call.
-# Connect to Elasticsearch.
+# Default Elasticsearch node; connection settings, including hosts, are
+# configurable via a config file (see esprov.client).
 HOST = "localhost"
 PORT = 9200
 
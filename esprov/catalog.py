@@ -0,0 +1,214 @@
+""" Cached catalog of the indices (and their aliases) known to a cluster.
+
+Validating an index expression against the cluster means fetching every
+index and alias, which on a cluster with thousands of daily partitions is
+a large and slow response. The catalog fetches that once, keeps it for a
+time-to-live, optionally persists it on disk so that successive CLI runs
+share it, and resolves names, wildcards and aliases locally. It's refreshed
+lazily: when it expires, when an expression matches nothing in it, or after
+it's been invalidated by an operation that creates or deletes an index.
+
+"""
+
+import fnmatch
+import json
+import logging
+import os
+import time
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.catalog"
+
+
+__all__ = ["IndexCatalog", "index_catalog"]
+
+
+# Seconds for which a fetched catalog is trusted
+DEFAULT_TTL = 300
+
+# Environment variable naming the file in which to persist the catalog
+CATALOG_PATH_VARNAME = "ESPROV_CATALOG_PATH"
+
+# Expressions that denote every index
+ALL_INDICES_EXPRESSIONS = {"_all", "*"}
+
+# Attribute of a client in which its catalog is kept, so that the catalog
+# lasts exactly as long as the client
+CATALOG_ATTRIBUTE = "_esprov_catalog"
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def index_catalog(es_client):
+    """
+    Get the catalog for a client, creating it on first use. The catalog is
+    persisted to the file named by the ESPROV_CATALOG_PATH environment
+    variable, if it's set.
+
+    :param elasticsearch.client.Elasticsearch es_client: client for the
+        cluster whose indices to catalog
+    :return IndexCatalog: catalog shared by all uses of the client
+    """
+    catalog = getattr(es_client, CATALOG_ATTRIBUTE, None)
+    if catalog is None:
+        catalog = IndexCatalog(
+                es_client, path=os.environ.get(CATALOG_PATH_VARNAME))
+        setattr(es_client, CATALOG_ATTRIBUTE, catalog)
+    return catalog
+
+
+
+class IndexCatalog(object):
+    """ Indices and aliases of a cluster, resolved without a request. """
+
+    def __init__(self, es_client, ttl=DEFAULT_TTL, path=None):
+        """
+        Client, time-to-live, and optional file path define a catalog.
+
+        :param elasticsearch.client.Elasticsearch es_client: client for the
+            cluster whose indices to catalog
+        :param int | float ttl: seconds for which fetched catalog is trusted
+        :param str path: path to file in which to persist the catalog;
+            optional, if omitted the catalog lasts only as long as the process
+        """
+        self.es_client = es_client
+        self.ttl = ttl
+        self.path = path
+        self._aliases_by_index = None
+        self._fetched = None
+        self._refreshes = 0
+
+
+    @property
+    def stale(self):
+        """
+        Determine whether the catalog needs to be fetched again.
+
+        :return bool: whether the catalog is absent or expired
+        """
+        return self._fetched is None or \
+            time.time() - self._fetched > self.ttl
+
+
+    def indices(self):
+        """
+        Get the cataloged indices, from memory, disk, or the cluster,
+        whichever is the first to have a catalog that's not stale.
+
+        :return dict[str, list[str]]: aliases by index name
+        """
+        if self.stale:
+            self._load()
+        if self.stale:
+            self.refresh()
+        return self._aliases_by_index
+
+
+    def refresh(self):
+        """ Fetch the catalog from the cluster, persisting it if possible. """
+        LOGGER.debug("Fetching index catalog")
+        response = self.es_client.indices.get_alias()
+        self._aliases_by_index = {
+            name: sorted(data.get("aliases", {}))
+            for name, data in response.items()
+        }
+        self._fetched = time.time()
+        self._refreshes += 1
+        self._save()
+
+
+    def invalidate(self):
+        """ Discard the catalog so that it's fetched again when next used. """
+        self._aliases_by_index = None
+        self._fetched = None
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+    def resolve(self, expression):
+        """
+        Determine the indices that an index expression denotes. An
+        expression is a comma-separated sequence of names, aliases, or
+        wildcard patterns, each prefixed with '-' to exclude rather than
+        include what it matches. If the expression matches nothing, the
+        catalog is refreshed (unless it was just fetched) in case an index
+        is new.
+
+        :param str expression: index expression, as for a search
+        :return set[str]: names of indices that the expression denotes
+        """
+        refreshes = self._refreshes
+        matched = self._resolve(expression, self.indices())
+        if not matched and self._refreshes == refreshes:
+            self.refresh()
+            matched = self._resolve(expression, self._aliases_by_index)
+        return matched
+
+
+    def _resolve(self, expression, aliases_by_index):
+        matched = set()
+        for part in expression.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            exclude = part.startswith("-")
+            pattern = part[1:] if exclude else part
+            if pattern in ALL_INDICES_EXPRESSIONS:
+                names = set(aliases_by_index)
+            else:
+                names = {
+                    index for index, aliases in aliases_by_index.items()
+                    if any(fnmatch.fnmatchcase(name, pattern)
+                           for name in [index] + list(aliases))
+                }
+            matched = matched - names if exclude else matched | names
+        return matched
+
+
+    def _cluster(self):
+        # Identify the cluster so that a persisted catalog isn't mistaken
+        # for that of another cluster.
+        try:
+            return json.dumps(self.es_client.transport.hosts, sort_keys=True)
+        except AttributeError:
+            return None
+
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r') as catalog_file:
+                data = json.load(catalog_file)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get("cluster") != self._cluster():
+            return
+        self._aliases_by_index = data["indices"]
+        self._fetched = data["fetched"]
+
+
+    def _save(self):
+        if self.path is None:
+            return
+        folder = os.path.dirname(self.path)
+        try:
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            temp_path = "{}.tmp".format(self.path)
+            with open(temp_path, 'w') as catalog_file:
+                json.dump({"cluster": self._cluster(),
+                           "fetched": self._fetched,
+                           "indices": self._aliases_by_index}, catalog_file)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError) as e:
+            LOGGER.warning("Couldn't persist index catalog to %s: %s",
+                           self.path, e)
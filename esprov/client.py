@@ -0,0 +1,196 @@
+""" Configured, connection-pooled Elasticsearch clients.
+
+Connection settings are read once from a config file, so that they needn't
+be given with each call: the file named by the ESPROV_CONFIG environment
+variable, or ~/.esprov/esprov.cfg. Its [elasticsearch] section may set:
+
+    [elasticsearch]
+    # Seed nodes, comma-separated host[:port]
+    hosts = es1.example.org:9200, es2.example.org:9200
+    # Persistent (keep-alive) connections pooled per node
+    maxsize = 25
+    # Seconds to await a response
+    timeout = 30
+    # Retry a timed-out request on another node, up to max_retries times
+    retry_on_timeout = true
+    max_retries = 3
+    # Gzip request bodies, and accept gzipped responses
+    compress = true
+
+Any setting that's absent takes its default, e.g. a single node at
+localhost:9200. Large bulk loads and scans are network-bound; compression
+shrinks the JSON they exchange several-fold, and a pool large enough for
+the threads in use (e.g. collector or sliced-scan workers) avoids opening
+a connection per request.
+
+"""
+
+import logging
+import os
+import zlib
+
+try:
+    from configparser import ConfigParser
+except ImportError:
+    from ConfigParser import SafeConfigParser as ConfigParser
+
+from elasticsearch import Elasticsearch, Urllib3HttpConnection
+
+from esprov import HOST, PORT
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.client"
+
+
+__all__ = ["CompressedConnection", "make_client", "parse_hosts",
+           "read_config", "shared_client"]
+
+
+# Environment variable naming the config file, and its default
+CONFIG_PATH_VARNAME = "ESPROV_CONFIG"
+DEFAULT_CONFIG_PATH = os.path.join("~", ".esprov", "esprov.cfg")
+
+# Section of config file with connection settings
+CONFIG_SECTION = "elasticsearch"
+
+# Connection settings absent a config file
+DEFAULT_SETTINGS = {
+    "hosts": "{}:{}".format(HOST, PORT),
+    "maxsize": 10,
+    "timeout": 10,
+    "retry_on_timeout": False,
+    "max_retries": 3,
+    "compress": False
+}
+
+# Request bodies smaller than this aren't worth compressing.
+MIN_COMPRESSED_BYTES = 1024
+
+LOGGER = logging.getLogger(__modname__)
+
+_SHARED_CLIENT = None
+
+
+
+def read_config(path=None):
+    """
+    Read connection settings, falling back to defaults for those absent.
+
+    :param str path: path to config file; optional, by default that named
+        by ESPROV_CONFIG or else ~/.esprov/esprov.cfg; need not exist
+    :return dict: connection settings
+    :raises ValueError: if a setting's value isn't of the right type
+    """
+    path = path or os.environ.get(CONFIG_PATH_VARNAME, DEFAULT_CONFIG_PATH)
+    path = os.path.expanduser(path)
+    settings = dict(DEFAULT_SETTINGS)
+    parser = ConfigParser()
+    if not parser.read(path) or not parser.has_section(CONFIG_SECTION):
+        return settings
+    LOGGER.debug("Reading connection settings from %s", path)
+    getters = {"hosts": parser.get, "maxsize": parser.getint,
+               "timeout": parser.getfloat,
+               "retry_on_timeout": parser.getboolean,
+               "max_retries": parser.getint, "compress": parser.getboolean}
+    for name, getter in getters.items():
+        if parser.has_option(CONFIG_SECTION, name):
+            settings[name] = getter(CONFIG_SECTION, name)
+    return settings
+
+
+
+def parse_hosts(text):
+    """
+    Parse seed nodes.
+
+    :param str text: comma-separated host[:port], e.g. es1:9200,es2
+    :return list[dict]: host and port of each node
+    :raises ValueError: if no host is given, or a port isn't an integer
+    """
+    hosts = []
+    for node in text.split(","):
+        node = node.strip()
+        if not node:
+            continue
+        host, _, port = node.partition(":")
+        hosts.append({"host": host, "port": int(port) if port else PORT})
+    if not hosts:
+        raise ValueError("No Elasticsearch host in '{}'".format(text))
+    return hosts
+
+
+
+def make_client(path=None, **overrides):
+    """
+    Create a client according to the connection settings.
+
+    :param str path: path to config file; optional, see read_config
+    :param overrides: settings that take precedence over those in the
+        config file; hosts may be given as text or as parsed hosts
+    :return elasticsearch.client.Elasticsearch: configured client
+    """
+    settings = read_config(path)
+    settings.update(overrides)
+    hosts = settings["hosts"]
+    if not isinstance(hosts, list):
+        hosts = parse_hosts(hosts)
+    return Elasticsearch(
+            hosts=hosts,
+            connection_class=CompressedConnection if settings["compress"]
+            else Urllib3HttpConnection,
+            maxsize=settings["maxsize"], timeout=settings["timeout"],
+            retry_on_timeout=settings["retry_on_timeout"],
+            max_retries=settings["max_retries"])
+
+
+
+def shared_client():
+    """
+    Get the client shared within this process, creating it on first use.
+    The client is thread-safe; it shouldn't be shared across a fork.
+
+    :return elasticsearch.client.Elasticsearch: configured client
+    """
+    global _SHARED_CLIENT
+    if _SHARED_CLIENT is None:
+        _SHARED_CLIENT = make_client()
+    return _SHARED_CLIENT
+
+
+
+class CompressedConnection(Urllib3HttpConnection):
+    """ Connection that gzips request bodies and accepts gzipped responses. """
+
+    def __init__(self, *args, **kwargs):
+        super(CompressedConnection, self).__init__(*args, **kwargs)
+        # urllib3 decodes gzipped response bodies transparently.
+        self.headers["accept-encoding"] = "gzip,deflate"
+        self.pool = _CompressingPool(self.pool)
+
+
+
+class _CompressingPool(object):
+    """ Connection pool proxy that gzips the body of each request. """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+
+    def urlopen(self, method, url, body=None, headers=None, **kwargs):
+        # Headers are set per request rather than on the connection, as
+        # connections are shared across threads.
+        if body is not None and len(body) >= MIN_COMPRESSED_BYTES:
+            compressor = zlib.compressobj(
+                    6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            headers = dict(headers or {}, **{"content-encoding": "gzip"})
+        return self._pool.urlopen(method, url, body, headers=headers,
+                                  **kwargs)
+
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
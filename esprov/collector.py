@@ -0,0 +1,441 @@
+""" Collection of provda records sent over TCP, in place of logstash.
+
+Provda emitters send newline-delimited JSON over TCP. The collector accepts
+the same stream, fills in the fields that logstash's tcp input would add,
+validates each record against the provda mapping, and batches records into
+bulk requests by size or by time window, whichever comes first.
+
+Accepted records wait in a bounded queue. When Elasticsearch falls behind,
+the queue fills and the collector stops reading from its sockets, so
+backpressure reaches senders through TCP flow control instead of memory
+growing without bound.
+
+Optionally, accepted records are first written to a durable spool (see
+esprov.spool) rather than held in memory until sent. Records are then sent by
+replaying the spool, so they outlive both an unavailable cluster and a
+restart of the collector itself.
+
+This module is built on asyncio, so it requires Python 3.
+
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import json
+import logging
+import threading
+
+from elasticsearch.exceptions import ConnectionError, TransportError
+
+from esprov import \
+    HOSTNAME_KEY, PORT_KEY, TIMESTAMP_KEY, VERSION_KEY
+from esprov.ingestion import load_records, LoadReport, DEFAULT_CHUNK_SIZE
+from esprov.provda_edge import source_record_id
+from esprov.provda_record import \
+    record_id, validate_record, InvalidRecordException
+from esprov.spool import Spool
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.collector"
+
+
+__all__ = ["Collector"]
+
+
+# Same defaults as the logstash tcp input in the provda pipeline
+DEFAULT_LISTEN_HOST = "0.0.0.0"
+DEFAULT_LISTEN_PORT = 5000
+
+# Seconds that a partial batch may wait before being sent anyway
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Records that may be accepted but not yet sent before reading pauses
+DEFAULT_MAX_PENDING = 10 * DEFAULT_CHUNK_SIZE
+
+# Longest line (i.e., record) accepted
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+# Bounds (seconds) on wait between attempts to send a batch
+INITIAL_RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30.0
+
+# Attempts to replay a spooled batch that fails other than for want of
+# the cluster, before it's counted as failed and skipped
+MAX_REPLAY_ATTEMPTS = 5
+
+# Bulk item status for a request rejected due to cluster load
+REJECTED_STATUS = 429
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def prepare_record(record, host, port):
+    """
+    Add to a record the fields that logstash's tcp input would add.
+
+    :param dict record: record as sent by emitter
+    :param str host: address of the sending host
+    :param int port: port of the sending connection
+    :return dict: the given record, with timestamp, version, host and port
+        set if the sender didn't provide them
+    """
+    if TIMESTAMP_KEY not in record:
+        now = datetime.datetime.utcnow()
+        record[TIMESTAMP_KEY] = "{}.{:03d}Z".format(
+                now.strftime("%Y-%m-%dT%H:%M:%S"), now.microsecond // 1000)
+    record.setdefault(VERSION_KEY, 1)
+    record.setdefault(HOSTNAME_KEY, host)
+    record.setdefault(PORT_KEY, port)
+    return record
+
+
+
+class Collector(object):
+    """ Asyncio TCP server that batches provda records into bulk requests. """
+
+    def __init__(self, es_client, index=None,
+                 batch_size=DEFAULT_CHUNK_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING, spool_dir=None):
+        """
+        Client and target, along with batching parameters, define a collector.
+
+        :param elasticsearch.client.Elasticsearch es_client: client with
+            which to issue bulk requests
+        :param str index: name of index in which to store records; optional,
+            if null records are routed to daily partitions
+        :param int batch_size: maximum number of records per bulk request
+        :param float flush_interval: maximum seconds that a record may wait
+            for its batch to fill before the batch is sent
+        :param int max_pending: maximum number of records accepted but not
+            yet sent (or, with a spool, not yet spooled); beyond this, the
+            collector stops reading from senders
+        :param str spool_dir: path to folder in which to spool records before
+            sending them; optional, if null records are held in memory
+        """
+        self.es_client = es_client
+        self.index = index
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self.report = LoadReport()
+        self.rejected = 0
+        self.address = None
+        self.started = threading.Event()
+        self._stopping = threading.Event()
+        # Bulk requests block, so they're made off of the event loop; a
+        # single thread keeps them in order and one at a time.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # Likewise for writes to the spool, which mustn't wait on requests.
+        self._spool_executor = ThreadPoolExecutor(max_workers=1)
+        self._spool = None
+        self._spooled = threading.Event()
+        self._loop = None
+        self._queue = None
+        self._batch = []
+        self._serving = None
+        self._connections = set()
+
+
+    def summary(self):
+        """
+        Summarize the collector's activity.
+
+        :return dict: counts of records indexed, already present, failed,
+            and rejected as invalid, with throughput
+        """
+        summary = self.report.to_dict()
+        summary["rejected"] = self.rejected
+        return summary
+
+
+    def run(self, host=DEFAULT_LISTEN_HOST, port=DEFAULT_LISTEN_PORT):
+        """
+        Serve until interrupted, then send whatever's pending.
+
+        :param str host: address on which to listen
+        :param int port: port on which to listen
+        :return dict: summary of the collector's activity
+        """
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            LOGGER.info("Interrupted; collector stopped")
+        finally:
+            self._executor.shutdown(wait=True)
+            self._spool_executor.shutdown(wait=True)
+        return self.summary()
+
+
+    def stop(self):
+        """ Stop serving; safe to call from any thread. """
+        self._stopping.set()
+        if self._loop is not None and self._serving is not None:
+            self._loop.call_soon_threadsafe(self._serving.cancel)
+
+
+    async def serve(self, host, port):
+        """
+        Accept connections and send their records until cancelled.
+
+        :param str host: address on which to listen
+        :param int port: port on which to listen
+        """
+        self._loop = asyncio.get_event_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        server = await asyncio.start_server(
+                self._handle_connection, host, port, limit=MAX_LINE_BYTES)
+        self.address = server.sockets[0].getsockname()
+        LOGGER.info("Collecting records on %s:%d", *self.address[:2])
+        if self.spool_dir is None:
+            batcher = asyncio.ensure_future(self._send_batches())
+        else:
+            self._spool = Spool(self.spool_dir)
+            batcher = asyncio.ensure_future(self._spool_batches())
+            # Replay anything left by a previous run along with new records.
+            replay = self._loop.run_in_executor(self._executor, self._replay)
+        self._serving = asyncio.ensure_future(server.serve_forever())
+        self.started.set()
+        try:
+            await self._serving
+        except asyncio.CancelledError:
+            pass
+        finally:
+            server.close()
+            # A sender may be stalled on a full queue; cut it off.
+            for connection in list(self._connections):
+                connection.cancel()
+            await server.wait_closed()
+            batcher.cancel()
+            try:
+                await batcher
+            except asyncio.CancelledError:
+                pass
+            remaining = self._batch
+            self._batch = []
+            while not self._queue.empty():
+                remaining.append(self._queue.get_nowait())
+            if self._spool is None:
+                # Send what was gathered into a batch or left in the queue,
+                # making a single attempt rather than retrying indefinitely.
+                self._stopping.set()
+                if remaining:
+                    await self._loop.run_in_executor(
+                            self._executor, self._send, remaining)
+            else:
+                # Spool whatever's left, then let replay make one last pass;
+                # records it can't send remain spooled for the next run.
+                await self._loop.run_in_executor(
+                        self._spool_executor, self._write_spool, remaining)
+                self._stopping.set()
+                self._spooled.set()
+                await replay
+                self._spool.close()
+
+
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Read newline-delimited records from one sender.
+
+        :param asyncio.StreamReader reader: stream from sender
+        :param asyncio.StreamWriter writer: stream to sender
+        """
+        peer = writer.get_extra_info("peername") or ("", None)
+        host, port = peer[0], peer[1]
+        LOGGER.debug("Connection from %s:%s", host, port)
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    LOGGER.warning("Line from %s:%s exceeds %d bytes; "
+                                   "closing connection",
+                                   host, port, MAX_LINE_BYTES)
+                    break
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                    validate_record(record)
+                except (ValueError, InvalidRecordException) as e:
+                    self.rejected += 1
+                    LOGGER.warning("Rejected record from %s:%s: %s",
+                                   host, port, e)
+                    continue
+                # Blocks while the queue is full, which stops reads from
+                # this socket and in turn stalls the sender.
+                await self._queue.put(prepare_record(record, host, port))
+        except asyncio.CancelledError:
+            LOGGER.debug("Connection from %s:%s cut off", host, port)
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+
+    async def _send_batches(self):
+        """ Gather queued records into batches and send them, in order. """
+        while True:
+            self._batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.flush_interval
+            while len(self._batch) < self.batch_size:
+                try:
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(
+                            self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            try:
+                await self._loop.run_in_executor(self._executor,
+                                                 self._send, batch)
+            except Exception:
+                # One bad batch mustn't stop the collector storing others.
+                self.report.failed += len(batch)
+                LOGGER.exception("Failed to send batch of %d record(s)",
+                                 len(batch))
+
+
+    async def _spool_batches(self):
+        """
+        Write queued records to the spool. Each write covers every record
+        queued while the previous write was in progress, so one fsync is
+        shared by many records and writes keep pace with arrivals.
+        """
+        while True:
+            self._batch = [await self._queue.get()]
+            while len(self._batch) < self.batch_size:
+                try:
+                    self._batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            batch, self._batch = self._batch, []
+            await self._loop.run_in_executor(self._spool_executor,
+                                             self._write_spool, batch)
+
+
+    def _write_spool(self, records):
+        """
+        Durably spool records and signal that there are records to replay.
+
+        :param list[dict] records: records to spool
+        """
+        if records:
+            self._spool.append(records)
+            self._spool.commit()
+            self._spooled.set()
+
+
+    def _replay(self):
+        """
+        Send spooled records in order, advancing the spool's checkpoint
+        past each batch once it's stored, until stopped with the spool
+        drained or the cluster unavailable. A batch that fails otherwise
+        is retried with backoff, then counted as failed and skipped.
+        """
+        records, position = [], None
+        failures = 0
+        delay = INITIAL_RETRY_DELAY
+        while True:
+            try:
+                # Replay advances past a batch, so one that failed is kept
+                # to be sent again rather than read again.
+                if not records:
+                    records, position = self._spool.replay(self.batch_size)
+                if not records:
+                    if self._stopping.is_set():
+                        return
+                    self._spooled.wait(self.flush_interval)
+                    self._spooled.clear()
+                    continue
+                if not self._send(records):
+                    # Only stopping abandons a batch.
+                    LOGGER.warning("Unsent records remain spooled in %s",
+                                   self.spool_dir)
+                    return
+                self._spool.acknowledge(position)
+            except Exception:
+                failures += 1
+                LOGGER.exception("Failed to replay spooled records")
+                if records and failures >= MAX_REPLAY_ATTEMPTS:
+                    # One bad batch mustn't hold up those spooled after it.
+                    self.report.failed += len(records)
+                    LOGGER.error("Skipping batch of %d record(s) after %d "
+                                 "failed attempts", len(records), failures)
+                    self._spool.acknowledge(position)
+                elif self._stopping.wait(delay):
+                    LOGGER.warning("Unsent records remain spooled in %s",
+                                   self.spool_dir)
+                    return
+                else:
+                    delay = min(2 * delay, MAX_RETRY_DELAY)
+                    continue
+            records, failures, delay = [], 0, INITIAL_RETRY_DELAY
+
+
+    def _send(self, batch):
+        """
+        Send a batch through the bulk API, retrying with backoff for as long
+        as the cluster is unreachable or rejecting requests due to load.
+
+        :param list[dict] batch: records to send
+        :return bool: whether the cluster responded to each record, i.e.
+            the batch wasn't abandoned by stopping
+        """
+        pending = batch
+        delay = INITIAL_RETRY_DELAY
+        while pending:
+            try:
+                summaries = list(load_records(
+                        self.es_client, pending, index=self.index,
+                        chunk_size=len(pending), report=self.report))
+            except (ConnectionError, TransportError) as e:
+                LOGGER.warning("Bulk request of %d record(s) failed: %s",
+                               len(pending), e)
+            else:
+                rejected_ids = {
+                    outcome.get("_id")
+                    for summary in summaries for error in summary["errors"]
+                    for outcome in error.values()
+                    if outcome.get("status") == REJECTED_STATUS
+                }
+                # A record is resent if it or any of its edges was rejected.
+                rejected_records = {source_record_id(document_id)
+                                    for document_id in rejected_ids
+                                    if document_id}
+                pending = [record for record in pending
+                           if record_id(record) in rejected_records]
+                if not pending:
+                    return True
+                # A rejection due to load isn't a failure if it's retried.
+                self.report.failed -= len(rejected_ids & rejected_records)
+                self.report.edges_failed -= \
+                    len(rejected_ids - rejected_records)
+                LOGGER.warning("Cluster rejected %d record(s); retrying",
+                               len(pending))
+            if self._stopping.wait(delay):
+                if self._spool is None:
+                    self.report.failed += len(pending)
+                    LOGGER.error("Stopped with %d record(s) unsent",
+                                 len(pending))
+                return False
+            delay = min(2 * delay, MAX_RETRY_DELAY)
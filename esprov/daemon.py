@@ -0,0 +1,299 @@
+""" Long-running server for CLI queries, and the shim that forwards to it.
+
+Each CLI run otherwise pays for interpreter startup, import of the
+Elasticsearch libraries, and new connections before it sends its query,
+and it discards the index catalog it fetched when it exits. The server
+('esprov serve') holds a pooled client, and with it the catalog, across
+calls. It listens on a Unix socket, where a run of the executable forwards
+its arguments rather than doing the work itself, so that a call costs
+little more than the query's own round trip.
+
+The protocol is JSON lines. A request is a single line, {"argv": [...],
+"cwd": "..."}, with the caller's working directory, against which the
+server resolves relative paths among the arguments. The response is a line
+per line of output, {"out": "..."}, interleaved with a line per message
+logged while running the command, {"log": "..."}, then a final line with
+the exit status, {"status": 0}, along with an error message if the call
+failed, {"status": 1, "error": "..."}. Output goes to the caller's standard
+output and log messages to its standard error. Help and argument errors
+never reach the server; the caller's own parser handles them.
+
+This module imports only the standard library, so that the shim is cheap.
+
+"""
+
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.daemon"
+
+
+__all__ = ["forward", "result_lines", "serve", "socket_path",
+           "ProvenanceServer", "SERVED_SUBCOMMANDS"]
+
+
+# Subcommands that the server answers; others (e.g. load, which reads a
+# local file, or collect, which itself runs indefinitely) run in-process.
+SERVED_SUBCOMMANDS = ("fetch", "list_stages", "index", "lineage")
+
+# Arguments that are paths, resolved against the caller's working directory
+PATH_ARGUMENTS = ("instances", )
+
+# Arguments for which the caller, not the server, produces the result
+LOCAL_FLAGS = ("-h", "--help")
+
+# Environment variable naming the server's socket, and its default
+SOCKET_PATH_VARNAME = "ESPROV_SOCKET"
+DEFAULT_SOCKET_PATH = os.path.join("~", ".esprov", "esprov.sock")
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def socket_path(path=None):
+    """
+    Determine the path of the server's socket.
+
+    :param str path: path given explicitly, if any
+    :return str: given path, or that named by the ESPROV_SOCKET environment
+        variable, or else ~/.esprov/esprov.sock
+    """
+    path = path or os.environ.get(SOCKET_PATH_VARNAME, DEFAULT_SOCKET_PATH)
+    return os.path.expanduser(path)
+
+
+
+def result_lines(result):
+    """
+    Render a subcommand's result as lines of output.
+
+    :param object result: value returned by subcommand's function
+    :return generator(str): a line per item of an iterable result, or a
+        single line for any other result
+    """
+    try:
+        items = iter(result)
+    except TypeError:
+        # Subcommand may've indicated function with non-iterable result.
+        yield str(result)
+        return
+    for item in items:
+        yield str(item)
+
+
+
+def forward(argv, path=None, stdout=None, stderr=None):
+    """
+    Have the server run a command, writing its output as it arrives.
+
+    :param list[str] argv: command-line arguments, less the program name
+    :param str path: path to server's socket; optional, see socket_path
+    :param file stdout: stream for output; standard output by default
+    :param file stderr: stream for error message; standard error by default
+    :return int | NoneType: command's exit status, or null if there's no
+        server to forward to, or if help is requested, in which case the
+        command should run in-process
+    """
+    if any(flag in argv for flag in LOCAL_FLAGS):
+        return None
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path(path))
+    except (IOError, OSError):
+        client.close()
+        return None
+    try:
+        request = {"argv": list(argv), "cwd": os.getcwd()}
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        responses = client.makefile("rb")
+        for line in responses:
+            message = json.loads(line.decode("utf-8"))
+            if "status" in message:
+                if message.get("error"):
+                    stderr.write(message["error"] + "\n")
+                return message["status"]
+            if "log" in message:
+                stderr.write(message["log"] + "\n")
+            else:
+                stdout.write(message["out"] + "\n")
+        stderr.write("Server closed connection before command finished\n")
+        return 1
+    finally:
+        client.close()
+
+
+
+def serve(es_client, args):
+    """
+    Serve CLI queries over a Unix socket until interrupted or terminated.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to conduct every query served
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    """
+    # The CLI parser is that of the executable being served.
+    from bin.cli import CLIFactory
+    server = ProvenanceServer(socket_path(args.socket), es_client,
+                              parser=CLIFactory.get_parser())
+    LOGGER.info("Serving on %s", server.server_address)
+    # Stop cleanly, removing the socket, when terminated as a service is.
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """ Run a single forwarded command, streaming its output back. """
+
+    def handle(self):
+        # Messages logged while the command runs go back to the caller.
+        relay = _LogRelay(self._send)
+        package_logger = logging.getLogger(__modname__.split(".")[1])
+        package_logger.addHandler(relay)
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            args = self.server.parse(request["argv"],
+                                     cwd=request.get("cwd"))
+            lines = result_lines(args.func(self.server.es_client, args))
+            for line in lines:
+                self._send({"out": line})
+        except Exception as e:
+            LOGGER.debug("Forwarded command failed", exc_info=True)
+            self._send({"status": 1,
+                        "error": "{}: {}".format(type(e).__name__, e)})
+        else:
+            self._send({"status": 0})
+        finally:
+            package_logger.removeHandler(relay)
+
+
+    def _send(self, message):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+
+
+
+class _LogRelay(logging.Handler):
+    """ Relay to a caller the messages logged by the thread serving it. """
+
+    def __init__(self, send):
+        """
+        :param callable send: function with which to send a message to
+            the caller
+        """
+        logging.Handler.__init__(self)
+        self.send = send
+        self.thread = threading.current_thread().ident
+        # Import here, as the package's logging setup is the CLI's concern.
+        from esprov import LOGGING_MESSAGE_FORMAT
+        self.setFormatter(logging.Formatter(fmt=LOGGING_MESSAGE_FORMAT))
+
+
+    def filter(self, record):
+        # Other threads are serving other callers.
+        return record.thread == self.thread
+
+
+    def emit(self, record):
+        try:
+            self.send({"log": self.format(record)})
+        except Exception:
+            self.handleError(record)
+
+
+
+class ProvenanceServer(socketserver.ThreadingMixIn,
+                       socketserver.UnixStreamServer):
+    """ Server of CLI commands, with a client shared across them. """
+
+    daemon_threads = True
+
+    def __init__(self, path, es_client, parser):
+        """
+        Socket path, client, and CLI parser define a server.
+
+        :param str path: path at which to create the socket; a socket left
+            there by a server that's gone is replaced
+        :param elasticsearch.client.Elasticsearch es_client: client with
+            which to conduct every query served
+        :param argparse.ArgumentParser parser: parser for forwarded
+            command-line arguments
+        """
+        self.es_client = es_client
+        self.parser = parser
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        if os.path.exists(path):
+            os.remove(path)
+        socketserver.UnixStreamServer.__init__(self, path, _RequestHandler)
+        # Only the owner may have commands run with the server's client.
+        os.chmod(path, 0o600)
+
+
+    def parse(self, argv, cwd=None):
+        """
+        Parse forwarded command-line arguments.
+
+        :param list[str] argv: command-line arguments, less program name
+        :param str cwd: caller's working directory, against which relative
+            paths among the arguments are resolved; optional, if omitted
+            they're left relative to the server's
+        :return argparse.Namespace: binding between option name and
+            argument value
+        :raises ValueError: if the arguments are invalid, or name a
+            subcommand that isn't served
+        """
+        try:
+            args = self.parser.parse_args(argv)
+        except SystemExit:
+            # The caller parses before forwarding, so this is unexpected;
+            # the parser has written its usage message to the server's
+            # stderr.
+            raise ValueError("Invalid arguments: {}".format(" ".join(argv)))
+        if args.subcommand not in SERVED_SUBCOMMANDS:
+            raise ValueError("Subcommand isn't served: {}".format(
+                    args.subcommand))
+        if cwd is not None:
+            for name in PATH_ARGUMENTS:
+                path = getattr(args, name, None)
+                if path is not None:
+                    setattr(args, name, os.path.join(
+                            cwd, os.path.expanduser(path)))
+        return args
+
+
+    def server_close(self):
+        """ Stop listening, and remove the socket. """
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
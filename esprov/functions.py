@@ -3,35 +3,43 @@
 import argparse
 import logging
 
+from elasticsearch.exceptions import NotFoundError
 from elasticsearch_dsl import Index, Search
 
 from esprov import \
-    DOCTYPE_KEY, DOCUMENT_TYPENAMES, \
-    ID_ATTRIBUTE_NAME, TIMESTAMP_KEY
+    DOCTYPE_KEY, ID_ATTRIBUTE_NAME, INSTANCE_KEY
+from esprov.catalog import index_catalog
+from esprov.graph.lineage import chained, IndexedEdges, RecordEdges, walk
+from esprov.ingestion import \
+    load_parallel, load_serial, DEFAULT_CHUNK_SIZE
+from esprov.options import \
+    INDEX_CREATION_NAMES, INDEX_DELETION_NAMES, INDEX_EXISTENCE_NAMES, \
+    INDEX_OPERATION_NAMES, LINEAGE_RELATIONS, LIST_STAGES_TIMESPANS, \
+    TIME_CHAR_BY_CLI_PARAM
+from esprov.partitions import \
+    is_partition, lag_timedelta, pruned_index_expression, put_template, \
+    PARTITION_PATTERN, PARTITION_PREFIX
+from esprov.provda_edge import \
+    delete_partition_edges, edge_index, edge_index_expression, \
+    record_index_expression, ProvdaEdge
 from esprov.provda_record import ProvdaRecord
-from esprov.utilities import build_search, capped, parse_index, parse_num_docs
+from esprov.query import QuerySpec
+from esprov.result_cache import cached_result
+from esprov.utilities import \
+    build_search, capped, count_distinct, count_hits, distinct_values, \
+    field_value, hits_exist, is_ordered, multi_search, ordered_hits, \
+    parallel_hits, parse_doctypes, parse_fields, parse_index, parse_num_docs, \
+    planned_hits, read_instances, wants_count, wants_existence, \
+    with_cursor, SINGLE_REQUEST_LIMIT
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-21"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
 __modname__ = "esprov.esprov.functions"
 
 
-# Related to list_stages
-MONTHS_NAME = "months"
-LIST_STAGES_TIMESPANS = (MONTHS_NAME, "weeks", "days", "hours", "minutes")
-ES_TIME_CHARACTERS = ('M', 'w', 'd', 'H', 'm')
-TIME_CHAR_BY_CLI_PARAM = dict(zip(LIST_STAGES_TIMESPANS, ES_TIME_CHARACTERS))
-
-# Related to Index operations
-INDEX_CREATION_NAMES = {"insert", "create", "build"}
-INDEX_DELETION_NAMES = {"remove", "delete"}
-INDEX_EXISTENCE_NAMES = {"exists"}
-INDEX_OPERATION_NAMES = \
-    INDEX_EXISTENCE_NAMES | INDEX_CREATION_NAMES | INDEX_DELETION_NAMES
-
 LOGGER = logging.getLogger(__modname__)
 
 
@@ -52,7 +60,6 @@ LOGGER = logging.getLogger(__modname__)
 
 
 # TODO: Separate raw record strings from this for min. dependency/assumption.
-# TODO: consider generalizing query formation (common map/unpack pattern)
 
 
 # Cases for listing stages:
@@ -65,16 +72,30 @@ def list_stages(es_client, args):
     Currently, supported options are time-lag-indicative ones with
     numeric argument, and the supported flag is "--id" to indicate
     that record ID is all that's needed, not the full record for a match.
+    Alternatively, "--fields" names the fields of each record to produce.
 
     E.g., get ID for stages run within last 3.5 days
     ~ <User>$ esprov list_stages -id -d 3 -H 12
 
+    Each stage is listed once, as its most recent record, the distinct
+    stages being found by aggregation on the cluster; "--stats" adds to each
+    the number of records and when it was first and last seen. To list every
+    matching record instead, pass "--duplicate". Those records come in time
+    order with --ordered, paged with search_after, followed by a final
+    {"cursor": ...} result whose token may be passed back with --cursor to
+    resume after the last one.
+
+    E.g., count the distinct stages run within the last day
+    ~ <User>$ esprov list_stages --count --days 1
+
     :param elasticsearch.client.Elasticsearch es_client: client with
         which to conduct the Elasticsearch query
     :param argparse.Namespace args: binding between parameter name and
         argument value
-    :return generator(str | dict): matches of time-based query, either as
-        full record or as a distilled representation (like text hash-esque ID)
+    :return generator(str | dict) | int | bool: matches of time-based query,
+        either as full record or as a distilled representation (like text
+        hash-esque ID); or, with --count, the number of (distinct) matches;
+        or, with --exists, whether there's any match
     """
 
     # TODO: incorporate this if it's decided to require >= 1 lag spec,
@@ -89,12 +110,12 @@ def list_stages(es_client, args):
 
     assertion_statement = "Time lag span value must be nonnegative integer."
 
-    # TODO 1: support extend this sort of thing beyond stages (other function)
-    # TODO 2: support filter/reduction based on duplicates.
+    # TODO: support extend this sort of thing beyond stages (other function)
 
-    if all([arg is None for arg in LIST_STAGES_TIMESPANS]):
+    if all([getattr(args, span, None) is None
+            for span in LIST_STAGES_TIMESPANS]):
         # Each supported timespan bound to null --> no time constraint.
-        timespan_query_data = {}
+        time_text = None
     else:
         # Build up the time text filter.
         # Elasticsearch supports a time offset from current by providing
@@ -103,6 +124,9 @@ def list_stages(es_client, args):
         # Native Elasticsearch format
         time_text = "now"
 
+        # Also tally the lag, to determine the partitions to search.
+        lag_by_span = {}
+
         # Consider each time lag span in turn, interrogating arguments parsed
         # from the command line for a value for that time lag span.
         for time_param_name, es_time_char in TIME_CHAR_BY_CLI_PARAM.items():
@@ -120,27 +144,106 @@ def list_stages(es_client, args):
 
             # The Elasticsearch format is -<magnitude><lag character>
             time_text += "-{}{}".format(this_time_span_arg, es_time_char)
+            lag_by_span[time_param_name] = int(this_time_span_arg)
+
+    # Filter to activity records within the timespan of interest (from the
+    # lag through "now", as ES denotes current), rounded to the minute so
+    # that repeated listings share cached filter results.
+    spec = QuerySpec(doctypes=["activity"],
+                     namespace=getattr(args, "namespace", None),
+                     since=time_text,
+                     until=None if time_text is None else "now")
+
+    # Build and execute query. For IDs alone, read instance from doc values
+    # rather than transferring and parsing each full record.
+    search = build_search(
+            es_client, args=args,
+            docvalue_fields=(ID_ATTRIBUTE_NAME, ) if args.id else None)
+
+    # With a time constraint, search only the partitions that it overlaps.
+    if time_text is not None:
+        pruned_index = pruned_index_expression(
+                parse_index(args), lag=lag_timedelta(**lag_by_span))
+        if pruned_index is not None:
+            LOGGER.debug("Searching partitions: %s", pruned_index)
+            # Pruning rewrites the expression, so exclude edges again.
+            search = search.index().index(
+                    record_index_expression(pruned_index)).params(
+                    ignore_unavailable=True, allow_no_indices=True)
+
+    LOGGER.debug("Query: %s", spec.to_dict())
+    search = spec.apply(search)
+
+    # Distinct stages are gathered by aggregation, which has no time order.
+    if not wants_count(args) and not wants_existence(args) and \
+            not args.duplicate and is_ordered(args):
+        raise ValueError("Ordered listing of stages requires --duplicate")
+
+    if getattr(args, "cache", False):
+        return cached_result(search, args,
+                             produce=lambda: _stages_result(search, args))
+    return _stages_result(search, args)
+
+
+
+def _stages_result(search, args):
+    """
+    Answer a list_stages query.
 
-        # Bind Elasticsearch timespan key-value pairs to the timestamp key.
-        # ES uses "now" to indicate current, and we want to filter to >= lag.
-        timespan_query_data = {TIMESTAMP_KEY: {"gte": time_text, "lt": "now"}}
+    :param elasticsearch_dsl.search.Search search: list_stages query
+    :param argparse.Namespace args: binding between parameter name and
+        argument value
+    :return generator(str | dict) | int | bool: stages hit by the query, or
+        their number, or whether there's any
+    """
+    # Answer count and existence questions without retrieving any hit.
+    if wants_count(args):
+        return count_hits(search) if args.duplicate \
+            else count_distinct(search, field=ID_ATTRIBUTE_NAME)
+    if wants_existence(args):
+        return hits_exist(search)
+    return _listed_stages(search, args)
 
-    # Match on code document instances.
-    record_type_query_data = {DOCTYPE_KEY: "activity"}
 
-    # Build and execute query.
-    search = build_search(es_client, args=args)
-    query = search.query("match", **record_type_query_data)
 
-    # Filter result(s) based on timespan of interest.
-    if timespan_query_data:
-        result = query.filter("range", **timespan_query_data)
-    else:
-        result = query
+def _listed_stages(search, args):
+    """
+    Produce the stages hit by a list_stages query.
 
-    # Produce results as mappings rather than raw text or ADT instance.
-    for response in result.scan():
-        yield response[ID_ATTRIBUTE_NAME] if args.id else response.to_dict()
+    :param elasticsearch_dsl.search.Search search: list_stages query
+    :param argparse.Namespace args: binding between parameter name and
+        argument value
+    :return generator(str | dict): each stage's ID or record, or summary
+        if stats were requested
+    """
+    if args.duplicate:
+        # Produce results as mappings rather than raw text or ADT instance.
+        def convert(response):
+            return field_value(response, ID_ATTRIBUTE_NAME) if args.id \
+                else response.to_dict()
+        if is_ordered(args):
+            for result in with_cursor(ordered_hits(search, args), convert):
+                yield result
+        else:
+            for response in planned_hits(search, limit=parse_num_docs(args)):
+                yield convert(response)
+        return
+
+    stats = getattr(args, "stats", False)
+    stages = distinct_values(search, field=ID_ATTRIBUTE_NAME,
+                             stats=stats, with_record=not args.id,
+                             record_fields=parse_fields(args))
+    for stage in capped(items=stages, limit=parse_num_docs(args)):
+        if stats:
+            summary = {ID_ATTRIBUTE_NAME: stage["key"],
+                       "count": stage["count"],
+                       "first_seen": stage["first_seen"],
+                       "last_seen": stage["last_seen"]}
+            if not args.id:
+                summary["record"] = stage["record"]
+            yield summary
+        else:
+            yield stage["key"] if args.id else stage["record"]
 
 
 
@@ -168,12 +271,35 @@ def index(es_client, args):
         # mapping between incoming text record and provenance record fields.
         LOGGER.debug("Inserting index %s", str(args.index_target))
         ProvdaRecord.init(index=args.index_target, using=es_client)
+        index_catalog(es_client).invalidate()
 
     elif operation_name in INDEX_DELETION_NAMES:
         # Ignore elasticsearch.exceptions.RequestError (400);
         # also ignore elasticsearch.exceptions.NotFoundError (404).
         LOGGER.debug("Removing index %s", str(args.index_target))
+        # Note the indices to delete while they can still be resolved.
+        removed = index_catalog(es_client).resolve(args.index_target)
+        partitions = [name for name in removed if is_partition(name)]
         es_client.indices.delete(index=args.index_target, ignore=[400, 404])
+        # The edges of the index's records go with them: an index of its
+        # own for most, but for partitions, their share of the one index.
+        parts = [part.strip() for part in args.index_target.split(",")
+                 if part.strip() and
+                 not part.strip().startswith(PARTITION_PREFIX)]
+        if parts:
+            es_client.indices.delete(
+                    index=",".join(edge_index(part) for part in parts),
+                    ignore=[400, 404])
+        if partitions:
+            LOGGER.debug("Removing edges of %d partition(s)",
+                         len(partitions))
+            delete_partition_edges(es_client, partitions)
+        index_catalog(es_client).invalidate()
+        # Lineages traced from the removed edges would otherwise be served
+        # as long as no new edge extends them.
+        from esprov.graph.reachability import forget_edge_indices
+        forget_edge_indices(edge_index_expression(
+                ",".join(sorted(removed) + parts)).split(","))
 
     elif operation_name in INDEX_EXISTENCE_NAMES:
         LOGGER.debug("Checking existence of index %s", str(args.index_target))
@@ -192,12 +318,30 @@ def fetch(es_client, args):
     """
     Perform Elasticsearch TERM-level query, fetching matching documents.
 
+    With --fields, each document is limited to the fields named.
+    Hits are unordered unless --ordered is given, in which case they come in
+    time order, paged with search_after, followed by a final
+    {"cursor": ...} result whose token may be passed back with --cursor to
+    resume after the last hit.
+    With --parallel N, hits are read from N slices of a scroll at once,
+    merged in time order if --ordered is also given.
+    With --count or --exists, only the number of hits, or whether there's
+    any, is determined, in a single request.
+
+    Several doctypes (comma-separated), or a file of instance IDs given with
+    --instances, make a batch of lookups, sent together in multi-search
+    requests and reported per lookup.
+    ~ <User>$ esprov fetch --doctype activity,entity,agent -n 100
+
     :param elasticsearch.Elasticsearch es_client: Elasticsearch client
         to use for query
     :param argparse.Namespace args: binding between option name
         and argument value
-    :return generator(dict): documents matching the fetch request,
-        with each document converted from raw text form to data mapping
+    :return generator(dict) | int | bool: documents matching the fetch
+        request, with each document converted from raw text form to data
+        mapping; or, with --count, the number of matches; or, with
+        --exists, whether there's any match; or, for a batch of lookups,
+        the result of each
     :raises ValueError: if doctype given is unknown, or if document count
         limit is negative, or if given index name matches no known index
     """
@@ -208,22 +352,17 @@ def fetch(es_client, args):
 
     search = build_search(es_client, args=args)
 
-    # Assign mapping for query based on targeted doctype.
-    if args.doctype is None:
-        # No doctype --> grab all records/documents.
-        logger.debug("No doctype")
-        query_mapping = {}
-    elif args.doctype not in DOCUMENT_TYPENAMES:
-        # If doctype is given, it must be valid.
-        raise ValueError("Unknown doctype: {}".format(args.doctype))
-    else:
-        # Doctype is given and is valid.
-        logger.debug("Doctype: %s", args.doctype)
-        query_mapping = {DOCTYPE_KEY: args.doctype}
-
-    # Ensure that we're given a valid index.
-    if args.index not in es_client.indices.get_alias() \
-            and args.index != "_all":
+    # Determine targeted doctype(s) and instance(s), if any.
+    doctypes = parse_doctypes(args)
+    logger.debug("Doctype(s): %s", doctypes)
+    instances_path = getattr(args, "instances", None)
+    instances = None if instances_path is None \
+        else read_instances(instances_path)
+
+    # Ensure that we're given a valid index, resolving it against the
+    # cached catalog rather than asking the cluster for every index.
+    if args.index != "_all" and not index_catalog(es_client).resolve(
+            args.index):
         # "_all" is the fallback match-all index value.
         # That default applies when no index is given, so
         # by the time index argument is here, it should be set to
@@ -231,41 +370,429 @@ def fetch(es_client, args):
         raise ValueError("Unknown index: {} ({})".format(args.index,
                                                          type(args.index)))
 
-    # TODO: Properly filter result; are hits ordered by score?
-    # TODO: empty query is logical here, but is it valid?
-    # TODO: make use of the count() member of Search for testing.
+    # Several lookups are batched, their results given per lookup.
+    if instances is not None or len(doctypes or []) > 1:
+        return _multi_fetched(es_client, search, args, doctypes, instances)
+
+    # Filter on targeted doctype, documents and namespace, if any.
+    spec = _fetch_spec(args, doctypes=doctypes)
+    logger.debug("Query: %s", spec.to_dict())
+    search = spec.apply(search)
+
+    try:
+        if getattr(args, "cache", False):
+            return cached_result(
+                    search, args,
+                    produce=lambda: _fetch_result(es_client, search, args))
+        return _fetch_result(es_client, search, args)
+    except NotFoundError:
+        _unknown_index(es_client, args.index)
 
-    if query_mapping:
-        logger.debug("query_mapping: %s", str(query_mapping))
-        result = search.query("match", **query_mapping)
-        hits = result.scan()
+
+
+def _fetch_result(es_client, search, args):
+    """
+    Answer a single fetch query.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        the query is conducted
+    :param elasticsearch_dsl.search.Search search: fetch query
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :return generator(dict) | int | bool: documents hit by the query, or
+        their number, or whether there's any
+    """
+    # Answer count and existence questions without retrieving any hit.
+    if wants_count(args):
+        return count_hits(search)
+    if wants_existence(args):
+        return hits_exist(search)
+    return _fetched_documents(es_client, search, args)
+
+
+
+def _multi_fetched(es_client, search, args, doctypes, instances):
+    """
+    Produce the results of a batch of fetch lookups, one per doctype, or,
+    if instances are given, one per instance (of the given doctypes, if
+    any), made in as few multi-search requests as the batch size allows.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        the lookups are conducted
+    :param elasticsearch_dsl.search.Search search: query common to lookups
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :param list[str] doctypes: names of doctypes to look up or by which to
+        filter instance lookups; null for no filter on doctype
+    :param list[str] instances: instance IDs to look up; null for lookup by
+        doctype alone
+    :return generator(dict): for each lookup, a mapping with its doctype or
+        instance and its total number of hits, along with either the hits
+        themselves (up to the hits limit) or, with --exists, whether there
+        are any, or, with --count, nothing further
+    """
+    if instances is None:
+        key_name = DOCTYPE_KEY
+        lookups = [(doctype,
+                    _fetch_spec(args, doctypes=[doctype]).apply(search))
+                   for doctype in doctypes]
     else:
-        #logger.debug("Executing 'wildcard' query on %s field", DOCTYPE_KEY)
-        #result = search.query("wildcard", **{DOCTYPE_KEY: "*"})
-        logger.debug("No query mapping --> doing direct search...")
-        resolved_index = parse_index(args)
-        logger.debug("Parsed index name %s from %s", resolved_index, str(args))
-
-        # DEBUG
-        #logger.debug("USING EMPTY SEARCH FOR DEBUGGING")
-        #hits = Search()
-
-        # TODO: uncomment
-        logger.debug("Searching index '%s'", resolved_index)
-        #logger.debug("Client indices: %s", ", ".join(es_client.indices.get_alias().keys()))
-        """
-        logger.debug(
-            "%s %s in %s",
-            args.index,
-            "IS" if args.index
-                    in es_client.indices.get_alias().keys() else "NOT",
-            ", ".join(es_client.indices.get_alias().keys())
-        )
-        """
-        hits = Search(index=resolved_index)[:parse_num_docs(args)]
-        #hits = result["hits"]["hits"]
+        key_name = INSTANCE_KEY
+        lookups = [(instance, _fetch_spec(args, doctypes=doctypes,
+                                          instances=[instance]).apply(search))
+                   for instance in instances]
+
+    count, exists = wants_count(args), wants_existence(args)
+    if count:
+        lookups = [(key, lookup[:0]) for key, lookup in lookups]
+    elif exists:
+        lookups = [(key, lookup[:0].extra(terminate_after=1))
+                   for key, lookup in lookups]
+    else:
+        size = parse_num_docs(args) or SINGLE_REQUEST_LIMIT
+        lookups = [(key, lookup[:size]) for key, lookup in lookups]
+
+    try:
+        for key, response in multi_search(es_client, lookups):
+            result = {key_name: key, "total": response.hits.total}
+            if exists:
+                result["exists"] = response.hits.total > 0
+            elif not count:
+                result["documents"] = [hit.to_dict() for hit in response]
+            yield result
+    except NotFoundError:
+        _unknown_index(es_client, args.index)
+
+
+
+def _fetch_spec(args, doctypes=None, instances=None):
+    """
+    Build the criteria for a fetch lookup.
+
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :param list[str] doctypes: names of doctypes to which to restrict hits
+    :param list[str] instances: instance IDs to which to restrict hits
+    :return esprov.query.QuerySpec: criteria for the lookup
+    """
+    documents = getattr(args, "document", None)
+    if documents is not None:
+        documents = [document.strip() for document in documents.split(",")
+                     if document.strip()]
+    return QuerySpec(doctypes=doctypes, instances=instances,
+                     documents=documents,
+                     namespace=getattr(args, "namespace", None))
+
+
+
+def _unknown_index(es_client, index_name):
+    """
+    Handle an index that the catalog knew but the cluster no longer has.
+
+    :param elasticsearch.client.Elasticsearch es_client: client whose
+        catalog is out of date
+    :param str index_name: expression for index that wasn't found
+    :raises ValueError: always, as the index is unknown
+    """
+    index_catalog(es_client).invalidate()
+    raise ValueError("Unknown index: {} ({})".format(index_name,
+                                                     type(index_name)))
 
-        logger.debug("hits: %s (%s)", str(hits), type(hits))
 
-    for hit in capped(items=hits, limit=args.num_docs):
-        yield hit.to_dict()
+
+def _fetched_documents(es_client, search, args):
+    """
+    Produce the documents hit by a fetch query.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        the query is conducted
+    :param elasticsearch_dsl.search.Search search: fetch query
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :return generator(dict): documents hit by the query
+    """
+    if getattr(args, "parallel", None):
+        # Full exports, read from several slices of a scroll at once.
+        hits = parallel_hits(search, args)
+    elif is_ordered(args):
+        # Hits in time order, each page picking up after the last.
+        hits = ordered_hits(search, args)
+    else:
+        hits = planned_hits(search, limit=parse_num_docs(args))
+    documents = with_cursor(hits, lambda hit: hit.to_dict()) \
+        if is_ordered(args) else (hit.to_dict() for hit in hits)
+    try:
+        for document in documents:
+            yield document
+    except NotFoundError:
+        _unknown_index(es_client, args.index)
+
+
+
+def lineage(es_client, args):
+    """
+    Trace what instances derive from (upstream), or what derives from them
+    (downstream), following used, wasGeneratedBy, wasInfluencedBy, and
+    hadMember relationships breadth-first.
+
+    Each instance reached is produced as it's found, with the number of
+    hops to it and the instance and relationship by which it was reached.
+    --depth limits the number of hops, --fanout the number of neighbors
+    followed from any one instance, and --relations the relationship
+    types followed (comma-separated). Edges are looked up by endpoint in
+    the edge indices kept by load and collect, a multi-search per hop.
+    ~ <User>$ esprov lineage upstream doc:paf/first_history_test0/cvd_ihd.hdf
+
+    With --cache, each instance's lineage is kept in a local database (in
+    ESPROV_CACHE_DIR, default ~/.esprov/cache) once traced, and served from
+    there until edges ingested since extend it. A lineage not yet cached is
+    traced only to --depth, and serves later calls of no greater depth; one
+    traced without --depth serves any. --fanout bypasses the cache.
+
+    :param elasticsearch.Elasticsearch es_client: Elasticsearch client
+        to use for query
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :return generator(dict): instances of the lineage, nearest first
+    :raises ValueError: if direction or a relationship type is unknown,
+        or if a limit is less than 1, or if given index name matches no
+        known index
+    """
+    starts = [instance.strip() for instance in args.instance.split(",")
+              if instance.strip()]
+    relations = getattr(args, "relations", None)
+    edge_types = LINEAGE_RELATIONS if relations is None else \
+        [name.strip() for name in relations.split(",") if name.strip()]
+    max_depth = getattr(args, "depth", None)
+    max_fanout = getattr(args, "fanout", None)
+    edges, edge_indices = _lineage_edges(
+            es_client, parse_index(args), direction=args.direction,
+            edge_types=edge_types)
+    indexed = edge_indices is not None
+    if getattr(args, "cache", False) and indexed and max_fanout is None:
+        from esprov.graph.reachability import \
+            cached_walk, reachability_cache, sync_edges
+        cache = reachability_cache()
+        try:
+            sync_edges(cache, es_client, edge_indices)
+            found = cached_walk(cache, edge_indices, edges, starts,
+                                direction=args.direction,
+                                edge_types=edge_types, max_depth=max_depth)
+        except Exception:
+            cache.close()
+            raise
+    else:
+        cache = None
+        if getattr(args, "cache", False):
+            # Only lineages traced without fanout limit, with new edges
+            # found by ingestion time, can be cached.
+            LOGGER.info("Lineage not cached, for fanout limit or lack of "
+                        "edge index")
+        found = walk(edges, starts, max_depth=max_depth,
+                     max_fanout=max_fanout)
+    limit = parse_num_docs(args)
+    return _traced(es_client, args, found if limit is None
+                   else capped(found, limit), cache=cache)
+
+
+
+def _lineage_edges(es_client, index, direction, edge_types):
+    """
+    Choose where to find the edges of a lineage: in the edge indices of
+    the parts of an index expression that have them, and in the records
+    themselves for the parts that don't, e.g. records stored by logstash
+    rather than by load or collect.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        the lineage is traced
+    :param str index: expression for the indices of records
+    :param str direction: direction of the lineage
+    :param collections.abc.Iterable(str) edge_types: relationship types
+        to follow
+    :return (callable, str | NoneType): source of edges for a lineage walk,
+        and the expression for the edge indices searched if every part of
+        the records' has its edge index, or else null
+    :raises ValueError: if direction or a relationship type is unknown
+    """
+    catalog = index_catalog(es_client)
+    parts = [part.strip() for part in index.split(",") if part.strip()]
+    # Exclusions apply alike to records and edges.
+    exclusions = [part for part in parts if part.startswith("-")]
+    indexed, unindexed = [], []
+    for part in parts:
+        if part in exclusions:
+            continue
+        has_edges = catalog.resolve(edge_index_expression(part))
+        (indexed if has_edges else unindexed).append(part)
+    sources = []
+    edge_indices = None
+    if indexed:
+        edge_indices = edge_index_expression(",".join(indexed + exclusions))
+        sources.append(IndexedEdges(es_client, edge_indices,
+                                    direction=direction,
+                                    edge_types=edge_types))
+    if unindexed or not indexed:
+        records = ",".join(unindexed + exclusions) if indexed else index
+        LOGGER.info("No edge index for %s; reading edges from records",
+                    records)
+        sources.append(RecordEdges(
+                Search(using=es_client,
+                       index=record_index_expression(records)),
+                direction=direction, edge_types=edge_types))
+        edge_indices = None
+    return (sources[0] if len(sources) == 1 else chained(sources),
+            edge_indices)
+
+
+
+def _traced(es_client, args, found, cache=None):
+    """
+    Produce the instances of a lineage as they're found.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        the lineage is traced
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :param collections.abc.Iterable(dict) found: instances of the lineage
+    :param esprov.graph.reachability.ReachabilityCache cache: cache from
+        which the lineage is served, closed once it's done; optional
+    :return generator(dict): instances of the lineage
+    """
+    try:
+        for instance in found:
+            yield instance
+    except NotFoundError:
+        _unknown_index(es_client, args.index)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+
+def load(es_client, args):
+    """
+    Bulk-load a JSON-lines file of provda records into an index.
+
+    The file is expected to be in the format written by the logstash 'file'
+    output (one JSON record per line). Records are streamed through the bulk
+    API in chunks rather than saved one request at a time. Each record's
+    document ID derives from its identity fields, and records are created
+    rather than overwritten, so reloading an already-loaded file (or an
+    overlapping one) stores nothing new. With more than one worker, the
+    file is split into newline-aligned shards, each of which is loaded by a
+    separate process.
+
+    E.g., load a logstash output file in chunks of 1000 records
+    ~ <User>$ esprov load make_history_output.log -i provda --chunk_size 1000
+
+    E.g., load a large file with 8 worker processes
+    ~ <User>$ esprov load make_history_output.log --workers 8
+
+    Without an index, records are routed into daily partitions by timestamp
+    (e.g., provda-2016.11.06), each created from the partition template.
+    Each edge of a relationship record is also stored in the corresponding
+    edge index (e.g., provda_edges), to be looked up by endpoint.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to conduct the bulk requests
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :return generator(dict): summary of each chunk (or of each shard, if
+        loading in parallel), followed by a summary of the entire load
+        with aggregate throughput
+    :raises ValueError: if target index is a multi-index expression,
+        or if worker count is not positive
+    """
+
+    index_name = getattr(args, "index", None)
+    if index_name is not None and \
+            (index_name == "_all" or "*" in index_name or "," in index_name):
+        raise ValueError("Load requires a single concrete index; got {}".
+                         format(index_name))
+
+    chunk_size = getattr(args, "chunk_size", None) or DEFAULT_CHUNK_SIZE
+    workers = getattr(args, "workers", None)
+    workers = 1 if workers is None else workers
+    if workers < 1:
+        raise ValueError("Worker count must be positive; got {}".
+                         format(workers))
+
+    if index_name is None:
+        # Partitions are created on demand, from the template.
+        LOGGER.debug("Loading %s into daily partitions", args.path)
+        put_template(es_client)
+    else:
+        # Create the index (and mapping) once, up front, for all workers.
+        LOGGER.debug("Loading %s into index %s", args.path, index_name)
+        ProvdaRecord.init(index=index_name, using=es_client)
+    # The records' edges all go to one index, likewise created up front.
+    ProvdaEdge.init(index=edge_index(index_name), using=es_client)
+
+    if workers > 1:
+        summaries = load_parallel(es_client, args.path, index=index_name,
+                                  workers=workers, chunk_size=chunk_size)
+    else:
+        summaries = load_serial(es_client, args.path, index=index_name,
+                                chunk_size=chunk_size)
+
+    # Hold back the overall summary until the load is visible to searches.
+    summary = None
+    for next_summary in summaries:
+        if summary is not None:
+            yield summary
+        summary = next_summary
+
+    es_client.indices.refresh(
+            index=",".join([index_name or PARTITION_PATTERN,
+                            edge_index(index_name)]),
+            ignore_unavailable=True)
+    LOGGER.info("Loaded %d record(s) (%d failed) in %.1fs: %.1f docs/sec",
+                summary["indexed"], summary["failed"],
+                summary["seconds"], summary["docs_per_second"])
+    yield summary
+
+
+
+def collect(es_client, args):
+    """
+    Receive provda records over TCP and store them, in place of logstash.
+
+    Emitters send newline-delimited JSON records, as they would to the
+    logstash tcp input. Records are validated and batched into bulk requests
+    by size or time window; senders are slowed when the cluster falls behind.
+
+    E.g., listen where logstash would, sending at most 1000 records per
+    request and holding a partial batch no longer than half a second
+    ~ <User>$ esprov collect --batch_size 1000 --flush_interval 0.5
+
+    With a spool, records survive an unavailable cluster (and a restart of
+    the collector), being sent once the cluster is reachable again.
+    ~ <User>$ esprov collect --spool_dir /var/spool/esprov
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to conduct the bulk requests
+    :param argparse.Namespace args: binding between option name
+        and argument value
+    :return generator(dict): summary of the collector's activity, once
+        it's been stopped
+    """
+    # The collector is built on asyncio (Python 3), so it's imported only
+    # when needed, leaving the other subcommands unaffected.
+    from esprov.collector import Collector
+
+    index_name = getattr(args, "index", None)
+    ProvdaEdge.init(index=edge_index(index_name), using=es_client)
+    if index_name is None:
+        put_template(es_client)
+    else:
+        ProvdaRecord.init(index=index_name, using=es_client)
+
+    collector_kwargs = {
+        name: getattr(args, name) for name in
+        ("batch_size", "flush_interval", "max_pending", "spool_dir")
+        if getattr(args, name, None) is not None
+    }
+    collector = Collector(es_client, index=index_name, **collector_kwargs)
+    run_kwargs = {"host": args.listen_host, "port": args.listen_port}
+    yield collector.run(**{name: value for name, value in run_kwargs.items()
+                           if value is not None})
@@ -0,0 +1,375 @@
+""" Compact, array-backed provenance graph.
+
+networkx keeps a dict per node and per edge, which for millions of edges
+amounts to gigabytes. Here, instance IDs are interned to integers, and the
+edges of each relationship type are held as two pairs of integer arrays:
+compressed sparse rows (each node's targets, contiguous) and columns (each
+node's sources, contiguous), so that traversal in either direction is a
+slice per node, and a whole frontier's neighbors are gathered at once.
+Node types are a small integer per node, and other node attributes are
+held in a column (array) per attribute name.
+
+Edges run as in PROV, from the dependent to what it depends on, e.g. from
+an activity to an entity it used. Following them forward finds what a
+node derives from (upstream); following them backward finds what derives
+from it (downstream).
+
+"""
+
+from array import array
+import itertools
+
+import numpy as np
+
+from esprov import DOCTYPE_KEY, EDGE_NAMES, FIELDS_KEY, INSTANCE_KEY, \
+    NODE_NAMES
+from esprov.graph.edges import record_edges
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.graph.compact"
+
+
+__all__ = ["CompactGraph"]
+
+
+# Code for each node type; a node only referenced by edges has none.
+NODE_TYPES = tuple(sorted(NODE_NAMES))
+UNKNOWN_NODE_TYPE = -1
+
+# Relationship types, in a fixed order
+EDGE_TYPES = tuple(sorted(EDGE_NAMES))
+
+# Integer type for node indices
+INDEX_DTYPE = np.int64
+
+
+
+class CompactGraph(object):
+    """ Provenance graph held in integer arrays, per relationship type. """
+
+    def __init__(self, ids, node_types, edges, attributes=None):
+        """
+        Node IDs and types, edges, and attribute columns define a graph.
+        Repeated edges of a type (same source and target) are held once.
+
+        :param list[str] ids: ID of each node, by index
+        :param numpy.ndarray node_types: code of each node's type, by index
+        :param collections.abc.Mapping edges: source and target node index
+            arrays, by relationship type
+        :param collections.abc.Mapping attributes: array of values (null
+            where absent) of each node attribute, by name
+        :raises ValueError: if a relationship type is unknown
+        """
+        self.ids = list(ids)
+        self._index = {node: i for i, node in enumerate(self.ids)}
+        self.node_types = np.asarray(node_types, dtype=np.int8)
+        self.attributes = dict(attributes or {})
+        self._rows = {}
+        self._columns = {}
+        size = len(self.ids)
+        for edge_type, (sources, targets) in edges.items():
+            if edge_type not in EDGE_TYPES:
+                raise ValueError("Unknown relationship type: {}".format(
+                        edge_type))
+            sources = np.asarray(sources, dtype=INDEX_DTYPE)
+            targets = np.asarray(targets, dtype=INDEX_DTYPE)
+            if len(sources):
+                pairs = np.unique(sources * size + targets)
+                sources, targets = pairs // size, pairs % size
+            self._rows[edge_type] = _compressed(sources, targets, size)
+            self._columns[edge_type] = _compressed(targets, sources, size)
+
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a graph from provenance records, e.g. a stream from a search
+        or log file, in a single pass. Node records give nodes their type
+        and attributes; edge records give edges.
+
+        :param collections.abc.Iterable(dict) records: provenance records
+        :return CompactGraph: graph of the records' nodes and edges
+        :raises ValueError: if an edge lacks an endpoint
+        """
+        ids, index = [], {}
+
+        def intern(node):
+            try:
+                return index[node]
+            except KeyError:
+                index[node] = len(ids)
+                ids.append(node)
+                return index[node]
+
+        typed, columns = {}, {}
+        edges = {edge_type: (array('q'), array('q'))
+                 for edge_type in EDGE_TYPES}
+        for record in records:
+            doctype = record[DOCTYPE_KEY]
+            if doctype in NODE_NAMES:
+                i = intern(record[INSTANCE_KEY])
+                typed[i] = NODE_TYPES.index(doctype)
+                node_attributes = \
+                    record.get(FIELDS_KEY, {}).get(record[INSTANCE_KEY]) or {}
+                for name, value in node_attributes.items():
+                    columns.setdefault(name, {})[i] = value
+            elif doctype in EDGE_NAMES:
+                sources, targets = edges[doctype]
+                for _, source, target, _ in record_edges(record):
+                    sources.append(intern(source))
+                    targets.append(intern(target))
+        return cls(ids, _node_types(typed, len(ids)),
+                   {edge_type: (np.asarray(sources, dtype=INDEX_DTYPE),
+                                np.asarray(targets, dtype=INDEX_DTYPE))
+                    for edge_type, (sources, targets) in edges.items()},
+                   attributes=_columns(columns, len(ids)))
+
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """
+        Build a graph from a networkx one, such as exploration.build_document
+        makes: node and edge type are given by attribute.
+
+        :param networkx.classes.MultiDiGraph graph: graph to convert
+        :return CompactGraph: graph of the same nodes and edges
+        """
+        ids = list(graph.nodes())
+        index = {node: i for i, node in enumerate(ids)}
+        typed, columns = {}, {}
+        for i, node in enumerate(ids):
+            data = dict(graph.nodes[node])
+            doctype = data.pop(DOCTYPE_KEY, None)
+            if doctype in NODE_TYPES:
+                typed[i] = NODE_TYPES.index(doctype)
+            for name, value in data.items():
+                columns.setdefault(name, {})[i] = value
+        edges = {}
+        for source, target, data in graph.edges(data=True):
+            sources, targets = edges.setdefault(data[DOCTYPE_KEY], ([], []))
+            sources.append(index[source])
+            targets.append(index[target])
+        return cls(ids, _node_types(typed, len(ids)), edges,
+                   attributes=_columns(columns, len(ids)))
+
+
+    def to_networkx(self):
+        """
+        Convert to a networkx graph, e.g. for analysis or drawing of a
+        small graph, with node and edge type as attribute.
+
+        :return networkx.classes.MultiDiGraph: graph of the same nodes and
+            edges
+        """
+        from networkx.classes import MultiDiGraph
+        graph = MultiDiGraph()
+        for i, node in enumerate(self.ids):
+            data = {name: column[i] for name, column in self.attributes.items()
+                    if column[i] is not None}
+            if self.node_types[i] != UNKNOWN_NODE_TYPE:
+                data[DOCTYPE_KEY] = NODE_TYPES[self.node_types[i]]
+            graph.add_node(node, **data)
+        for edge_type in self._rows:
+            for source, target in self.edges(edge_type):
+                graph.add_edge(source, target, **{DOCTYPE_KEY: edge_type})
+        return graph
+
+
+    @property
+    def nbytes(self):
+        """
+        Determine the size of the graph's arrays (not counting IDs and
+        attribute values themselves).
+
+        :return int: number of bytes in the graph's arrays
+        """
+        return self.node_types.nbytes + sum(
+                indptr.nbytes + indices.nbytes
+                for compressed in (self._rows, self._columns)
+                for indptr, indices in compressed.values())
+
+
+    def __contains__(self, node):
+        return node in self._index
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def number_of_edges(self, edge_type=None):
+        """
+        Count edges.
+
+        :param str edge_type: relationship type to count; all by default
+        :return int: number of edges
+        """
+        edge_types = None if edge_type is None else [edge_type]
+        return sum(len(indices) for _, indices
+                   in self._selected(self._rows, edge_types))
+
+
+    def node_type(self, node):
+        """
+        Determine a node's type.
+
+        :param str node: node ID
+        :return str | NoneType: node's type, or null if it's known only as
+            the endpoint of an edge
+        :raises KeyError: if the node isn't in the graph
+        """
+        code = self.node_types[self._index[node]]
+        return None if code == UNKNOWN_NODE_TYPE else NODE_TYPES[code]
+
+
+    def edges(self, edge_type):
+        """
+        Produce the edges of a relationship type.
+
+        :param str edge_type: relationship type
+        :return generator((str, str)): source and target of each edge
+        """
+        indptr, indices = self._rows.get(edge_type, (None, ()))
+        if not len(indices):
+            return
+        sources = np.repeat(np.arange(len(self.ids)), np.diff(indptr))
+        for source, target in zip(sources, indices):
+            yield self.ids[source], self.ids[target]
+
+
+    def successors(self, node, edge_types=None):
+        """
+        Find the nodes that a node has edges to, e.g. what an activity used.
+
+        :param str node: node ID
+        :param collections.abc.Iterable(str) edge_types: relationship types
+            to follow; all by default
+        :return list[str]: IDs of the node's successors
+        :raises KeyError: if the node isn't in the graph
+        """
+        return self._neighbor_ids(self._rows, node, edge_types)
+
+
+    def predecessors(self, node, edge_types=None):
+        """
+        Find the nodes that have edges to a node, e.g. the activities that
+        used an entity.
+
+        :param str node: node ID
+        :param collections.abc.Iterable(str) edge_types: relationship types
+            to follow; all by default
+        :return list[str]: IDs of the node's predecessors
+        :raises KeyError: if the node isn't in the graph
+        """
+        return self._neighbor_ids(self._columns, node, edge_types)
+
+
+    def upstream(self, node, edge_types=None, max_depth=None):
+        """
+        Find what a node derives from, following edges forward.
+
+        :param str node: node ID
+        :param collections.abc.Iterable(str) edge_types: relationship types
+            to follow; all by default
+        :param int max_depth: number of edges to follow at most; unlimited
+            by default
+        :return dict[str, int]: depth of each node reached, by ID
+        :raises KeyError: if the node isn't in the graph
+        """
+        return self._reached(self._rows, node, edge_types, max_depth)
+
+
+    def downstream(self, node, edge_types=None, max_depth=None):
+        """
+        Find what derives from a node, following edges backward.
+
+        :param str node: node ID
+        :param collections.abc.Iterable(str) edge_types: relationship types
+            to follow; all by default
+        :param int max_depth: number of edges to follow at most; unlimited
+            by default
+        :return dict[str, int]: depth of each node reached, by ID
+        :raises KeyError: if the node isn't in the graph
+        """
+        return self._reached(self._columns, node, edge_types, max_depth)
+
+
+    def _selected(self, compressed, edge_types):
+        if edge_types is None:
+            return list(compressed.values())
+        return [compressed[edge_type] for edge_type in edge_types
+                if edge_type in compressed]
+
+
+    def _neighbor_ids(self, compressed, node, edge_types):
+        frontier = np.array([self._index[node]], dtype=INDEX_DTYPE)
+        neighbors = np.unique(np.concatenate(
+                [_gathered(frontier, indptr, indices) for indptr, indices
+                 in self._selected(compressed, edge_types)] +
+                [np.empty(0, dtype=INDEX_DTYPE)]))
+        return [self.ids[i] for i in neighbors]
+
+
+    def _reached(self, compressed, node, edge_types, max_depth):
+        selected = self._selected(compressed, edge_types)
+        start = self._index[node]
+        visited = np.zeros(len(self.ids), dtype=bool)
+        visited[start] = True
+        frontier = np.array([start], dtype=INDEX_DTYPE)
+        reached = {}
+        for depth in itertools.count(1):
+            if not len(frontier) or \
+                    (max_depth is not None and depth > max_depth):
+                break
+            neighbors = np.unique(np.concatenate(
+                    [_gathered(frontier, indptr, indices)
+                     for indptr, indices in selected] +
+                    [np.empty(0, dtype=INDEX_DTYPE)]))
+            frontier = neighbors[~visited[neighbors]]
+            visited[frontier] = True
+            reached.update((self.ids[i], depth) for i in frontier)
+        return reached
+
+
+
+def _compressed(keys, values, size):
+    # Sort values by key, and index the start of each key's values.
+    order = np.argsort(keys, kind="mergesort")
+    indptr = np.zeros(size + 1, dtype=INDEX_DTYPE)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr, values[order]
+
+
+
+def _gathered(frontier, indptr, indices):
+    # Concatenate the index slices of all frontier nodes, without a loop.
+    starts, ends = indptr[frontier], indptr[frontier + 1]
+    lengths = ends - starts
+    total = lengths.sum()
+    if not total:
+        return np.empty(0, dtype=INDEX_DTYPE)
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return indices[np.arange(total) + offsets]
+
+
+
+def _node_types(typed, size):
+    node_types = np.full(size, UNKNOWN_NODE_TYPE, dtype=np.int8)
+    for i, code in typed.items():
+        node_types[i] = code
+    return node_types
+
+
+
+def _columns(values_by_name, size):
+    columns = {}
+    for name, values in values_by_name.items():
+        column = np.full(size, None, dtype=object)
+        for i, value in values.items():
+            column[i] = value
+        columns[name] = column
+    return columns
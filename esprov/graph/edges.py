@@ -1,20 +1,66 @@
-""" Provenance-in-Elasticsearch query functions. """
+""" Edges (relationships) of the provenance graph, given by edge records. """
 
-import logging
-
-from elasticsearch_dsl import Search
-
-from esprov import DOCTYPE_KEY, DOCUMENT_TYPENAMES
+from esprov import DOCTYPE_KEY, FIELDS_KEY
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-10"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
 __modname__ = "esprov.esprov.graph.edges"
 
 
-__all__ = ["WasAssociatedWith", "Used", "WasInfluencedBy", "WasGeneratedBy"]
+__all__ = ["edge_endpoints", "record_edges", "ENDPOINT_ROLES"]
+
+
+# Names of the attributes that give an edge's endpoints, by edge type. An
+# edge runs from the first to the second, following PROV: from the
+# dependent (e.g. generated entity, or using activity) to what it depends on.
+ENDPOINT_ROLES = {
+    "used": ("prov:activity", "prov:entity"),
+    "wasGeneratedBy": ("prov:entity", "prov:activity"),
+    "wasAssociatedWith": ("prov:activity", "prov:agent"),
+    "wasInfluencedBy": ("prov:influencee", "prov:influencer"),
+    "hadMember": ("prov:collection", "prov:entity")
+}
+
+
+
+def edge_endpoints(edge_type, attributes):
+    """
+    Determine the endpoints of an edge.
+
+    :param str edge_type: type of edge, e.g. used
+    :param collections.abc.Mapping attributes: edge's attributes
+    :return (str, str): IDs of edge's source and target
+    :raises ValueError: if edge type is unknown or an endpoint is missing
+    """
+    try:
+        source_role, target_role = ENDPOINT_ROLES[edge_type]
+        return attributes[source_role], attributes[target_role]
+    except KeyError as e:
+        raise ValueError("Can't determine endpoints of {} edge: missing "
+                         "{}".format(edge_type, e))
+
 
 
+def record_edges(record):
+    """
+    Extract the edges that an edge record describes. A record may describe
+    several edges of its type, keyed by ID, and several edges may share an
+    ID, so each is identified by its ID and position.
 
+    :param collections.abc.Mapping record: provenance record of edge type
+    :return generator((str, int), str, str, dict): for each edge, its ID and
+        position, source, target, and attributes other than its endpoints
+    :raises ValueError: if an edge lacks an endpoint
+    """
+    edge_type = record[DOCTYPE_KEY]
+    roles = ENDPOINT_ROLES.get(edge_type, ())
+    for edge_id, data in record.get(FIELDS_KEY, {}).items():
+        for position, attributes in enumerate(
+                data if isinstance(data, list) else [data]):
+            source, target = edge_endpoints(edge_type, attributes)
+            extra = {name: value for name, value in attributes.items()
+                     if name not in roles}
+            yield (edge_id, position), source, target, extra
@@ -0,0 +1,257 @@
+""" Lineage: what provenance instances derive from, or what derives from them.
+
+Traversal is breadth-first, a hop at a time. Each hop asks for the
+neighbors of the whole frontier at once, so that the number of round trips
+to the cluster grows with the depth of the lineage rather than with the
+number of instances in it. Instances are produced as they're reached, so
+that a deep lineage is reported as it's traced.
+
+"""
+
+import itertools
+import logging
+
+from esprov import DOCTYPE_KEY, FIELDS_KEY, INSTANCE_KEY
+from esprov.graph.edges import record_edges
+from esprov.options import \
+    DOWNSTREAM_NAME, LINEAGE_DIRECTIONS, LINEAGE_RELATIONS, UPSTREAM_NAME
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.graph.lineage"
+
+
+__all__ = ["IndexedEdges", "RecordEdges", "walk"]
+
+
+# Frontier instances per terms query, to keep request bodies bounded
+TERMS_CHUNK_SIZE = 1000
+# Edges per lookup in the multi-search; a lookup that hits more is scanned.
+LOOKUP_SIZE = 1000
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def walk(neighbors, starts, max_depth=None, max_fanout=None):
+    """
+    Trace a lineage breadth-first from the given instances.
+
+    :param callable neighbors: function that, given a hop's frontier (a list
+        of instance IDs), produces (instance, neighbor, relationship type)
+        for each of the frontier's edges to follow
+    :param collections.abc.Iterable(str) starts: IDs of instances from
+        which to trace
+    :param int max_depth: number of hops to make at most; unlimited by
+        default
+    :param int max_fanout: number of neighbors to follow at most from each
+        instance; unlimited by default
+    :return generator(dict): for each instance reached, its ID, the number
+        of hops to it, and the instance and relationship by which it was
+        first reached
+    :raises ValueError: if a limit is less than 1
+    """
+    for name, limit in [("depth", max_depth), ("fanout", max_fanout)]:
+        if limit is not None and limit < 1:
+            raise ValueError("Lineage {} limit must be at least 1: {}".format(
+                    name, limit))
+    return _walked(neighbors, starts, max_depth, max_fanout)
+
+
+
+def _walked(neighbors, starts, max_depth, max_fanout):
+    visited = set(starts)
+    frontier = sorted(visited)
+    for depth in itertools.count(1):
+        if not frontier or (max_depth is not None and depth > max_depth):
+            return
+        LOGGER.debug("Hop %d: frontier of %d", depth, len(frontier))
+        found = {}
+        for node, neighbor, edge_type in neighbors(frontier):
+            found.setdefault(node, {}).setdefault(neighbor, edge_type)
+        next_frontier = []
+        for node in frontier:
+            relations = found.get(node, {})
+            candidates = sorted(neighbor for neighbor in relations
+                                if neighbor not in visited)
+            if max_fanout is not None and len(candidates) > max_fanout:
+                LOGGER.warning("Following %d of %d neighbors of %s",
+                               max_fanout, len(candidates), node)
+                candidates = candidates[:max_fanout]
+            for neighbor in candidates:
+                if neighbor in visited:
+                    # Reached from an earlier instance of this frontier
+                    continue
+                visited.add(neighbor)
+                next_frontier.append(neighbor)
+                yield {INSTANCE_KEY: neighbor, "depth": depth, "from": node,
+                       "relation": relations[neighbor]}
+        frontier = next_frontier
+
+
+
+def chained(sources):
+    """
+    Combine sources of edges for a lineage walk into one.
+
+    :param collections.abc.Iterable(callable) sources: sources of edges,
+        each called with a hop's frontier
+    :return callable: source of the edges that any of the sources has
+    """
+    sources = list(sources)
+    def neighbors(frontier):
+        return itertools.chain.from_iterable(
+                source(frontier) for source in sources)
+    return neighbors
+
+
+
+class IndexedEdges(object):
+    """ Edges of the given relationship types, looked up by endpoint. """
+
+    def __init__(self, es_client, index, direction=UPSTREAM_NAME,
+                 edge_types=LINEAGE_RELATIONS):
+        """
+        The edge indices to search and the direction of traversal define a
+        source of edges for a lineage walk.
+
+        Edges are looked up in the edge indices that ingestion maintains
+        (see esprov.provda_edge): each hop is a single multi-search, with a
+        terms query on the frontier per relationship type.
+
+        :param elasticsearch.client.Elasticsearch es_client: client with
+            which to conduct the lookups
+        :param str index: expression for the edge indices to search
+        :param str direction: upstream, to follow edges from what depends
+            to what it depends on, or downstream, for the reverse
+        :param collections.abc.Iterable(str) edge_types: names of the
+            relationship types to follow
+        :raises ValueError: if direction or a relationship type is unknown
+        """
+        self.direction, self.edge_types = \
+            _validated(direction, edge_types)
+        self.es_client = es_client
+        self.index = index
+
+
+    def __call__(self, frontier):
+        """
+        Find the edges to follow from a hop's frontier.
+
+        :param list[str] frontier: IDs of instances reached on last hop
+        :return generator((str, str, str)): instance, neighbor, and
+            relationship type of each edge to follow
+        """
+        # Import here so that the traversal itself needs no Elasticsearch.
+        from elasticsearch_dsl import Search
+        from esprov.provda_edge import RELATION_KEY, SOURCE_KEY, TARGET_KEY
+        from esprov.utilities import multi_search, planned_hits
+        near, far = (SOURCE_KEY, TARGET_KEY) \
+            if self.direction == UPSTREAM_NAME else (TARGET_KEY, SOURCE_KEY)
+        # An expression may name an edge index that's yet to be created.
+        search = Search(using=self.es_client, index=self.index).source(
+                includes=[near, far, RELATION_KEY]).params(
+                ignore_unavailable=True)
+        lookups = [
+            search.filter("term", **{RELATION_KEY: edge_type}).filter(
+                    "terms", **{near: frontier[start:start +
+                                               TERMS_CHUNK_SIZE]})
+            for edge_type in self.edge_types
+            for start in range(0, len(frontier), TERMS_CHUNK_SIZE)
+        ]
+        for lookup, response in multi_search(
+                self.es_client,
+                ((lookup, lookup[:LOOKUP_SIZE]) for lookup in lookups)):
+            if response.hits.total > len(response.hits):
+                # Too many for one response; read them all, as needed.
+                LOGGER.debug("Scanning %d edges", response.hits.total)
+                response = planned_hits(lookup)
+            for hit in response:
+                yield hit[near], hit[far], hit[RELATION_KEY]
+
+
+
+class RecordEdges(object):
+    """ Edges of the given relationship types, read from their records. """
+
+    def __init__(self, search, direction=UPSTREAM_NAME,
+                 edge_types=LINEAGE_RELATIONS):
+        """
+        The records to read and the direction of traversal define a source
+        of edges for a lineage walk.
+
+        This serves records without edge indices, e.g. those stored by
+        logstash rather than by esprov. An edge record's endpoints are held
+        in its @fields, which isn't indexed, so edges can't be looked up by
+        endpoint. Instead, the records of each relationship type are read
+        once, on the first hop, and later hops are answered from the edges
+        so collected.
+
+        :param elasticsearch_dsl.search.Search search: search of the
+            indices that hold the records
+        :param str direction: upstream, to follow edges from what depends
+            to what it depends on, or downstream, for the reverse
+        :param collections.abc.Iterable(str) edge_types: names of the
+            relationship types to follow
+        :raises ValueError: if direction or a relationship type is unknown
+        """
+        self.direction, self.edge_types = \
+            _validated(direction, edge_types)
+        self.search = search
+        self._adjacency = None
+
+
+    def __call__(self, frontier):
+        """
+        Find the edges to follow from a hop's frontier.
+
+        :param list[str] frontier: IDs of instances reached on last hop
+        :return generator((str, str, str)): instance, neighbor, and
+            relationship type of each edge to follow
+        """
+        if self._adjacency is None:
+            self._adjacency = self._read()
+        for node in frontier:
+            for neighbor, edge_type in self._adjacency.get(node, ()):
+                yield node, neighbor, edge_type
+
+
+    def _read(self):
+        # Import here so that the traversal itself needs no Elasticsearch.
+        from esprov.utilities import planned_hits
+        search = self.search.filter(
+                "terms", **{DOCTYPE_KEY: self.edge_types}).source(
+                includes=[DOCTYPE_KEY, FIELDS_KEY])
+        adjacency = {}
+        for hit in planned_hits(search):
+            record = hit.to_dict()
+            for _, source, target, _ in record_edges(record):
+                if self.direction == DOWNSTREAM_NAME:
+                    source, target = target, source
+                adjacency.setdefault(source, []).append(
+                        (target, record[DOCTYPE_KEY]))
+        LOGGER.debug("Read %d instance(s)' edges", len(adjacency))
+        return adjacency
+
+
+
+def _validated(direction, edge_types):
+    """
+    Ensure that a direction and relationship types of traversal are known.
+
+    :param str direction: direction of traversal
+    :param collections.abc.Iterable(str) edge_types: relationship types
+    :return (str, list[str]): direction and relationship types
+    :raises ValueError: if direction or a relationship type is unknown
+    """
+    if direction not in LINEAGE_DIRECTIONS:
+        raise ValueError("Unknown lineage direction: {}".format(direction))
+    edge_types = list(edge_types)
+    unknown = [name for name in edge_types if name not in LINEAGE_RELATIONS]
+    if unknown:
+        raise ValueError("Unknown lineage relation(s): {}".format(
+                ", ".join(unknown)))
+    return direction, edge_types
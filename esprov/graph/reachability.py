@@ -0,0 +1,515 @@
+""" Persisted reachability (lineage) of provenance instances.
+
+Questions such as "what raw inputs does this output depend on?" are asked
+of the same instances again and again. Once an instance's lineage, in a
+direction and over a set of relationship types, has been traced, it's kept
+in a SQLite database, to be answered again by an indexed lookup. A lineage
+traced to a limited depth is kept with that bound, and answers again only
+for walks that go no deeper.
+
+A new edge can only extend the upstream lineages that reach (or start
+from) its source, and the downstream lineages that reach (or start from)
+its target, so as edges are ingested, just those lineages are dropped, to
+be traced again when next asked for; the rest remain valid. New edges are
+found in the edge indices by their time of ingestion (see
+esprov.provda_edge), at most once per sync interval. Deleted edges leave no
+such trace, so removing an index drops every lineage traced from edge
+indices that may include its edges.
+
+"""
+
+import fnmatch
+import heapq
+import logging
+import os
+import sqlite3
+import time
+
+from esprov import INSTANCE_KEY
+from esprov.graph.lineage import walk
+from esprov.options import DOWNSTREAM_NAME, UPSTREAM_NAME
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.graph.reachability"
+
+
+__all__ = ["ReachabilityCache", "cached_walk", "forget_edge_indices",
+           "reachability_cache", "sync_edges"]
+
+
+# Name of the database file, in the result cache folder
+DATABASE_NAME = "reachability.sqlite"
+
+# Seconds between checks of the edge indices for new edges
+DEFAULT_SYNC_INTERVAL = 60
+
+# Milliseconds by which each check reaches back before the latest edge
+# seen, for edges that were stamped then but visible to search only later
+DEFAULT_SYNC_MARGIN = 5 * 60 * 1000
+
+# Version of the schema below; a database of an earlier one is emptied.
+SCHEMA_VERSION = 1
+
+# A lineage's bound is the depth to which it was traced, null if to its end.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lineages (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    node TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    relations TEXT NOT NULL,
+    bound INTEGER,
+    UNIQUE (scope, node, direction, relations)
+);
+CREATE TABLE IF NOT EXISTS reached (
+    lineage INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    instance TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    parent TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    PRIMARY KEY (lineage, position)
+);
+CREATE INDEX IF NOT EXISTS reached_instance ON reached (instance);
+CREATE TABLE IF NOT EXISTS syncs (
+    scope TEXT PRIMARY KEY,
+    mark INTEGER,
+    checked REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS applied (
+    scope TEXT NOT NULL,
+    edge TEXT NOT NULL,
+    ingested INTEGER NOT NULL,
+    PRIMARY KEY (scope, edge)
+);
+"""
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def cached_walk(cache, scope, neighbors, starts, direction, edge_types,
+                max_depth=None):
+    """
+    Trace lineages as does esprov.graph.lineage.walk, serving each starting
+    instance's from the cache if it's there, to at least the depth asked
+    for, and tracing it (and caching it, once traced to its end) if not.
+
+    A lineage that's traced is traced only as far as the depth asked for,
+    and cached with that bound, unless it ends short of it; it serves later
+    walks of no greater depth. Instances are produced as they're found, so
+    a walk from a single start streams as does an uncached one; those from
+    more than one start are merged by depth as they're traced.
+
+    :param ReachabilityCache cache: cache of traced lineages
+    :param str scope: indices from which edges are drawn
+    :param callable neighbors: source of edges for a lineage walk, e.g.
+        esprov.graph.lineage.IndexedEdges
+    :param collections.abc.Iterable(str) starts: IDs of instances from
+        which to trace
+    :param str direction: direction that the neighbors follow
+    :param collections.abc.Iterable(str) edge_types: relationship types
+        that the neighbors follow
+    :param int max_depth: maximum number of hops to follow
+    :return generator(dict): instances of the lineages, nearest first; one
+        reached from more than one start is produced once, at the least
+        depth
+    :raises ValueError: if maximum depth is less than 1
+    """
+    if max_depth is not None and max_depth < 1:
+        raise ValueError("Maximum depth must be positive; got {}".
+                         format(max_depth))
+    return _cached_walked(cache, scope, neighbors, sorted(set(starts)),
+                          direction, edge_types, max_depth)
+
+
+
+def _cached_walked(cache, scope, neighbors, starts, direction, edge_types,
+                   max_depth):
+    lineages = []
+    for order, start in enumerate(starts):
+        found = cache.lineage(scope, start, direction, edge_types,
+                              max_depth=max_depth)
+        if found is None:
+            found = _traced(cache, scope, neighbors, start, direction,
+                            edge_types, max_depth)
+        lineages.append(_ranked(order, found))
+    produced = set(starts)
+    for _, _, _, result in heapq.merge(*lineages):
+        if result[INSTANCE_KEY] not in produced:
+            produced.add(result[INSTANCE_KEY])
+            yield result
+
+
+
+def _ranked(order, found):
+    # Start and position break ties of depth, so results aren't compared.
+    for position, result in enumerate(found):
+        yield result["depth"], order, position, result
+
+
+
+def _traced(cache, scope, neighbors, start, direction, edge_types,
+            max_depth):
+    LOGGER.debug("Tracing %s lineage of %s", direction, start)
+    found = []
+    for result in walk(neighbors, [start], max_depth=max_depth):
+        found.append(result)
+        yield result
+    # A lineage that ends short of the bound is complete.
+    deepest = max([result["depth"] for result in found] or [0])
+    bound = None if max_depth is None or deepest < max_depth else max_depth
+    cache.store(scope, start, direction, edge_types, found, bound=bound)
+
+
+
+def forget_edge_indices(edge_indices):
+    """
+    Drop the cached lineages traced from edge indices that are removed (or
+    that have edges deleted), from the reachability cache in the result
+    cache folder, if there is one.
+
+    :param collections.abc.Iterable(str) edge_indices: names of the edge
+        indices
+    :return int: number of lineages dropped
+    """
+    path = _database_path()
+    if not os.path.isfile(path):
+        return 0
+    cache = ReachabilityCache(path)
+    try:
+        return cache.forget(edge_indices)
+    finally:
+        cache.close()
+
+
+
+def reachability_cache():
+    """
+    Get the reachability cache in the result cache folder (named by the
+    ESPROV_CACHE_DIR environment variable, or ~/.esprov/cache by default).
+
+    :return ReachabilityCache: cache of traced lineages
+    """
+    path = _database_path()
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    return ReachabilityCache(path)
+
+
+
+def _database_path():
+    from esprov.result_cache import CACHE_DIR_VARNAME, DEFAULT_CACHE_DIR
+    directory = os.path.expanduser(
+            os.environ.get(CACHE_DIR_VARNAME, DEFAULT_CACHE_DIR))
+    return os.path.join(directory, DATABASE_NAME)
+
+
+
+def sync_edges(cache, es_client, index):
+    """
+    Invalidate the cached lineages that edges ingested since the last sync
+    extend, if the sync interval has passed.
+
+    :param ReachabilityCache cache: cache to bring up to date
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to search the edge indices
+    :param str index: expression for the edge indices, as for a search;
+        it's the scope of the lineages cached from them
+    :return int: number of lineages invalidated
+    """
+    due, since = cache.sync_due(index)
+    if not due:
+        return 0
+    # Import here so that the cache itself needs no Elasticsearch.
+    from elasticsearch_dsl import Search
+    from esprov.provda_edge import \
+        INGESTED_KEY, RELATION_KEY, SOURCE_KEY, TARGET_KEY
+    from esprov.utilities import planned_hits
+    search = Search(using=es_client, index=index).params(
+            ignore_unavailable=True)
+    if since is None:
+        # Nothing's cached from these indices yet; just note the latest.
+        probe = search[:0]
+        probe.aggs.metric("latest", "max", field=INGESTED_KEY)
+        latest = probe.execute().aggregations.latest.value
+        return cache.synced(index, [], latest=latest)
+    search = search.filter("range", **{INGESTED_KEY: {"gte": since}}).source(
+            includes=[SOURCE_KEY, TARGET_KEY, RELATION_KEY, INGESTED_KEY])
+    edges = ((hit.meta.id, hit[INGESTED_KEY], hit[SOURCE_KEY],
+              hit[TARGET_KEY], hit[RELATION_KEY])
+             for hit in planned_hits(search))
+    return cache.synced(index, edges)
+
+
+
+class ReachabilityCache(object):
+    """ SQLite database of traced lineages, by instance. """
+
+    def __init__(self, path, sync_interval=DEFAULT_SYNC_INTERVAL,
+                 sync_margin=DEFAULT_SYNC_MARGIN):
+        """
+        Database path and sync timing define a cache.
+
+        :param str path: path to database file, created if needed; or
+            :memory: for a cache that lasts only as long as the instance
+        :param int | float sync_interval: seconds between checks for new
+            edges
+        :param int sync_margin: milliseconds by which each check for new
+            edges reaches back before the latest edge seen
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.sync_margin = sync_margin
+        self._connection = sqlite3.connect(path, timeout=10)
+        version, = self._connection.execute(
+                "PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            # It's only a cache, so what an older version kept is dropped.
+            self._connection.executescript(
+                    "DROP TABLE IF EXISTS lineages; "
+                    "DROP TABLE IF EXISTS reached; "
+                    "DROP TABLE IF EXISTS syncs; "
+                    "DROP TABLE IF EXISTS applied; "
+                    "PRAGMA user_version = {};".format(SCHEMA_VERSION))
+        self._connection.executescript(SCHEMA)
+
+
+    def close(self):
+        """ Close the database. """
+        self._connection.close()
+
+
+    def lineage(self, scope, node, direction, edge_types, max_depth=None):
+        """
+        Look up a cached lineage.
+
+        :param str scope: indices from which the lineage was traced
+        :param str node: ID of instance from which the lineage was traced
+        :param str direction: direction of the lineage, upstream or
+            downstream
+        :param collections.abc.Iterable(str) edge_types: relationship types
+            followed
+        :param int max_depth: number of hops to which to limit the lineage;
+            unlimited by default
+        :return list[dict] | NoneType: instances of the lineage, nearest
+            first, as the lineage walk produced them; or null if the
+            lineage isn't cached, or is cached only to a lesser depth
+        """
+        row = self._connection.execute(
+                "SELECT id, bound FROM lineages WHERE scope = ? AND "
+                "node = ? AND direction = ? AND relations = ?",
+                (scope, node, direction, _relations(edge_types))).fetchone()
+        if row is None:
+            return None
+        bound = row[1]
+        if bound is not None and (max_depth is None or max_depth > bound):
+            return None
+        query = "SELECT instance, depth, parent, relation FROM reached " \
+                "WHERE lineage = ?"
+        params = [row[0]]
+        if max_depth is not None:
+            query += " AND depth <= ?"
+            params.append(max_depth)
+        return [{INSTANCE_KEY: instance, "depth": depth, "from": parent,
+                 "relation": relation}
+                for instance, depth, parent, relation in
+                self._connection.execute(query + " ORDER BY position",
+                                         params)]
+
+
+    def store(self, scope, node, direction, edge_types, found, bound=None):
+        """
+        Cache a lineage, traced without fanout limit, replacing any cached
+        before.
+
+        :param str scope: indices from which the lineage was traced
+        :param str node: ID of instance from which the lineage was traced
+        :param str direction: direction of the lineage, upstream or
+            downstream
+        :param collections.abc.Iterable(str) edge_types: relationship types
+            followed
+        :param collections.abc.Iterable(dict) found: instances of the
+            lineage, as the lineage walk produced them
+        :param int bound: number of hops to which the lineage was traced;
+            null (the default) if it was traced to its end
+        """
+        with self._connection:
+            self._delete(self._connection.execute(
+                    "SELECT id FROM lineages WHERE scope = ? AND node = ? "
+                    "AND direction = ? AND relations = ?",
+                    (scope, node, direction, _relations(edge_types))))
+            lineage = self._connection.execute(
+                    "INSERT INTO lineages (scope, node, direction, "
+                    "relations, bound) VALUES (?, ?, ?, ?, ?)",
+                    (scope, node, direction, _relations(edge_types),
+                     bound)).lastrowid
+            self._connection.executemany(
+                    "INSERT INTO reached VALUES (?, ?, ?, ?, ?, ?)",
+                    [(lineage, position, result[INSTANCE_KEY],
+                      result["depth"], result["from"], result["relation"])
+                     for position, result in enumerate(found)])
+
+
+    def invalidate(self, scope, edges):
+        """
+        Drop the cached lineages that new edges extend.
+
+        :param str scope: indices to which the edges were added
+        :param collections.abc.Iterable((str, str, str)) edges: source,
+            target, and relationship type of each new edge
+        :return int: number of lineages dropped
+        """
+        with self._connection:
+            return self._invalidated(scope, edges)
+
+
+    def forget(self, edge_indices):
+        """
+        Drop the cached lineages, and the sync state, of every scope that
+        covers any of the given edge indices, e.g. as they're removed.
+
+        :param collections.abc.Iterable(str) edge_indices: names of the
+            edge indices
+        :return int: number of lineages dropped
+        """
+        edge_indices = set(edge_indices)
+        with self._connection:
+            scopes = [scope for scope, in self._connection.execute(
+                    "SELECT DISTINCT scope FROM lineages UNION "
+                    "SELECT scope FROM syncs")
+                      if any(_covers(scope, name) for name in edge_indices)]
+            dropped = []
+            for scope in scopes:
+                dropped.extend(self._connection.execute(
+                        "SELECT id FROM lineages WHERE scope = ?",
+                        (scope, )))
+                self._connection.execute(
+                        "DELETE FROM syncs WHERE scope = ?", (scope, ))
+                self._connection.execute(
+                        "DELETE FROM applied WHERE scope = ?", (scope, ))
+            self._delete(dropped)
+        if dropped:
+            LOGGER.debug("Dropped %d lineage(s) of removed edge indices",
+                         len(dropped))
+        return len(dropped)
+
+
+    def sync_due(self, scope, now=None):
+        """
+        Determine whether to check for new edges, and from when.
+
+        :param str scope: indices to check
+        :param float now: current time, in seconds since the epoch
+        :return (bool, int | NoneType): whether a check is due, and the
+            ingestion time (epoch milliseconds) from which to check, or
+            null if the indices haven't been checked before
+        """
+        now = time.time() if now is None else now
+        row = self._connection.execute(
+                "SELECT mark, checked FROM syncs WHERE scope = ?",
+                (scope, )).fetchone()
+        if row is None:
+            return True, None
+        mark, checked = row
+        if now - checked < self.sync_interval:
+            return False, None
+        return True, 0 if mark is None else int(mark) - self.sync_margin
+
+
+    def synced(self, scope, edges, latest=None, now=None):
+        """
+        Record a check for new edges, dropping the lineages extended by
+        those not seen before.
+
+        :param str scope: indices checked
+        :param collections.abc.Iterable((str, int, str, str, str)) edges:
+            ID, ingestion time, source, target, and relationship type of
+            each edge found by the check
+        :param int | float latest: latest ingestion time in the indices,
+            if known without edges, e.g. for a first check
+        :param float now: current time, in seconds since the epoch
+        :return int: number of lineages dropped
+        """
+        now = time.time() if now is None else now
+        with self._connection:
+            row = self._connection.execute(
+                    "SELECT mark FROM syncs WHERE scope = ?",
+                    (scope, )).fetchone()
+            mark = latest if row is None or row[0] is None else \
+                max(row[0], latest or row[0])
+            new_edges = []
+            for edge_id, ingested, source, target, edge_type in edges:
+                if self._connection.execute(
+                        "SELECT 1 FROM applied WHERE scope = ? AND edge = ?",
+                        (scope, edge_id)).fetchone():
+                    continue
+                self._connection.execute(
+                        "INSERT INTO applied VALUES (?, ?, ?)",
+                        (scope, edge_id, ingested))
+                new_edges.append((source, target, edge_type))
+                mark = ingested if mark is None else max(mark, ingested)
+            dropped = self._invalidated(scope, new_edges)
+            if mark is not None:
+                # Edges older than the margin won't be seen again.
+                self._connection.execute(
+                        "DELETE FROM applied WHERE scope = ? AND "
+                        "ingested < ?", (scope, mark - self.sync_margin))
+            self._connection.execute(
+                    "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)",
+                    (scope, None if mark is None else int(mark), now))
+        if new_edges:
+            LOGGER.debug("%d new edge(s) invalidated %d lineage(s)",
+                         len(new_edges), dropped)
+        return dropped
+
+
+    def _invalidated(self, scope, edges):
+        dropped = set()
+        for source, target, edge_type in edges:
+            # An upstream lineage is extended if it reaches the source, and
+            # a downstream one if it reaches the target.
+            for direction, endpoint in [(UPSTREAM_NAME, source),
+                                        (DOWNSTREAM_NAME, target)]:
+                rows = self._connection.execute(
+                        "SELECT id, relations FROM lineages WHERE scope = ? "
+                        "AND direction = ? AND node = ? UNION "
+                        "SELECT l.id, l.relations FROM lineages l "
+                        "JOIN reached r ON r.lineage = l.id "
+                        "WHERE l.scope = ? AND l.direction = ? "
+                        "AND r.instance = ?",
+                        (scope, direction, endpoint,
+                         scope, direction, endpoint))
+                dropped.update(lineage for lineage, relations in rows
+                               if edge_type in relations.split(","))
+        self._delete((lineage, ) for lineage in dropped)
+        return len(dropped)
+
+
+    def _delete(self, lineages):
+        lineages = list(lineages)
+        self._connection.executemany(
+                "DELETE FROM reached WHERE lineage = ?", lineages)
+        self._connection.executemany(
+                "DELETE FROM lineages WHERE id = ?", lineages)
+
+
+
+def _covers(scope, name):
+    # Whether an index expression (a scope) may take in the named index
+    parts = [part.strip() for part in scope.split(",") if part.strip()]
+    if any(fnmatch.fnmatchcase(name, part[1:]) for part in parts
+           if part.startswith("-")):
+        return False
+    return any(part == "_all" or fnmatch.fnmatchcase(name, part)
+               for part in parts if not part.startswith("-"))
+
+
+
+def _relations(edge_types):
+    return ",".join(sorted(set(edge_types)))
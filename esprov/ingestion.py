@@ -0,0 +1,430 @@
+""" Bulk ingestion of provda records into Elasticsearch. """
+
+import itertools
+import logging
+import multiprocessing
+import time
+
+from elasticsearch.helpers import bulk
+
+from esprov import DOCTYPE_KEY
+from esprov.client import make_client
+from esprov.partitions import record_partition
+from esprov.provda_edge import \
+    edge_documents, edge_index, ProvdaEdge, INGESTED_KEY
+from esprov.provda_record import ProvdaRecord, record_id
+from esprov.reader import JsonLinesReader
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.ingestion"
+
+
+# Number of records per bulk request; ES guidance is to aim for bodies of
+# a few megabytes, and provda records are on the order of a kilobyte.
+DEFAULT_CHUNK_SIZE = 500
+
+# Status of a create-only action for a document ID that's already taken
+CONFLICT_STATUS = 409
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def read_records(path, start=0, end=None):
+    """
+    Parse provenance records from a JSON-lines file, e.g. the one that's
+    written by the 'file' output of the logstash provda pipeline.
+
+    :param str path: path to JSON-lines file
+    :param int start: byte offset at which to begin reading; aligned
+        forward to the beginning of a line
+    :param int end: byte offset at which to stop reading; a line that
+        begins before this offset is read in full; optional, read to the
+        end of the file if omitted
+    :return generator(dict): provenance record parsed from each line;
+        blank lines and records lacking a provenance type are skipped
+    """
+    with JsonLinesReader(path) as reader:
+        for record in reader.records(start=start, end=end):
+            # Logstash may interleave its own non-provenance events.
+            if DOCTYPE_KEY not in record:
+                LOGGER.debug("Skipping non-provenance record: %s", record)
+                continue
+            yield record
+
+
+
+def shard_offsets(path, num_shards):
+    """
+    Divide a JSON-lines file into contiguous byte ranges, each of which
+    begins at the start of a line, for independent parsing.
+
+    :param str path: path to JSON-lines file
+    :param int num_shards: number of ranges desired; fewer may be produced
+        for a small file, as empty ranges are omitted
+    :return list[(int, int)]: start and end byte offset for each shard
+    :raises ValueError: if number of shards is not positive
+    """
+    if num_shards < 1:
+        raise ValueError("Shard count must be positive; got {}".
+                         format(num_shards))
+    with JsonLinesReader(path) as reader:
+        size = reader.size
+        # Advance each naive boundary to the beginning of a line.
+        boundaries = [reader.align(size * i // num_shards)
+                      for i in range(num_shards)] + [size]
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:])
+            if end > start]
+
+
+
+def bulk_actions(records, index):
+    """
+    Wrap each record as a create-only bulk API action targeting the given
+    index, with document ID derived from the record's identity fields. A
+    record that's already been indexed is thus rejected rather than
+    duplicated, making a repeated load a no-op.
+
+    :param collections.abc.Iterable(dict) records: provenance records
+    :param str index: name of index in which to store records; optional,
+        if null each record is routed to the daily partition for its
+        timestamp
+    :return generator(dict): bulk action for each record
+    """
+    doc_type = ProvdaRecord._doc_type.name
+    for record in records:
+        yield {"_op_type": "create",
+               "_index": index or record_partition(record),
+               "_type": doc_type, "_id": record_id(record),
+               "_source": record}
+
+
+
+def unroutable(records, index):
+    """
+    Separate the records that can't be routed to a daily partition, for
+    lack of a timestamp with a date, from those that can.
+
+    :param list[dict] records: provenance records
+    :param str index: name of index in which to store records; optional,
+        if null each record is routed to the daily partition for its
+        timestamp, and otherwise every record is routable
+    :return (list[dict], list[dict]): records that can be routed, and a
+        bulk-item-like error for each that can't
+    """
+    if index:
+        return records, []
+    routable, errors = [], []
+    for record in records:
+        try:
+            record_partition(record)
+        except ValueError as e:
+            errors.append({"create": {
+                "_type": ProvdaRecord._doc_type.name,
+                "_id": record_id(record), "error": str(e)}})
+        else:
+            routable.append(record)
+    return routable, errors
+
+
+
+def edge_actions(records, index):
+    """
+    Project each relationship record into create-only bulk API actions,
+    one per edge, targeting the edge index that corresponds to the
+    records' index, and stamped with the time of ingestion (in epoch
+    milliseconds). Edge document IDs derive from their record's, so that
+    reloading a record adds no edges either.
+
+    :param collections.abc.Iterable(dict) records: provenance records
+    :param str index: name of index in which records are stored; optional,
+        if null the records are routed to daily partitions
+    :return generator(dict): bulk action for each edge
+    """
+    doc_type = ProvdaEdge._doc_type.name
+    target = edge_index(index)
+    ingested = int(time.time() * 1000)
+    for record in records:
+        try:
+            edges = list(edge_documents(record))
+        except ValueError as e:
+            # The record itself is stored regardless; it's just unlinked.
+            LOGGER.warning("Skipping edges of record %s: %s",
+                           record_id(record), e)
+            continue
+        for document_id, document in edges:
+            document[INGESTED_KEY] = ingested
+            yield {"_op_type": "create", "_index": target,
+                   "_type": doc_type, "_id": document_id,
+                   "_source": document}
+
+
+
+def _is_edge(error):
+    """
+    Determine whether a bulk item error is for an edge document.
+
+    :param dict error: bulk response item for a failed action
+    :return bool: flag indicating whether the action was an edge's
+    """
+    return any(outcome.get("_type") == ProvdaEdge._doc_type.name
+               for outcome in error.values())
+
+
+
+def _is_conflict(error):
+    """
+    Determine whether a bulk item error is a create-only ID collision.
+
+    :param dict error: bulk response item for a failed action
+    :return bool: flag indicating whether the document already existed
+    """
+    return any(outcome.get("status") == CONFLICT_STATUS
+               for outcome in error.values())
+
+
+
+def chunked(items, size):
+    """
+    Partition an iterable into lists of (at most) a given size.
+
+    :param collections.abc.Iterable items: items to partition
+    :param int size: maximum number of items per chunk
+    :return generator(list): consecutive chunks of items
+    :raises ValueError: if chunk size is not positive
+    """
+    if size < 1:
+        raise ValueError("Chunk size must be positive; got {}".format(size))
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+
+class LoadReport(object):
+    """ Running tally of a bulk load's successes, failures, and throughput. """
+
+    def __init__(self):
+        """ A report begins with nothing loaded and the clock running. """
+        self.start = time.time()
+        self.chunks = 0
+        self.indexed = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.edges = 0
+        self.edges_failed = 0
+
+
+    @property
+    def elapsed(self):
+        """
+        Seconds since load began.
+
+        :return float: seconds since load began
+        """
+        return time.time() - self.start
+
+
+    @property
+    def docs_per_second(self):
+        """
+        Indexing throughput thus far.
+
+        :return float: number of documents indexed per second
+        """
+        elapsed = self.elapsed
+        return self.indexed / elapsed if elapsed > 0 else 0.0
+
+
+    def update(self, indexed, failed, duplicates=0, edges=0,
+               edges_failed=0):
+        """
+        Account for the outcome of a single bulk request.
+
+        :param int indexed: number of documents successfully indexed
+        :param int failed: number of documents rejected
+        :param int duplicates: number of documents already present
+        :param int edges: number of edge documents indexed
+        :param int edges_failed: number of edge documents rejected
+        """
+        self.chunks += 1
+        self.indexed += indexed
+        self.duplicates += duplicates
+        self.failed += failed
+        self.edges += edges
+        self.edges_failed += edges_failed
+
+
+    def to_dict(self):
+        """
+        Summarize the load.
+
+        :return dict: load summary, suitable for printing as CLI result
+        """
+        return {"chunks": self.chunks, "indexed": self.indexed,
+                "duplicates": self.duplicates, "failed": self.failed,
+                "edges": self.edges, "edges_failed": self.edges_failed,
+                "seconds": round(self.elapsed, 3),
+                "docs_per_second": round(self.docs_per_second, 1)}
+
+
+
+def load_records(es_client, records, index,
+                 chunk_size=DEFAULT_CHUNK_SIZE, report=None):
+    """
+    Stream records into an index through the bulk API, one request per chunk.
+    Each chunk's request also stores the edges of its relationship records
+    in the corresponding edge index (see esprov.provda_edge).
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to issue the bulk requests
+    :param collections.abc.Iterable(dict) records: provenance records
+    :param str index: name of index into which to load records; optional,
+        if null records are routed to daily partitions
+    :param int chunk_size: number of records per bulk request
+    :param esprov.ingestion.LoadReport report: tally to update; optional,
+        a new one is created if omitted
+    :return generator(dict): summary for each chunk, with the number of
+        records indexed, already present, and failed, the number of edges
+        indexed and failed, and any failure reasons
+    """
+    report = report or LoadReport()
+    for chunk in chunked(records, chunk_size):
+        # A record that can't be routed fails alone, edges and all.
+        routable, unrouted = unroutable(chunk, index)
+        actions = list(bulk_actions(routable, index))
+        edges = list(edge_actions(routable, index))
+        # Keep each chunk as a single request; gather rather than raise
+        # errors so that one bad record doesn't abort the whole load.
+        stored, errors = bulk(es_client, actions + edges,
+                              chunk_size=len(actions) + len(edges),
+                              raise_on_error=False) if actions else (0, [])
+        errors = unrouted + errors
+        edge_errors = [error for error in errors if _is_edge(error)]
+        record_errors = [error for error in errors if not _is_edge(error)]
+        # Collision on a derived ID means the record's already stored.
+        failures = [error for error in record_errors
+                    if not _is_conflict(error)]
+        edge_failures = [error for error in edge_errors
+                         if not _is_conflict(error)]
+        duplicates = len(record_errors) - len(failures)
+        edges_indexed = len(edges) - len(edge_errors)
+        indexed = stored - edges_indexed
+        report.update(indexed=indexed, failed=len(failures),
+                      duplicates=duplicates, edges=edges_indexed,
+                      edges_failed=len(edge_failures))
+        if failures:
+            LOGGER.warning("Chunk %d: %d of %d record(s) failed",
+                           report.chunks, len(failures), len(chunk))
+        LOGGER.debug("Chunk %d: %d indexed, %d already present "
+                     "(%.1f docs/sec overall)", report.chunks, indexed,
+                     duplicates, report.docs_per_second)
+        yield {"chunk": report.chunks, "indexed": indexed,
+               "duplicates": duplicates, "failed": len(failures),
+               "edges": edges_indexed, "edges_failed": len(edge_failures),
+               "errors": failures + edge_failures}
+
+
+
+def load_serial(es_client, path, index, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bulk-load a JSON-lines file within the current process.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to issue the bulk requests
+    :param str path: path to JSON-lines file
+    :param str index: name of index into which to load records; optional,
+        if null records are routed to daily partitions
+    :param int chunk_size: number of records per bulk request
+    :return generator(dict): summary of each chunk, followed by a summary
+        of the entire load with aggregate throughput
+    """
+    report = LoadReport()
+    for chunk_summary in load_records(es_client, read_records(path),
+                                      index=index, chunk_size=chunk_size,
+                                      report=report):
+        yield chunk_summary
+    yield report.to_dict()
+
+
+
+def _load_shard(shard_spec):
+    """
+    Worker for parallel load: bulk-load a single byte range of a file.
+
+    :param (list[dict], str, int, int, str, int) shard_spec: ES hosts,
+        path to JSON-lines file, start and end byte offsets of the shard,
+        name of target index, and number of records per bulk request
+    :return dict: summary of the shard's load
+    """
+    hosts, path, start, end, index, chunk_size = shard_spec
+    # Each worker process needs its own client; connections aren't
+    # safe to share across a fork. Other than hosts, it's configured
+    # like the parent's, e.g. with compression.
+    es_client = make_client(hosts=hosts)
+    report = LoadReport()
+    failed_chunks = [
+        chunk_summary for chunk_summary in load_records(
+            es_client, read_records(path, start=start, end=end),
+            index=index, chunk_size=chunk_size, report=report)
+        if chunk_summary["failed"]
+    ]
+    summary = report.to_dict()
+    summary.update({"start": start, "end": end,
+                    "failed_chunks": failed_chunks})
+    return summary
+
+
+
+def load_parallel(es_client, path, index, workers,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bulk-load a JSON-lines file with a pool of processes, one per shard.
+
+    The file is split into newline-aligned byte ranges, and each worker
+    parses its range and runs its own bulk pipeline against the same index.
+    The index (and its mapping), or the partitions' template, should
+    already exist.
+
+    :param elasticsearch.client.Elasticsearch es_client: client whose
+        hosts the workers should target
+    :param str path: path to JSON-lines file
+    :param str index: name of index into which to load records; optional,
+        if null records are routed to daily partitions
+    :param int workers: number of worker processes (and shards)
+    :param int chunk_size: number of records per bulk request
+    :return generator(dict): summary of each shard as it completes,
+        followed by a summary of the entire load with aggregate throughput
+    """
+    start = time.time()
+    hosts = es_client.transport.hosts
+    shard_specs = [(hosts, path, shard_start, shard_end, index, chunk_size)
+                   for shard_start, shard_end in shard_offsets(path, workers)]
+    LOGGER.debug("Loading %s in %d shard(s)", path, len(shard_specs))
+
+    totals = {"shards": len(shard_specs), "workers": workers,
+              "chunks": 0, "indexed": 0, "duplicates": 0, "failed": 0,
+              "edges": 0, "edges_failed": 0}
+    pool = multiprocessing.Pool(processes=workers)
+    try:
+        for shard_summary in pool.imap_unordered(_load_shard, shard_specs):
+            for key in ("chunks", "indexed", "duplicates", "failed",
+                        "edges", "edges_failed"):
+                totals[key] += shard_summary[key]
+            yield shard_summary
+    finally:
+        pool.close()
+        pool.join()
+
+    elapsed = time.time() - start
+    totals["seconds"] = round(elapsed, 3)
+    totals["docs_per_second"] = \
+        round(totals["indexed"] / elapsed, 1) if elapsed > 0 else 0.0
+    yield totals
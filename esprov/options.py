@@ -0,0 +1,34 @@
+""" Names of CLI options and choices, importable without any dependency.
+
+The CLI parser needs these, and it's built for every run, including those
+that end at --help or an argument error; keeping them apart from the
+subcommand functions spares such runs the import of Elasticsearch.
+
+"""
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.options"
+
+
+# Related to list_stages
+MONTHS_NAME = "months"
+LIST_STAGES_TIMESPANS = (MONTHS_NAME, "weeks", "days", "hours", "minutes")
+ES_TIME_CHARACTERS = ('M', 'w', 'd', 'H', 'm')
+TIME_CHAR_BY_CLI_PARAM = dict(zip(LIST_STAGES_TIMESPANS, ES_TIME_CHARACTERS))
+
+# Related to Index operations
+INDEX_CREATION_NAMES = {"insert", "create", "build"}
+INDEX_DELETION_NAMES = {"remove", "delete"}
+INDEX_EXISTENCE_NAMES = {"exists"}
+INDEX_OPERATION_NAMES = \
+    INDEX_EXISTENCE_NAMES | INDEX_CREATION_NAMES | INDEX_DELETION_NAMES
+
+# Related to lineage
+UPSTREAM_NAME = "upstream"
+DOWNSTREAM_NAME = "downstream"
+LINEAGE_DIRECTIONS = (UPSTREAM_NAME, DOWNSTREAM_NAME)
+LINEAGE_RELATIONS = ("used", "wasGeneratedBy", "wasInfluencedBy", "hadMember")
@@ -0,0 +1,192 @@
+""" Time-partitioned (daily) indices for provenance records.
+
+Records are routed by timestamp into one index per UTC day, e.g.
+provda-2016.11.06, each created on demand from an index template. A query
+confined to a recent timespan then need only search the few partitions that
+the timespan overlaps rather than every shard ever written.
+
+"""
+
+import datetime
+import json
+import os
+
+from esprov import TIMESTAMP_KEY
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.partitions"
+
+
+PARTITION_PREFIX = "provda-"
+PARTITION_DATE_FORMAT = "%Y.%m.%d"
+PARTITION_PATTERN = "{}*".format(PARTITION_PREFIX)
+TEMPLATE_NAME = "provda"
+
+# Mapping shared by all partitions, relative to the project root
+MAPPING_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "elasticsearch_mappings", "_default_.json"
+)
+
+# A month of lag spans at most this many days.
+DAYS_PER_MONTH = 31
+
+
+
+def partition_name(timestamp):
+    """
+    Determine the name of the partition for a record timestamp.
+
+    :param str | datetime.datetime timestamp: ISO-formatted UTC timestamp
+        text (as in a provda record) or datetime instance
+    :return str: name of daily index for the given timestamp
+    :raises ValueError: if timestamp text doesn't begin with a date
+    """
+    if not isinstance(timestamp, datetime.datetime):
+        # Only the date matters; ignore time and any fractional seconds.
+        timestamp = datetime.datetime.strptime(timestamp[:10], "%Y-%m-%d")
+    return "{}{}".format(PARTITION_PREFIX,
+                         timestamp.strftime(PARTITION_DATE_FORMAT))
+
+
+
+def partition_date(name):
+    """
+    Determine the day whose records a partition holds.
+
+    :param str name: name of a daily partition, e.g. provda-2016.11.06
+    :return datetime.date: the partition's day
+    :raises ValueError: if the name isn't that of a daily partition
+    """
+    if not name.startswith(PARTITION_PREFIX):
+        raise ValueError("Not a partition: {}".format(name))
+    return datetime.datetime.strptime(
+            name[len(PARTITION_PREFIX):], PARTITION_DATE_FORMAT).date()
+
+
+
+def is_partition(name):
+    """
+    Determine whether an index is a daily partition.
+
+    :param str name: name of index
+    :return bool: whether the name is that of a daily partition
+    """
+    try:
+        partition_date(name)
+    except ValueError:
+        return False
+    return True
+
+
+
+def record_partition(record):
+    """
+    Determine the name of the partition in which to store a record.
+
+    :param collections.abc.Mapping record: provenance record
+    :return str: name of daily index for the record's timestamp
+    :raises ValueError: if the record lacks a timestamp or has one that
+        doesn't begin with a date
+    """
+    try:
+        timestamp = record[TIMESTAMP_KEY]
+    except KeyError:
+        raise ValueError("Record lacks {}".format(TIMESTAMP_KEY))
+    if not isinstance(timestamp, (str, datetime.datetime)):
+        raise ValueError("Not a timestamp: {}".format(timestamp))
+    return partition_name(timestamp)
+
+
+
+def partitions_between(start, end):
+    """
+    Name each daily partition that a timespan overlaps.
+
+    :param datetime.datetime start: beginning of timespan (UTC)
+    :param datetime.datetime end: end of timespan (UTC)
+    :return list[str]: name of each partition overlapping the timespan,
+        in chronological order
+    """
+    day = start.date()
+    names = []
+    while day <= end.date():
+        names.append("{}{}".format(PARTITION_PREFIX,
+                                   day.strftime(PARTITION_DATE_FORMAT)))
+        day += datetime.timedelta(days=1)
+    return names
+
+
+
+def lag_timedelta(months=None, weeks=None, days=None,
+                  hours=None, minutes=None):
+    """
+    Convert time lag components to a single span. Since months vary in
+    length, a month is taken as its maximum length, so that the span
+    bounds the lag from above.
+
+    :param int months: months of lag
+    :param int weeks: weeks of lag
+    :param int days: days of lag
+    :param int hours: hours of lag
+    :param int minutes: minutes of lag
+    :return datetime.timedelta: span covering the given lag
+    """
+    days = int(days or 0) + DAYS_PER_MONTH * int(months or 0)
+    return datetime.timedelta(weeks=int(weeks or 0), days=days,
+                              hours=int(hours or 0),
+                              minutes=int(minutes or 0))
+
+
+
+def pruned_index_expression(index, lag, now=None):
+    """
+    Narrow a multi-index search to the partitions that a recent timespan
+    overlaps. Indices outside the partition scheme are left in place when
+    searching everything, so that only partition pruning changes.
+
+    :param str index: index expression given for the search
+    :param datetime.timedelta lag: span back from now of interest
+    :param datetime.datetime now: current UTC time; optional
+    :return str | NoneType: index expression covering the timespan, or
+        null if the given index expression doesn't admit pruning
+    """
+    if index not in ("_all", PARTITION_PATTERN):
+        return None
+    now = now or datetime.datetime.utcnow()
+    partitions = partitions_between(now - lag, now)
+    if index == PARTITION_PATTERN:
+        return ",".join(partitions)
+    # Everything except partitions, then add back the relevant partitions.
+    return ",".join(["*", "-{}".format(PARTITION_PATTERN)] + partitions)
+
+
+
+def template_body(mapping_path=MAPPING_PATH):
+    """
+    Build the index template for partitions from the shared mapping.
+
+    :param str mapping_path: path to JSON file with record mapping
+    :return dict: index template body
+    """
+    with open(mapping_path, 'r') as mapping_file:
+        mapping = json.load(mapping_file)
+    return {"template": PARTITION_PATTERN,
+            "mappings": {"_default_": mapping}}
+
+
+
+def put_template(es_client, mapping_path=MAPPING_PATH):
+    """
+    Install (or update) the index template with which partitions are created.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to install the template
+    :param str mapping_path: path to JSON file with record mapping
+    """
+    es_client.indices.put_template(name=TEMPLATE_NAME,
+                                   body=template_body(mapping_path))
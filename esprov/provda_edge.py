@@ -0,0 +1,206 @@
+""" Relationships (edges) of provda records, as documents of their own.
+
+A relationship record keeps its endpoints in its @fields, which isn't
+indexed (see esprov.provda_record), so records can't be searched by
+endpoint. At ingestion, each relationship record is therefore also
+projected into an edge document per edge, with source, target, and
+relationship type as keywords, stored in an edge index alongside the
+records' index: records in index X have their edges in X_edges, and those
+routed to daily partitions have theirs in provda_edges. A lineage hop is
+then a term lookup on endpoints. Edge indices are excluded from searches
+for records by wildcard (or _all), so edges aren't taken for records. Each
+edge document is also stamped with the time of its ingestion, by which
+edges new since a given time are found, e.g. to invalidate cached lineages
+that they extend.
+
+"""
+
+import datetime
+
+from elasticsearch_dsl import DocType, Mapping, MetaField
+
+from esprov import \
+    DOCTYPE_KEY, DOCUMENT_KEY, EDGE_NAMES, TIMESTAMP_KEY
+from esprov.graph.edges import record_edges
+from esprov.partitions import partition_date, PARTITION_PREFIX
+from esprov.provda_record import record_id
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.provda_edge"
+
+
+# Field names of an edge document
+SOURCE_KEY = "src"
+TARGET_KEY = "dst"
+RELATION_KEY = "rel"
+INGESTED_KEY = "ingested"
+
+EDGE_MAPPING = Mapping("ProvdaEdge")
+EDGE_MAPPING.field(SOURCE_KEY, "keyword")
+EDGE_MAPPING.field(TARGET_KEY, "keyword")
+EDGE_MAPPING.field(RELATION_KEY, "keyword")
+EDGE_MAPPING.field(DOCUMENT_KEY, "keyword")
+EDGE_MAPPING.field(TIMESTAMP_KEY, "date")
+EDGE_MAPPING.field(INGESTED_KEY, "date")
+
+# Edge index name is records' index name with this suffix; daily partitions
+# share the edge index named as if their records' index were the base.
+EDGE_INDEX_SUFFIX = "_edges"
+PARTITIONS_EDGE_BASE = "provda"
+
+# Days of partitions whose edges are deleted by a single request
+DELETION_CHUNK_SIZE = 500
+
+# An edge document's ID is its record's, then the edge's ID and position.
+EDGE_ID_DELIMITER = u":"
+
+
+
+def edge_index(index=None):
+    """
+    Name the index in which to store the edges of records.
+
+    :param str index: name of index in which records are stored; optional,
+        null for records routed to daily partitions
+    :return str: name of edge index
+    """
+    return u"{}{}".format(index or PARTITIONS_EDGE_BASE, EDGE_INDEX_SUFFIX)
+
+
+
+def edge_index_expression(index):
+    """
+    Name the edge indices that correspond to a records' index expression.
+    Every daily partition's edges are in the one edge index, so any name
+    or pattern of partitions corresponds to that.
+
+    :param str index: expression for indices of records, e.g. as given
+        to a search: a name, wildcard pattern, or comma-separated list,
+        or _all
+    :return str: expression for the corresponding edge indices
+    """
+    if index in (None, "", "_all"):
+        return u"*{}".format(EDGE_INDEX_SUFFIX)
+    names = []
+    for part in (part.strip() for part in index.split(",")):
+        if not part:
+            continue
+        name = edge_index(
+                None if part.startswith(PARTITION_PREFIX) else part)
+        if name not in names:
+            names.append(name)
+    return u",".join(names)
+
+
+
+def record_index_expression(index):
+    """
+    Exclude edge indices from a records' index expression, if it has a
+    wildcard (or is _all) that could match them.
+
+    :param str index: expression for indices of records, as for a search
+    :return str: expression for the same indices, less any edge index
+    """
+    exclusion = u"-*{}".format(EDGE_INDEX_SUFFIX)
+    if index in (None, "", "_all"):
+        return u"*,{}".format(exclusion)
+    if "*" in index:
+        return u"{},{}".format(index, exclusion)
+    return index
+
+
+
+def source_record_id(document_id):
+    """
+    Determine the ID of the record from which a document derives.
+
+    :param str document_id: ID of a record or of an edge document
+    :return str: ID of the record itself, or of the edge's record
+    """
+    return document_id.split(EDGE_ID_DELIMITER, 1)[0]
+
+
+
+def edge_documents(record):
+    """
+    Project a relationship record into a document per edge.
+
+    :param collections.abc.Mapping record: provenance record
+    :return generator((str, dict)): ID and body of each edge document; none
+        for a record that isn't of a relationship type
+    :raises ValueError: if an edge lacks an endpoint
+    """
+    if record.get(DOCTYPE_KEY) not in EDGE_NAMES:
+        return
+    parent = record_id(record)
+    for (edge_id, position), source, target, _ in record_edges(record):
+        document_id = EDGE_ID_DELIMITER.join(
+                [parent, u"{}".format(edge_id), u"{}".format(position)])
+        yield document_id, {
+            SOURCE_KEY: source, TARGET_KEY: target,
+            RELATION_KEY: record[DOCTYPE_KEY],
+            DOCUMENT_KEY: record.get(DOCUMENT_KEY),
+            TIMESTAMP_KEY: record.get(TIMESTAMP_KEY)
+        }
+
+
+
+def delete_partition_edges(es_client, partitions):
+    """
+    Delete the edges of the records of daily partitions, which share an
+    edge index with those of every other partition, by the day of their
+    records' timestamp.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to delete edges
+    :param collections.abc.Iterable(str) partitions: names of partitions
+        whose edges to delete
+    :return int: number of edges deleted
+    :raises ValueError: if a name isn't that of a daily partition
+    """
+    days = sorted({partition_date(name) for name in partitions})
+    deleted = 0
+    for start in range(0, len(days), DELETION_CHUNK_SIZE):
+        spans = [{"range": {TIMESTAMP_KEY: {
+                    "gte": day.isoformat(),
+                    "lt": (day + datetime.timedelta(days=1)).isoformat()}}}
+                 for day in days[start:start + DELETION_CHUNK_SIZE]]
+        response = es_client.delete_by_query(
+                index=edge_index(), body={"query": {"bool": {
+                    "should": spans, "minimum_should_match": 1}}},
+                conflicts="proceed", ignore=[404])
+        deleted += response.get("deleted", 0)
+    return deleted
+
+
+
+class ProvdaEdge(DocType):
+    """ Representation of a single edge of a provda relationship record. """
+
+
+    @classmethod
+    def init(cls, index, using=None):
+        """
+        Add edge mapping to ES index with ProvdaEdge.init(<index_name>),
+        creating the index if needed; require provision of both index and
+        client here, unlike superclass.
+
+        :param str index: ES index
+        :param elasticsearch.client.Elasticsearch | str using: ES client or
+            alias for one to use
+        """
+        super(ProvdaEdge, cls).init(index=index, using=using)
+
+
+    class Meta:
+        """ Edge documents hold only their endpoints and provenance. """
+
+        all = MetaField(enabled=False)
+        dynamic = MetaField("strict")
+
+        mapping = EDGE_MAPPING
@@ -8,6 +8,9 @@ https://stash.ihme.washington.edu/users/adolgert/repos/provda/browse.
 
 """
 
+import datetime
+import hashlib
+
 from elasticsearch_dsl import \
     Date, DocType, Integer, \
     Keyword, Mapping, Object, \
@@ -16,11 +19,12 @@ from elasticsearch_dsl import \
 from esprov import \
     DOCTYPE_KEY, MESSAGE_KEY, TIMESTAMP_KEY, \
     VERSION_KEY, DOCUMENT_KEY, INSTANCE_KEY, \
-    HOST_KEY, HOSTNAME_KEY, PORT_KEY, FIELDS_KEY
+    HOST_KEY, HOSTNAME_KEY, PORT_KEY, FIELDS_KEY, \
+    DOCUMENT_FIELDNAMES, DOCUMENT_TYPENAMES
 
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-19"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -51,6 +55,64 @@ MAPPING.field("port", "integer")
 MAPPING.field("@fields", "object", enabled=False)
 
 
+# Fields that together identify a record; a record replayed from a log
+# matches its original on each of these, so they determine the record's ID.
+IDENTITY_FIELDS = (DOCUMENT_KEY, INSTANCE_KEY, DOCTYPE_KEY, TIMESTAMP_KEY)
+IDENTITY_DELIMITER = u"\x1f"
+
+
+
+def record_id(record):
+    """
+    Derive a stable document ID from a record's identity fields.
+
+    :param collections.abc.Mapping record: provenance record
+    :return str: hex digest that's the same for every copy of the record
+    """
+    identity = IDENTITY_DELIMITER.join(
+        u"{}".format(record.get(field, u"")) for field in IDENTITY_FIELDS)
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+
+def validate_record(record):
+    """
+    Ensure that a record is one that the strict provda mapping will accept.
+
+    :param object record: candidate provenance record, e.g. parsed JSON
+    :raises InvalidRecordException: if the record isn't a mapping, has a
+        field that the mapping lacks, lacks an identity field, has an
+        unknown provenance type, or has a timestamp without a date
+    """
+    if not isinstance(record, dict):
+        raise InvalidRecordException("Not a JSON object: {}".format(record))
+    unknown_fields = set(record) - DOCUMENT_FIELDNAMES
+    if unknown_fields:
+        raise InvalidRecordException("Unknown field(s): {}".format(
+                ", ".join(sorted(unknown_fields))))
+    missing_fields = {DOCTYPE_KEY, DOCUMENT_KEY, INSTANCE_KEY} - set(record)
+    if missing_fields:
+        raise InvalidRecordException("Missing field(s): {}".format(
+                ", ".join(sorted(missing_fields))))
+    if record[DOCTYPE_KEY] not in DOCUMENT_TYPENAMES:
+        raise InvalidRecordException("Unknown provenance type: {}".format(
+                record[DOCTYPE_KEY]))
+    if TIMESTAMP_KEY in record:
+        # The timestamp's date determines the record's daily partition.
+        timestamp = record[TIMESTAMP_KEY]
+        try:
+            datetime.datetime.strptime(timestamp[:10], "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise InvalidRecordException("Invalid timestamp: {}".format(
+                    timestamp))
+
+
+
+class InvalidRecordException(Exception):
+    """ A record must conform to the provda format in order to be stored. """
+    pass
+
+
 
 class ProvdaRecord(DocType):
     """ Representation of a single provda-created provenance record. """
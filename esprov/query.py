@@ -0,0 +1,147 @@
+""" Compilation of query criteria into non-scoring, cacheable filters.
+
+Provenance queries select records by exact values of keyword fields (type,
+instance, document), by namespace prefix of instance, and by time. None of
+these calls for relevance scoring, so criteria are compiled into the filter
+context of a bool query: clauses there aren't scored and are eligible for
+the node query cache. Times relative to now are rounded, so that the same
+query repeated within the rounding unit compiles to the same clauses and
+thus reuses cached results.
+
+"""
+
+from elasticsearch_dsl import Q
+
+from esprov import \
+    DOCTYPE_KEY, DOCUMENT_KEY, INSTANCE_KEY, \
+    NAMESPACE_DELIMITER, TIMESTAMP_KEY
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.query"
+
+
+__all__ = ["QuerySpec", "round_date"]
+
+
+# Unit (date math) to which relative times are rounded
+DEFAULT_ROUNDING = "m"
+
+
+
+def round_date(expression, unit=DEFAULT_ROUNDING):
+    """
+    Round a relative date math expression to a unit, so that it's constant
+    for the duration of that unit. Absolute dates, and expressions already
+    rounded, are left alone.
+
+    :param str expression: date math, e.g. now-3d
+    :param str unit: date math unit to which to round, e.g. m for minute;
+        null for no rounding
+    :return str: rounded expression, e.g. now-3d/m
+    """
+    if not unit or not expression.startswith("now") or "/" in expression:
+        return expression
+    return "{}/{}".format(expression, unit)
+
+
+
+class QuerySpec(object):
+    """ Criteria for provenance records, compiled into filter clauses. """
+
+    def __init__(self, doctypes=None, instances=None, documents=None,
+                 namespace=None, since=None, until=None,
+                 rounding=DEFAULT_ROUNDING):
+        """
+        Each criterion is optional; records must meet all that are given.
+
+        :param collections.abc.Iterable(str) doctypes: types of record
+        :param collections.abc.Iterable(str) instances: instance IDs
+        :param collections.abc.Iterable(str) documents: document IDs
+        :param str namespace: namespace of instance, e.g. code
+        :param str since: earliest time, as date or date math, inclusive
+        :param str until: latest time, as date or date math, inclusive
+        :param str rounding: unit to which relative times are rounded,
+            widening the time range to whole units; null for no rounding
+        """
+        self.doctypes = _as_list(doctypes)
+        self.instances = _as_list(instances)
+        self.documents = _as_list(documents)
+        self.namespace = namespace
+        self.since = since
+        self.until = until
+        self.rounding = rounding
+
+
+    def clauses(self):
+        """
+        Compile criteria into filter clauses.
+
+        :return list[elasticsearch_dsl.query.Query]: one clause per criterion
+        """
+        clauses = []
+        for field, values in [(DOCTYPE_KEY, self.doctypes),
+                              (INSTANCE_KEY, self.instances),
+                              (DOCUMENT_KEY, self.documents)]:
+            if values is None:
+                continue
+            if len(values) == 1:
+                clauses.append(Q("term", **{field: values[0]}))
+            else:
+                clauses.append(Q("terms", **{field: values}))
+        if self.namespace:
+            clauses.append(Q("prefix", **{INSTANCE_KEY: "{}{}".format(
+                    self.namespace, NAMESPACE_DELIMITER)}))
+        bounds = {}
+        if self.since is not None:
+            # With gte, rounding goes down to the start of the unit...
+            bounds["gte"] = round_date(self.since, self.rounding)
+        if self.until is not None:
+            # ...and with lte, it goes up to the end of the unit.
+            bounds["lte"] = round_date(self.until, self.rounding)
+        if bounds:
+            clauses.append(Q("range", **{TIMESTAMP_KEY: bounds}))
+        return clauses
+
+
+    def compile(self):
+        """
+        Compile criteria into a non-scoring query.
+
+        :return elasticsearch_dsl.query.Query: bool query with a filter
+            clause per criterion, or match_all if there are no criteria
+        """
+        clauses = self.clauses()
+        return Q("bool", filter=clauses) if clauses else Q("match_all")
+
+
+    def apply(self, search):
+        """
+        Confine a search to the records meeting the criteria.
+
+        :param elasticsearch_dsl.search.Search search: search to confine
+        :return elasticsearch_dsl.search.Search: confined search
+        """
+        clauses = self.clauses()
+        return search.query(Q("bool", filter=clauses)) if clauses else search
+
+
+    def to_dict(self):
+        """
+        Serialize the compiled query.
+
+        :return dict: query as it would appear in a search request body
+        """
+        return self.compile().to_dict()
+
+
+
+def _as_list(values):
+    if values is None:
+        return None
+    if isinstance(values, str):
+        return [values]
+    return list(values)
@@ -0,0 +1,157 @@
+""" Memory-mapped reading of JSON-lines provenance logs.
+
+Logstash's 'file' output (and provda's own logs) can run to many gigabytes,
+so rather than reading a log into a list, map it into memory and hand out
+each line as a zero-copy slice, decoding a record only when it's needed.
+
+"""
+
+import json
+import logging
+import mmap
+import os
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.reader"
+
+
+__all__ = ["JsonLinesReader"]
+
+
+NEWLINE = b"\n"
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+class JsonLinesReader(object):
+    """ Memory-mapped, line-oriented view of a JSON-lines file.
+
+    Line slices produced by the reader share memory with the mapping, so
+    they're only valid while the reader is open; copy (e.g., tobytes())
+    anything that needs to outlive it.
+    """
+
+    def __init__(self, path):
+        """
+        Map the file at the given path into memory, read-only.
+
+        :param str path: path to JSON-lines file
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # A zero-length file can't be mapped; treat it as empty bytes.
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self._map = b""
+        self._view = memoryview(self._map)
+        self.position = 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    def __iter__(self):
+        """ Iterate over decoded records from the current position. """
+        return self.records()
+
+
+    def close(self):
+        """ Release the mapping and the underlying file. """
+        if self._view is not None:
+            # The reader's own view exports the mapping's buffer too.
+            self._view.release()
+            self._view = None
+        if isinstance(self._map, mmap.mmap):
+            try:
+                self._map.close()
+            except BufferError:
+                # Some line slice is still referenced; the mapping will be
+                # released once that slice is garbage-collected.
+                LOGGER.debug("Deferring unmap of %s", self.path)
+        self._file.close()
+
+
+    def align(self, offset):
+        """
+        Find the start of the first line that begins at or after an offset.
+
+        :param int offset: arbitrary byte offset into the file
+        :return int: offset of the beginning of a line, or the file size
+            if no line begins at or after the given offset
+        """
+        if offset <= 0:
+            return 0
+        if offset >= self.size:
+            return self.size
+        if self._map[offset - 1:offset] == NEWLINE:
+            return offset
+        newline = self._map.find(NEWLINE, offset)
+        return self.size if newline == -1 else newline + 1
+
+
+    def seek(self, offset):
+        """
+        Position the reader at the first line beginning at or after offset.
+
+        :param int offset: byte offset to which to seek
+        :return int: aligned offset at which reading will resume
+        """
+        self.position = self.align(offset)
+        return self.position
+
+
+    def lines(self, start=None, end=None):
+        """
+        Produce each line in a byte range as a zero-copy slice.
+
+        A line is included if it begins within the range, even if it extends
+        past the range's end; as a result, adjacent ranges never split or
+        duplicate a line. The reader's position advances as lines are
+        produced, so iteration may be resumed after interruption.
+
+        :param int start: byte offset at which to begin; optional, default
+            to the reader's current position; aligned forward to a line start
+        :param int end: byte offset before which the last line must begin;
+            optional, read through the end of the file if omitted
+        :return generator((int, memoryview)): byte offset and content
+            (sans newline) of each line
+        """
+        position = self.position if start is None else self.align(start)
+        end = self.size if end is None else min(end, self.size)
+        while position < end:
+            newline = self._map.find(NEWLINE, position)
+            stop = self.size if newline == -1 else newline
+            self.position = stop + 1
+            yield position, self._view[position:stop]
+            position = self.position
+
+
+    def records(self, start=None, end=None):
+        """
+        Decode, one at a time, the record on each nonblank line in a range.
+
+        :param int start: byte offset at which to begin; optional, default
+            to the reader's current position
+        :param int end: byte offset before which the last line must begin;
+            optional, read through the end of the file if omitted
+        :return generator(dict): record decoded from each nonblank line
+        """
+        for _, line in self.lines(start=start, end=end):
+            text = line.tobytes()
+            # Don't let a slice linger in this frame, pinning the mapping.
+            del line
+            if text.strip():
+                yield json.loads(text.decode("utf-8"))
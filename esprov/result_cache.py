@@ -0,0 +1,245 @@
+""" On-disk cache of CLI query results, for repeated queries of quiet indices.
+
+A result is keyed by the compiled search (index, request body and request
+parameters) along with the options that shape the result, e.g. --count or
+--ordered. It's stored with the generation of the searched indices, their
+number of records and latest timestamp, and it's served only while that
+generation is unchanged; that check is a single request for no hits, far
+cheaper than the query itself. Queries with times relative to "now" are
+compiled with rounding to the minute, so they're additionally keyed by the
+current minute.
+
+Each entry is a JSON file in the cache folder. Entries are evicted least
+recently used first, as judged by modification time (updated on each hit),
+to keep the folder within a size bound.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from elasticsearch_dsl import Search
+
+from esprov import TIMESTAMP_KEY
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.result_cache"
+
+
+__all__ = ["ResultCache", "cached_result", "index_generation",
+           "query_key", "result_cache"]
+
+
+# Bound on total size of cached entries
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Environment variable naming the cache folder, and its default
+CACHE_DIR_VARNAME = "ESPROV_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join("~", ".esprov", "cache")
+
+# Seconds for which a query with relative times keeps its meaning; this
+# matches the minute rounding applied when the query is compiled.
+RELATIVE_TIME_PERIOD = 60
+
+# Options that don't shape a result
+_UNKEYED_OPTIONS = {"func", "cache"}
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def result_cache():
+    """
+    Get the cache in the folder named by the ESPROV_CACHE_DIR environment
+    variable, or in ~/.esprov/cache by default.
+
+    :return ResultCache: cache for CLI query results
+    """
+    directory = os.environ.get(CACHE_DIR_VARNAME, DEFAULT_CACHE_DIR)
+    return ResultCache(os.path.expanduser(directory))
+
+
+
+def query_key(search, args):
+    """
+    Derive the cache key for a query's result.
+
+    :param elasticsearch_dsl.search.Search search: search to be executed
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    :return str: hex digest identifying the query and the result's shape
+    """
+    body = search.to_dict()
+    options = {name: value for name, value in vars(args).items()
+               if name not in _UNKEYED_OPTIONS}
+    text = json.dumps({"index": search._index, "params": search._params,
+                       "body": body, "options": options},
+                      sort_keys=True, default=str)
+    if "now" in json.dumps(body):
+        text += str(int(time.time() // RELATIVE_TIME_PERIOD))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+
+def index_generation(search):
+    """
+    Determine the generation of the indices that a search targets.
+
+    :param elasticsearch_dsl.search.Search search: search whose indices to
+        inspect; its query doesn't matter
+    :return list[int | float]: number of records and latest timestamp
+    """
+    probe = Search(using=search._using, index=search._index,
+                   doc_type=search._doc_type).params(**search._params)[:0]
+    probe.aggs.metric("latest", "max", field=TIMESTAMP_KEY)
+    response = probe.execute()
+    return [response.hits.total, response.aggregations.latest.value]
+
+
+
+def cached_result(search, args, produce, cache=None):
+    """
+    Serve a query's result from the cache if it's still valid, or produce
+    it and cache it. A result that's a sequence of hits is cached once
+    it's been consumed in full, and only if it fits the cache.
+
+    :param elasticsearch_dsl.search.Search search: search to be executed
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    :param callable produce: function of no arguments that produces result
+    :param ResultCache cache: cache to use; optional, by default that in
+        the configured folder
+    :return int | bool | generator(object): query result
+    """
+    cache = cache or result_cache()
+    key = query_key(search, args)
+    generation = index_generation(search)
+    hit, value = cache.get(key, generation)
+    if hit:
+        LOGGER.debug("Serving cached result %s", key)
+        return value if isinstance(value, (bool, int)) else iter(value)
+    result = produce()
+    if isinstance(result, (bool, int)):
+        cache.put(key, generation, result)
+        return result
+    return _recorded(result, cache, key, generation)
+
+
+
+def _recorded(items, cache, key, generation):
+    recorded, size = [], 0
+    for item in items:
+        if recorded is not None:
+            size += len(json.dumps(item))
+            if size > cache.max_bytes:
+                recorded = None
+            else:
+                recorded.append(item)
+        yield item
+    if recorded is not None:
+        cache.put(key, generation, recorded)
+
+
+
+class ResultCache(object):
+    """ Size-bounded folder of query results, evicted least recently used. """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Folder and size bound define a cache.
+
+        :param str directory: path to folder for cache entries, created if
+            needed
+        :param int max_bytes: bound on total size of entries
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+
+    def get(self, key, generation):
+        """
+        Look up an entry, valid only for the given generation.
+
+        :param str key: cache key for the query
+        :param list generation: current generation of the indices queried
+        :return (bool, object): whether there's a valid entry, and its value
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return False, None
+        if entry["generation"] != generation:
+            return False, None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True, entry["value"]
+
+
+    def put(self, key, generation, value):
+        """
+        Store an entry, then evict entries to keep within the size bound.
+        A value too large for the cache, or that isn't JSON-serializable,
+        is not stored.
+
+        :param str key: cache key for the query
+        :param list generation: generation of the indices queried
+        :param object value: query result
+        """
+        try:
+            text = json.dumps({"generation": generation, "value": value})
+        except (TypeError, ValueError):
+            LOGGER.debug("Result for %s isn't cacheable", key)
+            return
+        if len(text) > self.max_bytes:
+            return
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            handle, temp_path = tempfile.mkstemp(dir=self.directory,
+                                                 suffix=".tmp")
+            with os.fdopen(handle, 'w') as entry_file:
+                entry_file.write(text)
+            os.rename(temp_path, self._path(key))
+        except (IOError, OSError) as e:
+            LOGGER.warning("Couldn't cache result in %s: %s",
+                           self.directory, e)
+            return
+        self._evict()
+
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+    def _path(self, key):
+        return os.path.join(self.directory, "{}.json".format(key))
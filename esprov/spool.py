@@ -0,0 +1,267 @@
+""" Durable, append-only spool of provda records awaiting storage.
+
+The spool is a directory of numbered segment files, each holding records as
+JSON lines, plus a checkpoint file. Records are appended to the newest
+segment and made durable in groups: one fsync covers every record appended
+since the previous one, so the cost of durability is amortized over a
+burst of records rather than paid per record.
+
+Records are replayed in the order in which they were appended, starting
+from the checkpoint. Once a replayed batch has been stored, the checkpoint
+advances past it (atomically, by rename) and fully replayed segments are
+deleted, so a restart resumes replay where it left off and never re-sends
+a batch whose storage was acknowledged.
+
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.esprov.spool"
+
+
+__all__ = ["Spool"]
+
+
+# Size at which a segment is closed and a new one begun
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+SEGMENT_NAME_TEMPLATE = "segment-{:012d}.jsonl"
+SEGMENT_GLOB = "segment-*.jsonl"
+CHECKPOINT_NAME = "checkpoint.json"
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+class Spool(object):
+    """ Segmented write-ahead spool with group commit and checkpointed replay.
+
+    A single writer (append and commit) and a single reader (replay and
+    acknowledge) may operate concurrently, e.g. from different threads.
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES):
+        """
+        Open (creating if needed) the spool in the given directory.
+
+        :param str directory: path to folder for segments and checkpoint
+        :param int segment_bytes: size at which to begin a new segment
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        segments = self._segment_numbers()
+        self._checkpoint = self._read_checkpoint(
+                default=(segments[0] if segments else 0, 0))
+
+        # Resume appending to the newest segment, discarding any partial
+        # record left by a crash in the midst of a write.
+        self._segment = segments[-1] if segments else self._checkpoint[0]
+        path = self._segment_path(self._segment)
+        self._writer = open(path, 'ab')
+        self._truncate_partial(path)
+        self._committed = (self._segment, self._writer.tell())
+
+        # Replay begins at the checkpoint.
+        self._position = self._checkpoint
+        self._reader = None
+        self._reader_segment = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    @property
+    def checkpoint(self):
+        """
+        Position through which replayed records have been acknowledged.
+
+        :return (int, int): segment number and byte offset within it
+        """
+        return self._checkpoint
+
+
+    @property
+    def committed(self):
+        """
+        Position through which appended records are durable.
+
+        :return (int, int): segment number and byte offset within it
+        """
+        with self._lock:
+            return self._committed
+
+
+    def append(self, records):
+        """
+        Write records to the newest segment; they're not durable, nor will
+        they be replayed, until commit() is called.
+
+        :param collections.abc.Iterable(dict) records: records to append
+        """
+        for record in records:
+            line = "{}\n".format(json.dumps(record)).encode("utf-8")
+            self._writer.write(line)
+            if self._writer.tell() >= self.segment_bytes:
+                self._rotate()
+
+
+    def commit(self):
+        """ Make all appended records durable and available for replay. """
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        with self._lock:
+            self._committed = (self._segment, self._writer.tell())
+
+
+    def replay(self, limit):
+        """
+        Read the next committed records after those already replayed.
+
+        Replay positions advance only in memory; a replayed batch that isn't
+        acknowledged is replayed again after a restart.
+
+        :param int limit: maximum number of records to read
+        :return list[dict], (int, int): records read, in order, and the
+            position just beyond the last of them, to acknowledge once
+            they're stored
+        """
+        committed = self.committed
+        records = []
+        segment, offset = self._position
+        while len(records) < limit and (segment, offset) < committed:
+            reader = self._open_reader(segment)
+            reader.seek(offset)
+            line = reader.readline()
+            bound = committed[1] if segment == committed[0] else None
+            if line.endswith(b"\n") and \
+                    (bound is None or offset + len(line) <= bound):
+                offset += len(line)
+                if line.strip():
+                    records.append(json.loads(line.decode("utf-8")))
+            elif segment < committed[0]:
+                # This segment is exhausted and the writer has moved on.
+                segment, offset = segment + 1, 0
+            else:
+                break
+        self._position = (segment, offset)
+        return records, self._position
+
+
+    def acknowledge(self, position):
+        """
+        Record that everything before a position has been stored; delete
+        segments that are thereby fully replayed.
+
+        :param (int, int) position: replay position returned with the
+            stored batch
+        """
+        path = os.path.join(self.directory, CHECKPOINT_NAME)
+        temp_path = "{}.tmp".format(path)
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({"segment": position[0], "offset": position[1]},
+                      checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.rename(temp_path, path)
+        self._checkpoint = tuple(position)
+
+        for segment in self._segment_numbers():
+            if segment >= position[0]:
+                break
+            if segment == self._reader_segment:
+                self._close_reader()
+            os.remove(self._segment_path(segment))
+            LOGGER.debug("Removed replayed segment %d", segment)
+
+
+    def close(self):
+        """ Commit outstanding appends and release file handles. """
+        self.commit()
+        self._writer.close()
+        self._close_reader()
+
+
+    def _rotate(self):
+        """ Seal the current segment and begin the next. """
+        self.commit()
+        self._writer.close()
+        self._segment += 1
+        self._writer = open(self._segment_path(self._segment), 'ab')
+        self._sync_directory()
+        with self._lock:
+            self._committed = (self._segment, 0)
+        LOGGER.debug("Began spool segment %d", self._segment)
+
+
+    def _open_reader(self, segment):
+        if self._reader_segment != segment:
+            self._close_reader()
+            self._reader = open(self._segment_path(segment), 'rb')
+            self._reader_segment = segment
+        return self._reader
+
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = None
+        self._reader_segment = None
+
+
+    def _read_checkpoint(self, default):
+        path = os.path.join(self.directory, CHECKPOINT_NAME)
+        try:
+            with open(path, 'r') as checkpoint_file:
+                data = json.load(checkpoint_file)
+        except (IOError, OSError):
+            return default
+        return data["segment"], data["offset"]
+
+
+    def _segment_numbers(self):
+        paths = glob.glob(os.path.join(self.directory, SEGMENT_GLOB))
+        return sorted(int(os.path.basename(path).split("-")[1].split(".")[0])
+                      for path in paths)
+
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory,
+                            SEGMENT_NAME_TEMPLATE.format(segment))
+
+
+    def _sync_directory(self):
+        # Make creation of a new segment file itself durable.
+        descriptor = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+    def _truncate_partial(self, path):
+        with open(path, 'rb') as segment_file:
+            content = segment_file.read()
+        if content and not content.endswith(b"\n"):
+            complete = content.rfind(b"\n") + 1
+            LOGGER.warning("Discarding %d byte(s) of partial record from %s",
+                           len(content) - complete, path)
+            self._writer.truncate(complete)
+        self._writer.seek(0, os.SEEK_END)
@@ -1,12 +1,27 @@
 """ Ancillary functionality for provenance-in-Elasticsearch. """
 
+import base64
+import heapq
 import itertools
+import json
 import logging
+import math
+from multiprocessing.pool import ThreadPool
+import threading
 
-from elasticsearch_dsl import Search
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from elasticsearch_dsl import MultiSearch, Search
+from elasticsearch_dsl.utils import AttrList
+
+from esprov import DOCUMENT_FIELDNAMES, DOCUMENT_TYPENAMES, TIMESTAMP_KEY
+from esprov.provda_edge import record_index_expression
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-15"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -15,6 +30,38 @@ __modname__ = "esprov.esprov.utilities"
 
 ITEMS_COUNT_LOWER_BOUND = 0
 
+# Stable total order for paging: time, then document UID to break ties.
+ORDERED_SORT = ({TIMESTAMP_KEY: "asc"}, {"_uid": "asc"})
+DEFAULT_PAGE_SIZE = 1000
+
+# Key of the item, last among ordered results, that holds the resume cursor
+CURSOR_KEY = "cursor"
+
+# Query plans, from cheapest to most thorough
+PLAN_SEARCH = "search"
+PLAN_SCROLL = "scroll"
+PLAN_SLICED_SCROLL = "sliced_scroll"
+
+# At most this many hits are fetched in a single plain request.
+SINGLE_REQUEST_LIMIT = 1000
+# From this many hits on, a scroll is split into slices read in parallel.
+SLICED_SCROLL_THRESHOLD = 100000
+DEFAULT_SLICES = 4
+# Hits per scroll request, and hits that slices may buffer for consumption
+SCROLL_PAGE_SIZE = 1000
+SLICED_SCROLL_BUFFER = 4 * SCROLL_PAGE_SIZE
+
+# Sub-queries per multi-search request, to keep request bodies bounded
+MSEARCH_CHUNK_SIZE = 100
+
+# Highest precision threshold for cardinality; counts below it are exact.
+MAX_CARDINALITY_PRECISION = 40000
+
+# Target number of terms per partition of a distinct-values aggregation
+DEFAULT_PARTITION_SIZE = 1000
+
+LOGGER = logging.getLogger(__modname__)
+
 
 
 def parse_index(args):
@@ -40,27 +87,112 @@ def parse_num_docs(args):
     Parse the cap for the number of hits to return from a document query.
 
     :param argparse.Namespace args: binding between option name and argument
-    :return int: cap for the number of documents to return that hit on a query
+    :return int | NoneType: cap for the number of documents to return that
+        hit on a query, or null if there's no cap
+    :raises IllegalItemsLimitException: if the cap is less than 1
     """
-    default = 10
-    try:
-        return max(args.num_docs, default)
-    except AttributeError:
-        return default
+    num_docs = getattr(args, "num_docs", None)
+    if num_docs is None:
+        return None
+    num_docs = int(num_docs)
+    if num_docs < 1:
+        raise IllegalItemsLimitException(num_docs, min=1)
+    return num_docs
+
+
+
+def parse_fields(args):
+    """
+    Parse the names of the record fields to which to project hits.
+
+    :param argparse.Namespace args: binding between option name and argument
+    :return list[str] | NoneType: names of fields to retain in each hit,
+        or null if no projection was requested
+    :raises ValueError: if a field named isn't a record field
+    """
+    text = getattr(args, "fields", None)
+    if not text:
+        return None
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    unknown = [name for name in names if name not in DOCUMENT_FIELDNAMES]
+    if unknown:
+        raise ValueError("Unknown field(s): {}".format(", ".join(unknown)))
+    return names
+
+
+
+def parse_doctypes(args):
+    """
+    Parse the comma-separated document type(s) to which to confine a query.
+
+    :param argparse.Namespace args: binding between option name and argument
+    :return list[str] | NoneType: document type names, in the order given,
+        or null if none was given
+    :raises ValueError: if a document type named is unknown
+    """
+    text = getattr(args, "doctype", None)
+    if text is None:
+        return None
+    doctypes = [name.strip() for name in text.split(",")]
+    for doctype in doctypes:
+        if doctype not in DOCUMENT_TYPENAMES:
+            raise ValueError("Unknown doctype: {}".format(doctype))
+    return doctypes
+
+
+
+def read_instances(path):
+    """
+    Read instance IDs, one per line, from a file.
+
+    :param str path: path to file of instance IDs
+    :return list[str]: distinct instance IDs, in the order first listed
+    """
+    instances = []
+    seen = set()
+    with open(path, 'r') as instances_file:
+        for line in instances_file:
+            instance = line.strip()
+            if instance and instance not in seen:
+                seen.add(instance)
+                instances.append(instance)
+    return instances
 
 
 
-def build_search(es_client, args):
+def build_search(es_client, args, fields=None, docvalue_fields=None):
     """
     Build a search instance to execute for a CLI query.
 
+    Hits may be projected to a subset of fields so that neither the cluster
+    nor the client handles whole records (in particular the bulky @fields)
+    when only a few fields are wanted. Fields read from doc values skip
+    the stored source altogether, which suits single keyword fields.
+
     :param elasticsearch.client.Elasticsearch es_client: ES client with
         which to conduct the search query
-    :param argparse.Namespace args:
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    :param collections.abc.Iterable(str) fields: names of fields to include
+        from each hit's source; optional, if omitted those given with
+        --fields are used, if any
+    :param collections.abc.Iterable(str) docvalue_fields: names of fields
+        to read from doc values rather than from source; if given, source
+        isn't retrieved at all, and fields is ignored
     :return elasticsearch_dsl.search.Search: search instance to execute
     """
-    index = parse_index(args)
-    search = Search(using=es_client, index=index)[:parse_num_docs(args)]
+    # Edges are kept in indices of their own, which aren't records'.
+    index = record_index_expression(parse_index(args))
+    search = Search(using=es_client, index=index)
+    limit = parse_num_docs(args)
+    if limit is not None:
+        search = search[:limit]
+    fields = parse_fields(args) if fields is None else list(fields)
+    if docvalue_fields:
+        search = search.source(False).extra(
+                docvalue_fields=list(docvalue_fields))
+    elif fields:
+        search = search.source(includes=fields)
     logging.debug("Search: {}".format(search.to_dict()))
     return search
 
@@ -94,6 +226,480 @@ def capped(items, limit):
 
 
 
+def field_value(hit, name):
+    """
+    Get a field's value from a hit, whether from source or doc values.
+
+    :param elasticsearch_dsl.response.hit.Hit hit: search hit
+    :param str name: name of field
+    :return object: field's value; doc values come as a list, so a single
+        doc value is unwrapped
+    """
+    value = hit[name]
+    if isinstance(value, (AttrList, list)) and len(value) == 1:
+        return value[0]
+    return value
+
+
+
+def plan_search(limit=None, estimate=None):
+    """
+    Choose how to retrieve a search's hits.
+
+    :param int limit: cap on the number of hits wanted; optional, if
+        omitted all hits are wanted
+    :param int estimate: number of hits that the search has; optional,
+        if omitted only the limit informs the choice
+    :return str: name of plan: a single plain request with the size pushed
+        down, a scroll, or a scroll split into slices read in parallel
+    """
+    expected = estimate if limit is None \
+        else limit if estimate is None else min(limit, estimate)
+    if expected is not None and expected <= SINGLE_REQUEST_LIMIT:
+        return PLAN_SEARCH
+    if expected is None or expected < SLICED_SCROLL_THRESHOLD:
+        return PLAN_SCROLL
+    return PLAN_SLICED_SCROLL
+
+
+
+def planned_hits(search, limit=None):
+    """
+    Retrieve a search's hits by the cheapest adequate plan. A limit small
+    enough for a single request needs no further information; otherwise
+    the plan is chosen from a count of the hits.
+
+    :param elasticsearch_dsl.search.Search search: search to execute
+    :param int limit: cap on the number of hits wanted; optional, if
+        omitted all hits are wanted
+    :return collections.abc.Iterable(elasticsearch_dsl.response.hit.Hit):
+        the search's hits, in no particular order
+    """
+    estimate = None
+    if limit is None or limit > SINGLE_REQUEST_LIMIT:
+        estimate = count_hits(search)
+        if not estimate:
+            return iter(())
+    plan = plan_search(limit, estimate)
+    LOGGER.debug("Plan for %s hit(s) with limit %s: %s", estimate, limit, plan)
+    if plan == PLAN_SEARCH:
+        size = limit if estimate is None \
+            else estimate if limit is None else min(limit, estimate)
+        return iter(search[:size].execute())
+    search = search.extra(size=SCROLL_PAGE_SIZE)
+    hits = search.scan() if plan == PLAN_SCROLL \
+        else sliced_scan(search, DEFAULT_SLICES)
+    return capped(items=hits, limit=limit)
+
+
+
+def sliced_scan(search, slices, ordered=False):
+    """
+    Scroll through a search's hits with the scroll split into slices, each
+    read on its own thread of a pool, so that an export isn't bound by the
+    latency of a single scroll; with a slice per shard, throughput scales
+    with the number of shards. The threads share the search's client (and
+    thus its connection pool). They stop early if iteration is abandoned.
+
+    :param elasticsearch_dsl.search.Search search: search to execute
+    :param int slices: number of slices (and threads)
+    :param bool ordered: whether to sort each slice and merge the slices
+        in order, rather than producing hits as they arrive
+    :return generator(elasticsearch_dsl.response.hit.Hit): the search's
+        hits, by timestamp and then UID if ordered, else in arrival order
+    :raises ValueError: if number of slices is nonpositive
+    """
+    if slices < 1:
+        raise ValueError("Number of slices must be positive: {}".
+                         format(slices))
+    if ordered:
+        search = search.sort(*ORDERED_SORT).params(preserve_order=True)
+        # Each slice is merged in order, so each needs its own buffer.
+        buffers = [queue.Queue(maxsize=SCROLL_PAGE_SIZE)
+                   for _ in range(slices)]
+    else:
+        buffers = [queue.Queue(maxsize=SLICED_SCROLL_BUFFER)]
+    stop = threading.Event()
+    finished = object()
+
+    def put(buffer, item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_slice(slice_id):
+        buffer = buffers[slice_id % len(buffers)]
+        try:
+            sliced = search.extra(slice={"id": slice_id, "max": slices}) \
+                if slices > 1 else search
+            for hit in sliced.scan():
+                if not put(buffer, hit):
+                    return
+        except Exception as e:
+            put(buffer, e)
+        finally:
+            put(buffer, finished)
+
+    def drain(buffer, num_slices):
+        remaining = num_slices
+        while remaining:
+            item = buffer.get()
+            if item is finished:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+
+    def decorated(slice_id):
+        # Sort values are unique (UID breaks ties), so hits aren't compared.
+        for hit in drain(buffers[slice_id], 1):
+            yield list(hit.meta.sort), slice_id, hit
+
+    pool = ThreadPool(slices)
+    pool.map_async(read_slice, range(slices))
+    try:
+        if ordered:
+            for _, _, hit in heapq.merge(*[decorated(slice_id)
+                                           for slice_id in range(slices)]):
+                yield hit
+        else:
+            for hit in drain(buffers[0], slices):
+                yield hit
+    finally:
+        stop.set()
+        pool.close()
+        pool.join()
+
+
+
+def parallel_hits(search, args):
+    """
+    Produce a CLI search's hits from a scroll split into the requested
+    number of slices, in time order if requested.
+
+    :param elasticsearch_dsl.search.Search search: search to execute
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    :return generator(elasticsearch_dsl.response.hit.Hit): the search's hits
+    :raises ValueError: if a cursor is given, as a scroll can't resume
+        from one
+    """
+    if getattr(args, "cursor", None):
+        raise ValueError("A cursor can't be combined with a parallel scan")
+    ordered = is_ordered(args)
+    hits = sliced_scan(search.extra(size=SCROLL_PAGE_SIZE),
+                       slices=int(args.parallel), ordered=ordered)
+    return capped(items=hits, limit=parse_num_docs(args))
+
+
+
+def multi_search(es_client, keyed_searches, chunk_size=None):
+    """
+    Execute many searches in few round trips, as multi-search requests
+    of bounded size, and pair each response with its search's key.
+
+    :param elasticsearch.client.Elasticsearch es_client: client with which
+        to conduct the requests
+    :param collections.abc.Iterable((object, elasticsearch_dsl.search.Search))
+        keyed_searches: pairs of key by which to identify a search and the
+        search itself
+    :param int chunk_size: maximum number of searches per request;
+        optional, by default MSEARCH_CHUNK_SIZE
+    :return generator((object, elasticsearch_dsl.response.Response)): pairs
+        of search key and response, in the order in which searches were given
+    """
+    chunk_size = chunk_size or MSEARCH_CHUNK_SIZE
+    keyed_searches = iter(keyed_searches)
+    while True:
+        chunk = list(itertools.islice(keyed_searches, chunk_size))
+        if not chunk:
+            return
+        request = MultiSearch(using=es_client)
+        for _, search in chunk:
+            request = request.add(search)
+        LOGGER.debug("Multi-search of %d sub-queries", len(chunk))
+        for (key, _), response in zip(chunk, request.execute()):
+            yield key, response
+
+
+
+def wants_count(args):
+    """
+    Determine whether a CLI query is to produce only its number of hits.
+
+    :param argparse.Namespace args: binding between option name and argument
+    :return bool: whether count alone was requested
+    :raises ValueError: if both count and existence were requested
+    """
+    count = getattr(args, "count", False)
+    if count and getattr(args, "exists", False):
+        raise ValueError("Request either count or existence, not both")
+    return bool(count)
+
+
+
+def wants_existence(args):
+    """
+    Determine whether a CLI query is to produce only whether there's a hit.
+
+    :param argparse.Namespace args: binding between option name and argument
+    :return bool: whether existence alone was requested
+    """
+    return bool(getattr(args, "exists", False))
+
+
+
+def count_hits(search):
+    """
+    Count a search's hits without retrieving any of them.
+
+    :param elasticsearch_dsl.search.Search search: search whose hits to count
+    :return int: number of hits
+    """
+    return search.count()
+
+
+
+def hits_exist(search):
+    """
+    Determine whether a search hits anything, each shard stopping its
+    search at the first hit, and no hit being retrieved.
+
+    :param elasticsearch_dsl.search.Search search: search to check
+    :return bool: whether search hits at least one document
+    """
+    response = search[:0].extra(terminate_after=1).execute()
+    return response.hits.total > 0
+
+
+
+def count_distinct(search, field):
+    """
+    Count the distinct values of a keyword field among a search's hits.
+
+    :param elasticsearch_dsl.search.Search search: search whose hits' values
+        to count
+    :param str field: name of keyword field
+    :return int: number of distinct values; exact up to tens of thousands,
+        approximate beyond
+    """
+    count_search = search[:0]
+    count_search.aggs.metric(
+            "distinct", "cardinality", field=field,
+            precision_threshold=MAX_CARDINALITY_PRECISION)
+    return count_search.execute().to_dict()\
+        .get("aggregations", {}).get("distinct", {}).get("value", 0)
+
+
+
+def distinct_values(search, field, stats=False, with_record=False,
+                    record_fields=None, partition_size=DEFAULT_PARTITION_SIZE):
+    """
+    Aggregate a search's hits by the distinct values of a keyword field,
+    on the cluster, so that only one entry per value is transferred.
+
+    Values are gathered with a terms aggregation split into partitions of
+    roughly the given size, the number of partitions being estimated from
+    the field's cardinality. A partition that turns out to hold more terms
+    than were requested is requested again, with room for all of them.
+
+    :param elasticsearch_dsl.search.Search search: search whose hits to
+        aggregate; its query and filters apply, its size doesn't
+    :param str field: name of keyword field whose distinct values to find
+    :param bool stats: whether to also determine when each value was
+        first and last seen
+    :param bool with_record: whether to also fetch the most recent record
+        with each value
+    :param list[str] record_fields: names of fields to which to limit each
+        record fetched; optional, if omitted whole records are fetched
+    :param int partition_size: target number of values per request
+    :return generator(dict): for each distinct value, a mapping with the
+        value ("key") and number of hits having it ("count"), along with
+        "first_seen" and "last_seen" timestamps if requested, and "record"
+        if requested
+    """
+    estimate_search = search[:0]
+    estimate_search.aggs.metric("distinct", "cardinality", field=field)
+    estimate = estimate_search.execute().to_dict()\
+        .get("aggregations", {}).get("distinct", {}).get("value", 0)
+    if not estimate:
+        return
+    # Cardinality is approximate, so leave some headroom.
+    num_partitions = int(math.ceil(1.25 * estimate / partition_size))
+    LOGGER.debug("Aggregating ~%d distinct %s values in %d partition(s)",
+                 estimate, field, num_partitions)
+
+    for partition in range(num_partitions):
+        size = 2 * partition_size
+        while True:
+            partition_search = search[:0]
+            terms = partition_search.aggs.bucket(
+                    "values", "terms", field=field, size=size,
+                    order={"_term": "asc"},
+                    include={"partition": partition,
+                             "num_partitions": num_partitions})
+            if stats:
+                terms.metric("first_seen", "min", field=TIMESTAMP_KEY)
+                terms.metric("last_seen", "max", field=TIMESTAMP_KEY)
+            if with_record:
+                top_hits = {"size": 1, "sort": [{TIMESTAMP_KEY: "desc"}]}
+                if record_fields:
+                    top_hits["_source"] = {"includes": record_fields}
+                terms.metric("record", "top_hits", **top_hits)
+            values = partition_search.execute().to_dict()\
+                .get("aggregations", {}).get("values", {})
+            if not values.get("sum_other_doc_count"):
+                break
+            size *= 2
+        for bucket in values.get("buckets", []):
+            result = {"key": bucket["key"], "count": bucket["doc_count"]}
+            if stats:
+                result["first_seen"] = \
+                    bucket["first_seen"].get("value_as_string")
+                result["last_seen"] = \
+                    bucket["last_seen"].get("value_as_string")
+            if with_record:
+                result["record"] = \
+                    bucket["record"]["hits"]["hits"][0]["_source"]
+            yield result
+
+
+
+def encode_cursor(sort_values):
+    """
+    Encode the sort values of a hit as an opaque, resumable cursor token.
+
+    :param collections.abc.Sequence sort_values: sort values of a hit from
+        an ordered search
+    :return str: cursor token, safe for use on a command line
+    """
+    text = json.dumps(list(sort_values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor token into the sort values after which to resume.
+
+    :param str cursor: cursor token, as from encode_cursor
+    :return list: sort values for use as search_after
+    :raises ValueError: if the token isn't a valid cursor
+    """
+    try:
+        sort_values = json.loads(
+                base64.urlsafe_b64decode(cursor.encode("ascii"))
+                .decode("utf-8"))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor: {} ({})".format(cursor, e))
+    if not isinstance(sort_values, list) or \
+            len(sort_values) != len(ORDERED_SORT):
+        raise ValueError("Invalid cursor: {}".format(cursor))
+    return sort_values
+
+
+
+def hit_cursor(hit):
+    """
+    Determine the cursor token with which to resume just after a hit.
+
+    :param elasticsearch_dsl.result.Result hit: hit from ordered search
+    :return str: cursor token
+    """
+    return encode_cursor(hit.meta.sort)
+
+
+
+def paginate(search, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Iterate over a search's hits in time order, page by page, with
+    search_after rather than a scroll, so that no search context is held
+    open on the cluster between pages.
+
+    :param elasticsearch_dsl.search.Search search: search to execute
+    :param str cursor: token from a previous iteration after which
+        to resume; optional, if omitted iteration begins with the first hit
+    :param int page_size: number of hits per request
+    :return generator(elasticsearch_dsl.result.Result): hits, ordered by
+        timestamp and then by UID
+    :raises ValueError: if the cursor is invalid or page size is nonpositive
+    """
+    if page_size < 1:
+        raise ValueError("Page size must be positive: {}".format(page_size))
+    search_after = None if cursor is None else decode_cursor(cursor)
+    search = search.sort(*ORDERED_SORT)[:page_size]
+    while True:
+        page = search if search_after is None \
+            else search.extra(search_after=search_after)
+        hits = page.execute().hits
+        for hit in hits:
+            yield hit
+        if len(hits) < page_size:
+            return
+        search_after = list(hits[-1].meta.sort)
+        LOGGER.debug("Next page after cursor %s",
+                     encode_cursor(search_after))
+
+
+
+def ordered_hits(search, args):
+    """
+    Produce a CLI search's hits in time order, resuming from a cursor if
+    one's given and honoring the hits limit.
+
+    :param elasticsearch_dsl.search.Search search: search to execute
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    :return generator(elasticsearch_dsl.result.Result): hits, in time order
+    """
+    limit = parse_num_docs(args)
+    page_size = DEFAULT_PAGE_SIZE if limit is None \
+        else min(DEFAULT_PAGE_SIZE, limit)
+    hits = paginate(search, cursor=getattr(args, "cursor", None),
+                    page_size=page_size)
+    return capped(items=hits, limit=limit)
+
+
+
+def with_cursor(hits, convert):
+    """
+    Produce each of a CLI search's time-ordered hits as a result, followed
+    by the cursor with which a subsequent call could pick up where this one
+    stopped. The cursor is a result like any other, so that it reaches the
+    caller wherever the results do, e.g. from a server or the result cache.
+
+    :param collections.abc.Iterable(elasticsearch_dsl.result.Result) hits:
+        hits, in time order
+    :param callable convert: function with which to make a result of a hit
+    :return generator(object): result for each hit, then a mapping of
+        "cursor" to the cursor token, if there was any hit
+    """
+    hit = None
+    for hit in hits:
+        yield convert(hit)
+    if hit is not None:
+        yield {CURSOR_KEY: hit_cursor(hit)}
+
+
+
+def is_ordered(args):
+    """
+    Determine whether a CLI search is to be ordered and paged by cursor.
+
+    :param argparse.Namespace args: binding between option name and
+        argument value
+    :return bool: whether ordering was requested or a cursor was given
+    """
+    return bool(getattr(args, "ordered", False) or
+                getattr(args, "cursor", None))
+
+
+
 class IllegalItemsLimitException(Exception):
     """ A user may wish to bound the number of results from a query or
     operation; that bound must be nonnegative, and in some cases it may
@@ -4,10 +4,13 @@ import itertools
 
 from networkx.classes import MultiDiGraph
 
-from esprov import DOCTYPE_KEY, DOCUMENT_KEY, LOGGER, PREFIX_TYPENAME
+from esprov import \
+    DOCTYPE_KEY, DOCUMENT_KEY, EDGE_NAMES, FIELDS_KEY, INSTANCE_KEY, LOGGER, \
+    NODE_NAMES, PREFIX_TYPENAME, TIMESTAMP_KEY
+from esprov.graph.edges import record_edges
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-10"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -26,46 +29,98 @@ class DocumentMismatchException(Exception):
 def build_document(records):
     """
     Reconstruct provenance document from a collection of related records.
+    Each node record (activity, agent, entity) becomes a vertex, bearing
+    the node's type and attributes, and each edge that an edge record
+    describes becomes an edge, keyed by its type, ID, and position so that
+    an edge repeated across records is added once.
 
     :param collections.abc.Iterable(dict) records: collection of individual
         provenance records that together constitute a documents
-    :return networkx.class.Digraph: directed graph representation of
-        provenance document constructed from given records
+    :return networkx.classes.MultiDiGraph: directed graph representation of
+        provenance document constructed from given records, with the
+        document ID as graph attribute; empty if there are no records
     :raises TypeError: if records is null
+    :raises DocumentMismatchException: if records are from more than one
+        document
+    :raises ValueError: if an edge lacks an endpoint
     """
 
     records = iter(records)
+    graph = MultiDiGraph()
     try:
-        first_record = records.next()
+        first_record = next(records)
     except StopIteration:
-        return {}
+        return graph
 
     # For now, ignore "prefix" records.
     num_prefix_records = 0
     docid = first_record[DOCUMENT_KEY]
-
-    graph = MultiDiGraph()
+    graph.graph[DOCUMENT_KEY] = docid
 
     for record in itertools.chain([first_record], records):
 
-        if record[DOCTYPE_KEY] == PREFIX_TYPENAME:
-            num_prefix_records += 1
-            LOGGER.debug("Skipping prefix record %d", num_prefix_records)
-            continue
-
         if record[DOCUMENT_KEY] != docid:
             raise DocumentMismatchException(docid, record[DOCUMENT_KEY])
 
+        doctype = record[DOCTYPE_KEY]
+
+        if doctype == PREFIX_TYPENAME:
+            num_prefix_records += 1
+            LOGGER.debug("Skipping prefix record %d", num_prefix_records)
+            continue
 
+        if doctype in NODE_NAMES:
+            node = record[INSTANCE_KEY]
+            attributes = record.get(FIELDS_KEY, {}).get(node) or {}
+            graph.add_node(node, **dict(attributes, **{DOCTYPE_KEY: doctype}))
+        elif doctype in EDGE_NAMES:
+            for (edge_id, position), source, target, attributes in \
+                    record_edges(record):
+                graph.add_edge(source, target,
+                               key=(doctype, edge_id, position),
+                               **dict(attributes, **{DOCTYPE_KEY: doctype}))
+        else:
+            LOGGER.debug("Skipping record of unknown type: %s", doctype)
 
     LOGGER.info("Skipped %d prefix records", num_prefix_records)
+    return graph
+
 
 
 def build_documents(records):
     """
+    Reconstruct provenance documents from a stream of records sorted (or
+    at least grouped) by document, e.g. by a search sorted on document or
+    from a sorted log file. Each document is produced as soon as its
+    records are done, so only one document is held at a time.
+
+    :param collections.abc.Iterable(dict) records: provenance records,
+        with those of each document contiguous
+    :return generator((str, networkx.classes.MultiDiGraph)): ID and graph
+        of each document, in the order in which they're encountered
+    :raises ValueError: if a document's records aren't contiguous
+    """
+    seen = set()
+    for docid, document_records in itertools.groupby(
+            records, key=lambda record: record[DOCUMENT_KEY]):
+        if docid in seen:
+            raise ValueError("Records of document {} aren't contiguous; "
+                             "sort them by document".format(docid))
+        seen.add(docid)
+        yield docid, build_document(document_records)
+
 
 
-    :param records:
-    :return:
+def document_sorted_records(search):
+    """
+    Stream the records hit by a search, sorted by document, for
+    reconstruction of each document as its records arrive.
+
+    :param elasticsearch_dsl.search.Search search: search for records
+    :return generator(dict): records hit, grouped by document and in time
+        order within each
     """
-    pass
+    search = search.sort(DOCUMENT_KEY, TIMESTAMP_KEY).params(
+            preserve_order=True)
+    for hit in search.scan():
+        yield hit.to_dict()
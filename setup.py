@@ -7,7 +7,7 @@ import os
 from setuptools import setup
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-17"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -35,14 +35,21 @@ setup(
     # TODO: register with PyPI and then un-comment-out.
     #url="http://packages.python.org/esprov",
 
-    packages=["bin", "esprov", "tests"],
+    packages=["bin", "esprov", "esprov.graph", "tests"],
+
+    # Subcommands' dependencies are imported only as they're run.
+    entry_points={
+        "console_scripts": ["esprov=bin.cli:main"]
+    },
 
     include_package_data=True,
     zip_safe=False,
     platforms="any",
     install_requires=[
         "elasticsearch>=2.0.0,<3.0.0",
-        "elasticsearch-dsl>=2.0.0,<3.0.0"
+        "elasticsearch-dsl>=2.0.0,<3.0.0",
+        "networkx",
+        "numpy",
         "pytest>=3.0.4"
     ],
 
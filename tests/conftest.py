@@ -18,7 +18,7 @@ from esprov.functions import LIST_STAGES_TIMESPANS
 from esprov.provda_record import ProvdaRecord
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-21"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -156,6 +156,75 @@ def call_cli_func(command, client=ES_CLIENT):
 
 
 
+def write_records(path, records, extra_lines=()):
+    """
+    Write records to file in logstash's JSON-lines output format.
+
+    :param str path: path to file to write
+    :param collections.abc.Iterable(dict) records: records to write
+    :param collections.abc.Iterable(str) extra_lines: additional raw lines
+        to write after the records
+    :return str: path to the written file
+    """
+    with open(path, 'w') as logfile:
+        for record in records:
+            logfile.write("{}\n".format(json.dumps(record)))
+        for line in extra_lines:
+            logfile.write("{}\n".format(line))
+    return path
+
+
+
+@pytest.fixture(scope="function")
+def load_index(es_client, tmpdir):
+    """
+    Provide test case with a function that loads records into an index via
+    the CLI, e.g. load_index("lineage") for all test records in a fresh
+    index, esprov-test-lineage.
+
+    :param elasticsearch.client.Elasticsearch es_client: ES client
+    :param py.path.local tmpdir: temporary directory for the test case
+    :return callable: function of index name suffix, and optionally of
+        records (all test records by default), returning name of the
+        loaded index
+    """
+    files = tmpdir.mkdir("loaded")
+
+    def load(suffix, records=None):
+        if records is None:
+            # Test data itself imports this module, so import it late.
+            from .data import ALL_LOGS
+            records = ALL_LOGS
+        index = make_index_name(suffix)
+        path = write_records(
+                str(files.join("{}.log".format(len(files.listdir())))),
+                records)
+        list(call_cli_func("load {} --index {}".format(path, index),
+                           client=es_client))
+        return index
+
+    return load
+
+
+
+@pytest.fixture(scope="function")
+def loaded_index(request, load_index):
+    """
+    Load all test records into a fresh index, named for the requesting
+    test module (e.g. esprov-test-query for test_query) unless the suffix
+    is given by indirect parameterization.
+
+    :param pytest._pytest.fixtures.FixtureRequest request: test case
+        requesting the index
+    :param callable load_index: function with which to load the index
+    :return str: name of the loaded index
+    """
+    suffix = getattr(request, "param", None) or \
+        request.module.__name__.rpartition(".test_")[2]
+    return load_index(suffix.replace("_", "-"))
+
+
+
 @pytest.fixture(scope="function", params=OUTPUT_FORMAT_NAMES)
 def output_format(request):
     """
@@ -1,6 +1,8 @@
 """ Data for unit tests """
 
 from .conftest import parse_records_text
+from esprov import DOCUMENT_KEY
+from esprov.provda_record import record_id
 
 __author__ = "Vince Reuter"
 __credits__ = ["Vince Reuter"]
@@ -10,7 +12,8 @@ __modname = "esprov.tests.data"
 
 # Let's live dangerously and use some '*' imports.
 __all__ = ["ACTIVITY_LOGS", "ALL_LOGS", "CODE_LOGS",
-           "DOC_LOGS", "NON_ENTITY_NON_ACTIVITY_LOGS"]
+           "DOC_LOGS", "NON_ENTITY_NON_ACTIVITY_LOGS",
+           "ACTIVITY", "DOCUMENT", "NUM_UNIQUE_LOGS", "document_records"]
 
 
 CODE_LOGS_TEXT = """{"@fields": {"doc:gbd-read/schema/table": {}, "doc:gbd/first_history_test0/cvd_ihd.hdf": {}, "code:tests/make_history.py": {"unk:version_remote": "https://vr24@stash.ihme.washington.edu/scm/~adolgert/provda.git", "unk:version_branch_hash": "372d74f21713f47642fc424e7e3289f38b2ed5a0", "unk:script": "/Users/vr24/code/provda/tests/make_history.py", "unk:version_branch": "tinkering"}, "doc:paf/first_history_test0/cvd_ihd.hdf": {}}, "prov": "entity", "@timestamp": "2016-11-06T10:45:51.927Z", "instance": "code:tests/make_history.py", "host": "127.0.0.1", "@source_host": "withme", "@message": "create_file3", "document": "is:0a16324a-0017-47e9-a727-199d1f3e0fce", "@version": 1, "port": 56339}
@@ -71,3 +74,22 @@ NON_ENTITY_NON_ACTIVITY_LOGS = \
 
 
 ALL_LOGS = ACTIVITY_LOGS + CODE_LOGS + DOC_LOGS + NON_ENTITY_NON_ACTIVITY_LOGS
+
+
+# Document (and the activity that's its namesake) with the most records
+DOCUMENT = "is:0a16324a-0017-47e9-a727-199d1f3e0fce"
+ACTIVITY = DOCUMENT
+
+# The test data includes a repeated record, which is stored only once.
+NUM_UNIQUE_LOGS = len({record_id(record) for record in ALL_LOGS})
+
+
+
+def document_records(document):
+    """
+    Select the test records of a provenance document.
+
+    :param str document: ID of the document
+    :return list[dict]: records of the document, in test data order
+    """
+    return [record for record in ALL_LOGS if record[DOCUMENT_KEY] == document]
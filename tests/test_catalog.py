@@ -0,0 +1,138 @@
+""" Tests for the cached catalog of indices and aliases. """
+
+import gc
+import json
+import time
+import weakref
+
+import pytest
+
+from .conftest import call_cli_func, make_index_name
+from esprov.catalog import IndexCatalog, index_catalog
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_catalog"
+
+
+ALIASES_BY_INDEX = {
+    "provda-2016.11.06": ["provda-latest"],
+    "provda-2016.11.05": [],
+    "logstash-2016.11.06": []
+}
+
+
+
+class _Client(object):
+    """ Stand-in for a client, recording requests for the catalog. """
+
+    class _Indices(object):
+        def __init__(self):
+            self.requests = 0
+
+        def get_alias(self):
+            self.requests += 1
+            return {name: {"aliases": {alias: {} for alias in aliases}}
+                    for name, aliases in ALIASES_BY_INDEX.items()}
+
+    def __init__(self):
+        self.indices = self._Indices()
+
+
+
+@pytest.fixture(scope="function")
+def persisted_catalog(tmpdir):
+    """
+    Provide a catalog read from disk, with a stand-in client from which to
+    refresh.
+
+    :param py.path.local tmpdir: temporary directory for the test case
+    :return esprov.catalog.IndexCatalog: catalog persisted by "another run"
+    """
+    path = tmpdir.join("catalog.json")
+    path.write(json.dumps({"cluster": None, "fetched": time.time(),
+                           "indices": ALIASES_BY_INDEX}))
+    return IndexCatalog(es_client=_Client(), path=str(path))
+
+
+
+class TestResolve:
+    """ Tests for local resolution of index expressions. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["expression", "expected"],
+            argvalues=[
+                ("provda-2016.11.05", {"provda-2016.11.05"}),
+                ("provda-latest", {"provda-2016.11.06"}),
+                ("provda-*", {"provda-2016.11.05", "provda-2016.11.06"}),
+                ("_all", set(ALIASES_BY_INDEX)),
+                ("*,-provda-*", {"logstash-2016.11.06"}),
+                ("logstash-*, provda-latest",
+                 {"logstash-2016.11.06", "provda-2016.11.06"})
+            ]
+    )
+    def test_resolve(self, persisted_catalog, expression, expected):
+        """ Names, aliases, wildcards and exclusions resolve locally. """
+        assert expected == persisted_catalog.resolve(expression)
+        assert 0 == persisted_catalog.es_client.indices.requests
+
+
+    def test_miss_refreshes(self, persisted_catalog):
+        """ An expression matching nothing prompts a single refresh. """
+        assert set() == persisted_catalog.resolve("unknown")
+        assert 1 == persisted_catalog.es_client.indices.requests
+        assert not persisted_catalog.stale
+
+
+    def test_expired_not_loaded(self, persisted_catalog):
+        """ A persisted catalog older than the TTL isn't trusted. """
+        persisted_catalog.ttl = 60
+        with open(persisted_catalog.path, 'w') as catalog_file:
+            json.dump({"cluster": None, "fetched": time.time() - 120,
+                       "indices": {}}, catalog_file)
+        assert set(ALIASES_BY_INDEX) == set(persisted_catalog.indices())
+        assert 1 == persisted_catalog.es_client.indices.requests
+
+
+
+class TestCatalogOfClient:
+    """ Tests for the catalog shared by all uses of a client. """
+
+
+    def test_shared(self):
+        """ A client has one catalog. """
+        client = _Client()
+        assert index_catalog(client) is index_catalog(client)
+        assert index_catalog(client) is not index_catalog(_Client())
+
+
+    def test_released_with_client(self):
+        """ A client's catalog doesn't keep the client alive. """
+        client = _Client()
+        catalog = weakref.ref(index_catalog(client))
+        del client
+        gc.collect()
+        assert catalog() is None
+
+
+
+class TestInvalidation:
+    """ Tests for refresh of the catalog as indices come and go. """
+
+
+    def test_index_operations_invalidate(self, es_client):
+        """ Creating or deleting an index via the CLI invalidates. """
+        index = make_index_name("catalog")
+        catalog = index_catalog(es_client)
+        assert not catalog.resolve(index)
+        call_cli_func("index create {}".format(index), client=es_client)
+        assert catalog.stale
+        assert {index} == catalog.resolve(index)
+        call_cli_func("index delete {}".format(index), client=es_client)
+        assert catalog.stale
+        assert not catalog.resolve(index)
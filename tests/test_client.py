@@ -0,0 +1,162 @@
+""" Tests for configured Elasticsearch clients. """
+
+import gzip
+import io
+import json
+import threading
+
+import pytest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from esprov import HOST, PORT
+from esprov.client import \
+    make_client, parse_hosts, read_config, CompressedConnection, \
+    CONFIG_PATH_VARNAME, DEFAULT_SETTINGS
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_client"
+
+
+CONFIG_TEXT = """
+[elasticsearch]
+hosts = es1:9201, es2
+maxsize = 25
+timeout = 30
+retry_on_timeout = true
+compress = true
+"""
+
+
+
+@pytest.fixture(scope="function")
+def config_path(tmpdir):
+    """
+    Write a config file.
+
+    :param py.path.local tmpdir: temporary directory for the test case
+    :return str: path to config file
+    """
+    path = tmpdir.join("esprov.cfg")
+    path.write(CONFIG_TEXT)
+    return str(path)
+
+
+
+class TestConfig:
+    """ Tests for reading connection settings. """
+
+
+    def test_defaults(self, tmpdir):
+        """ Absent a config file, every setting takes its default. """
+        assert DEFAULT_SETTINGS == read_config(str(tmpdir.join("none.cfg")))
+
+
+    def test_config_file(self, config_path, monkeypatch):
+        """ Settings in the file named by ESPROV_CONFIG take precedence. """
+        monkeypatch.setenv(CONFIG_PATH_VARNAME, config_path)
+        settings = read_config()
+        assert 25 == settings["maxsize"]
+        assert 30.0 == settings["timeout"]
+        assert settings["retry_on_timeout"] and settings["compress"]
+        assert DEFAULT_SETTINGS["max_retries"] == settings["max_retries"]
+
+
+    @pytest.mark.parametrize(
+            argnames=["text", "expected"],
+            argvalues=[("es1", [{"host": "es1", "port": PORT}]),
+                       ("es1:9201, es2,", [{"host": "es1", "port": 9201},
+                                           {"host": "es2", "port": PORT}])]
+    )
+    def test_hosts(self, text, expected):
+        """ Seed nodes are comma-separated, port optional. """
+        assert expected == parse_hosts(text)
+
+
+    @pytest.mark.parametrize(argnames="text", argvalues=["", " , ", "es1:x"])
+    def test_illegal_hosts(self, text):
+        """ There must be a host, and a port must be an integer. """
+        with pytest.raises(ValueError):
+            parse_hosts(text)
+
+
+    def test_client(self, config_path):
+        """ Client has a connection per seed node, as configured. """
+        client = make_client(config_path)
+        connections = client.transport.connection_pool.connections
+        assert 2 == len(connections)
+        assert all(isinstance(connection, CompressedConnection)
+                   for connection in connections)
+        assert [{"host": HOST, "port": 9200}] == \
+            make_client(config_path, hosts=HOST,
+                        compress=False).transport.hosts
+
+
+
+class TestCompression:
+    """ Tests for compression of requests and responses. """
+
+
+    @pytest.fixture(scope="function")
+    def server(self):
+        """
+        Serve a canned, gzipped search response, recording each request.
+
+        :return (int, list[(dict, bytes)]): port on which requests are
+            served, and headers and body of each request received
+        """
+        requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                length = int(self.headers.get("content-length", 0))
+                requests.append((dict((key.lower(), value)
+                                      for key, value in self.headers.items()),
+                                 self.rfile.read(length)))
+                buffer = io.BytesIO()
+                with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+                    gz.write(json.dumps({"hits": {"total": 0, "hits": []}})
+                             .encode("utf-8"))
+                body = buffer.getvalue()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-encoding", "gzip")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        http_server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=http_server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        yield http_server.server_address[1], requests
+        http_server.shutdown()
+        http_server.server_close()
+
+
+    def test_roundtrip(self, server, tmpdir):
+        """ Large request bodies are gzipped; responses are decoded. """
+        port, requests = server
+        client = make_client(str(tmpdir.join("none.cfg")),
+                             hosts="127.0.0.1:{}".format(port),
+                             compress=True)
+        query = {"query": {"terms": {"instance": ["x" * 40] * 100}}}
+        assert 0 == client.search(index="provda", body=query)["hits"]["total"]
+        headers, body = requests[-1]
+        assert "gzip" == headers["content-encoding"]
+        assert "gzip" in headers["accept-encoding"]
+        assert query == json.loads(
+                gzip.GzipFile(fileobj=io.BytesIO(body)).read().decode("utf-8"))
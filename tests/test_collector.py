@@ -0,0 +1,231 @@
+""" Tests for the TCP collector that stands in for the logstash input. """
+
+import json
+import socket
+import threading
+import time
+
+from elasticsearch_dsl import Search
+import pytest
+
+from .conftest import make_index_name
+from .data import *
+from esprov import \
+    DOCTYPE_KEY, HOSTNAME_KEY, PORT_KEY, TIMESTAMP_KEY, VERSION_KEY
+from esprov.provda_record import validate_record, InvalidRecordException
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_collector"
+
+
+# The collector requires asyncio (Python 3).
+collector = pytest.importorskip("esprov.collector")
+
+
+
+class TestValidation:
+    """ Tests for validation of records against the provda mapping. """
+
+
+    @pytest.mark.parametrize(argnames="record", argvalues=ALL_LOGS)
+    def test_valid(self, record):
+        """ Records as logstash stores them are valid. """
+        validate_record(record)
+
+
+    @pytest.mark.parametrize(
+            argnames="record",
+            argvalues=[["not", "a", "mapping"],
+                       dict(ACTIVITY_LOGS[0], unmapped_field=1),
+                       {k: v for k, v in ACTIVITY_LOGS[0].items()
+                        if k != DOCTYPE_KEY},
+                       dict(ACTIVITY_LOGS[0], **{DOCTYPE_KEY: "unknown"}),
+                       dict(ACTIVITY_LOGS[0], **{TIMESTAMP_KEY: "today"}),
+                       dict(ACTIVITY_LOGS[0], **{TIMESTAMP_KEY: 20161106})]
+    )
+    def test_invalid(self, record):
+        """ Non-mapping, unmapped field, bad type, or timestamp without a
+        date invalidates record. """
+        with pytest.raises(InvalidRecordException):
+            validate_record(record)
+
+
+    def test_logstash_fields_added(self):
+        """ Fields that logstash's tcp input would add are filled in. """
+        sent = {k: v for k, v in ACTIVITY_LOGS[0].items()
+                if k not in {TIMESTAMP_KEY, VERSION_KEY,
+                             HOSTNAME_KEY, PORT_KEY}}
+        record = collector.prepare_record(dict(sent), "10.0.0.1", 4242)
+        assert "10.0.0.1" == record[HOSTNAME_KEY]
+        assert 4242 == record[PORT_KEY]
+        assert 1 == record[VERSION_KEY]
+        assert record[TIMESTAMP_KEY].endswith("Z")
+        validate_record(record)
+
+
+
+class TestCollector:
+    """ Tests for receipt and storage of records sent over TCP. """
+
+
+    def test_failed_batch_not_fatal(self):
+        """ A batch whose sending fails unexpectedly is counted as failed,
+        and later batches are still sent. """
+        # Without a client, every bulk request fails, but not as a
+        # connection error that would be retried.
+        instance = collector.Collector(None, index="esprov-test-unsent",
+                                       batch_size=1, flush_interval=0.1)
+        thread = threading.Thread(target=instance.run,
+                                  kwargs={"host": "127.0.0.1", "port": 0})
+        thread.start()
+        try:
+            assert instance.started.wait(10)
+            sender = socket.create_connection(instance.address[:2])
+            for record in CODE_LOGS[:2]:
+                sender.sendall(
+                        "{}\n".format(json.dumps(record)).encode("utf-8"))
+            sender.close()
+            deadline = time.time() + 10
+            while instance.report.failed < 2 and time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            instance.stop()
+            thread.join(10)
+        assert 2 == instance.report.failed
+
+
+    @pytest.fixture(scope="function")
+    def spooled_collector(self, tmpdir, monkeypatch):
+        """
+        Provide a collector, not serving, with records in its spool.
+
+        :param py.path.local tmpdir: temporary directory for the test case
+        :param _pytest.monkeypatch.MonkeyPatch monkeypatch: test case's
+            patcher, with which to shorten the wait between attempts
+        :return esprov.collector.Collector: collector with spooled records
+        """
+        from esprov.spool import Spool
+        monkeypatch.setattr(collector, "INITIAL_RETRY_DELAY", 0.01)
+        instance = collector.Collector(None, index="esprov-test-replay",
+                                       flush_interval=0.1,
+                                       spool_dir=str(tmpdir))
+        instance._spool = Spool(str(tmpdir))
+        instance._write_spool(CODE_LOGS)
+        yield instance
+        instance._spool.close()
+
+
+    def test_replay_retried(self, spooled_collector):
+        """ A spooled batch whose sending fails unexpectedly is retried,
+        rather than the replay giving up. """
+        attempts = []
+
+        def send(batch):
+            attempts.append(len(batch))
+            if len(attempts) == 1:
+                raise RuntimeError("Unexpected failure")
+            spooled_collector._stopping.set()
+            return True
+
+        spooled_collector._send = send
+        spooled_collector._replay()
+        assert [len(CODE_LOGS)] * 2 == attempts
+        assert 0 == spooled_collector.report.failed
+        assert spooled_collector._spool.checkpoint == \
+            spooled_collector._spool.committed
+
+
+    def test_replay_skips_failing_batch(self, spooled_collector):
+        """ A spooled batch that keeps failing is counted as failed, and
+        replay moves past it. """
+        attempts = []
+
+        def send(batch):
+            attempts.append(len(batch))
+            if len(attempts) == collector.MAX_REPLAY_ATTEMPTS:
+                spooled_collector._stopping.set()
+            raise RuntimeError("Unexpected failure")
+
+        spooled_collector._send = send
+        spooled_collector._replay()
+        assert collector.MAX_REPLAY_ATTEMPTS == len(attempts)
+        assert len(CODE_LOGS) == spooled_collector.report.failed
+        assert spooled_collector._spool.checkpoint == \
+            spooled_collector._spool.committed
+
+
+    @pytest.fixture(scope="function")
+    def running_collector(self, request, es_client):
+        """
+        Run a collector, listening on an ephemeral local port, in the
+        background for the requesting test case.
+
+        :param pytest._pytest.fixtures.FixtureRequest request: test case
+        :param elasticsearch.client.Elasticsearch es_client: ES client
+        :return esprov.collector.Collector, str: running collector and name
+            of index in which it stores records
+        """
+        index = make_index_name("collector")
+        instance = collector.Collector(es_client, index=index, batch_size=4,
+                                       flush_interval=0.1, max_pending=2)
+        thread = threading.Thread(target=instance.run,
+                                  kwargs={"host": "127.0.0.1", "port": 0})
+        thread.start()
+        assert instance.started.wait(10)
+
+        def stop():
+            instance.stop()
+            thread.join(10)
+        request.addfinalizer(stop)
+        return instance, index
+
+
+    def test_records_stored(self, running_collector, es_client):
+        """ Each valid record sent is stored; invalid ones are rejected. """
+        instance, index = running_collector
+        sender = socket.create_connection(instance.address[:2])
+        for record in CODE_LOGS:
+            sender.sendall("{}\n".format(json.dumps(record)).encode("utf-8"))
+        sender.sendall(b"not json\n")
+        sender.close()
+
+        deadline = time.time() + 10
+        while instance.report.indexed < len(CODE_LOGS) and \
+                time.time() < deadline:
+            time.sleep(0.1)
+        es_client.indices.refresh(index=index)
+        assert len(CODE_LOGS) == Search(using=es_client, index=index).count()
+        assert 1 == instance.rejected
+
+
+    def test_spooled_records_stored(self, es_client, tmpdir):
+        """ With a spool, records are stored by replaying the spool. """
+        index = make_index_name("collector-spool")
+        instance = collector.Collector(es_client, index=index, batch_size=4,
+                                       flush_interval=0.1,
+                                       spool_dir=str(tmpdir))
+        thread = threading.Thread(target=instance.run,
+                                  kwargs={"host": "127.0.0.1", "port": 0})
+        thread.start()
+        try:
+            assert instance.started.wait(10)
+            sender = socket.create_connection(instance.address[:2])
+            for record in CODE_LOGS:
+                sender.sendall(
+                        "{}\n".format(json.dumps(record)).encode("utf-8"))
+            sender.close()
+            deadline = time.time() + 10
+            while instance.report.indexed < len(CODE_LOGS) and \
+                    time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            instance.stop()
+            thread.join(10)
+        es_client.indices.refresh(index=index)
+        assert len(CODE_LOGS) == Search(using=es_client, index=index).count()
+        assert instance._spool.checkpoint == instance._spool.committed
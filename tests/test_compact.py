@@ -0,0 +1,91 @@
+""" Tests for the compact, array-backed provenance graph. """
+
+import pytest
+
+from .data import *
+from esprov import DOCTYPE_KEY
+from esprov.graph.compact import CompactGraph
+from exploration import build_document
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_compact"
+
+
+SCRIPT = "code:tests/make_history.py"
+AGENT = "people:vr24"
+
+
+
+@pytest.fixture(scope="function")
+def graph():
+    """ Provide a compact graph of a single document. """
+    return CompactGraph.from_records(document_records(DOCUMENT))
+
+
+
+class TestCompactGraph:
+    """ Tests for construction and querying of a compact graph. """
+
+
+    def test_empty(self):
+        """ No records, no nodes or edges. """
+        graph = CompactGraph.from_records([])
+        assert 0 == len(graph)
+        assert 0 == graph.number_of_edges()
+
+
+    def test_node_types_and_attributes(self, graph):
+        """ Node records type a node; edge endpoints alone don't. """
+        assert "agent" == graph.node_type(AGENT)
+        assert graph.node_type(ACTIVITY) is None
+        column = graph.attributes["unk:fullname"]
+        assert "Vincent Reuter" == column[graph.ids.index(AGENT)]
+
+
+    def test_neighbors(self, graph):
+        """ Neighbors are followed along edges, in either direction. """
+        assert SCRIPT in graph.successors(ACTIVITY, edge_types=["used"])
+        assert [AGENT] == graph.successors(
+                ACTIVITY, edge_types=["wasAssociatedWith"])
+        assert [ACTIVITY] == graph.predecessors(SCRIPT)
+
+
+    def test_upstream_and_downstream(self, graph):
+        """ Traversal gives each node's depth, and stops at a limit. """
+        output = "doc:paf/first_history_test0/cvd_ihd.hdf"
+        upstream = graph.upstream(output)
+        assert 1 == upstream[ACTIVITY]
+        assert 2 == upstream[SCRIPT]
+        assert {ACTIVITY: 1} == graph.upstream(output, max_depth=1)
+        assert 2 == graph.downstream(SCRIPT)[output]
+        assert output not in graph.upstream(
+                output, edge_types=["wasGeneratedBy"])
+
+
+    def test_edges_not_repeated(self):
+        """ An edge record seen again adds no edge. """
+        records = document_records(DOCUMENT)
+        assert CompactGraph.from_records(records).number_of_edges() == \
+            CompactGraph.from_records(records + records).number_of_edges()
+
+
+    def test_networkx_round_trip(self):
+        """ Conversion to and from networkx keeps nodes, edges, and types. """
+        original = build_document(document_records(DOCUMENT))
+        converted = CompactGraph.from_networkx(original).to_networkx()
+        assert set(original.nodes()) == set(converted.nodes())
+        assert original.nodes[AGENT] == converted.nodes[AGENT]
+        edges = lambda g: {(source, target, data[DOCTYPE_KEY])
+                           for source, target, data in g.edges(data=True)}
+        assert edges(original) == edges(converted)
+
+
+    def test_unknown_edge_type(self):
+        """ Relationship type must be known. """
+        with pytest.raises(ValueError):
+            CompactGraph(["a", "b"], [-1, -1], {"bogus": ([0], [1])})
@@ -0,0 +1,171 @@
+""" Tests for the CLI query server and the shim that forwards to it. """
+
+import argparse
+import io
+import logging
+import os
+import threading
+
+import pytest
+
+from .conftest import call_cli_func, make_index_name
+from bin import cli
+from esprov.daemon import forward, result_lines, ProvenanceServer
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_daemon"
+
+
+
+LOGGER = logging.getLogger(__modname__)
+
+
+
+def _fetch(es_client, args):
+    if args.fail:
+        raise ValueError("Unknown index: {}".format(args.index))
+    if args.instances:
+        return [args.instances]
+    LOGGER.warning("Fetching %d", args.num_docs)
+    return ({"n": n, "client": es_client} for n in range(args.num_docs))
+
+
+
+def _load(es_client, args):
+    return "loaded"
+
+
+
+def _toy_parser():
+    """
+    Build a parser with a served subcommand and one that's not served.
+
+    :return argparse.ArgumentParser: parser for toy CLI
+    """
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="subcommand")
+    fetch_parser = subparsers.add_parser("fetch")
+    fetch_parser.add_argument("-i", "--index", default="_all")
+    fetch_parser.add_argument("-n", "--num_docs", type=int, default=2)
+    fetch_parser.add_argument("--fail", action="store_true")
+    fetch_parser.add_argument("--instances")
+    fetch_parser.set_defaults(func=_fetch)
+    subparsers.add_parser("load").set_defaults(func=_load)
+    return parser
+
+
+
+def _start(path, es_client, parser):
+    """
+    Start a server on a background thread.
+
+    :param str path: path for the server's socket
+    :param object es_client: client with which server runs commands
+    :param argparse.ArgumentParser parser: parser for forwarded arguments
+    :return esprov.daemon.ProvenanceServer: running server
+    """
+    server = ProvenanceServer(path, es_client, parser=parser)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+
+@pytest.fixture(scope="function")
+def toy_server(tmpdir):
+    """
+    Serve the toy CLI, with a stand-in for the client.
+
+    :param py.path.local tmpdir: temporary directory for the test case
+    :return str: path to the server's socket
+    """
+    path = str(tmpdir.join("esprov.sock"))
+    server = _start(path, "warm-client", _toy_parser())
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+
+class TestForward:
+    """ Tests for commands forwarded to a server. """
+
+
+    def test_output(self, toy_server):
+        """ Each result item is a line of output, produced by the server. """
+        out, err = io.StringIO(), io.StringIO()
+        assert 0 == forward(["fetch", "-n", "3"], path=toy_server,
+                            stdout=out, stderr=err)
+        assert [str({"n": n, "client": "warm-client"}) for n in range(3)] == \
+            out.getvalue().splitlines()
+        assert err.getvalue().rstrip().endswith("Fetching 3")
+
+
+    def test_path_from_caller(self, toy_server, tmpdir):
+        """ A relative path is resolved against the caller's directory. """
+        out = io.StringIO()
+        with tmpdir.as_cwd():
+            assert 0 == forward(["fetch", "--instances", "ids.txt"],
+                                path=toy_server, stdout=out)
+        assert os.path.join(str(tmpdir), "ids.txt") == \
+            out.getvalue().strip()
+
+
+    @pytest.mark.parametrize(argnames="flag", argvalues=["-h", "--help"])
+    def test_help_local(self, toy_server, flag):
+        """ Help is left to the caller's own parser. """
+        assert forward(["fetch", flag], path=toy_server) is None
+
+
+    @pytest.mark.parametrize(
+            argnames="argv",
+            argvalues=[["fetch", "--fail"], ["fetch", "--bogus"], ["load"]]
+    )
+    def test_failure(self, toy_server, argv):
+        """ Errors, bad arguments, and unserved subcommands fail. """
+        out, err = io.StringIO(), io.StringIO()
+        assert 1 == forward(argv, path=toy_server, stdout=out, stderr=err)
+        assert "" == out.getvalue()
+        assert err.getvalue()
+
+
+    def test_no_server(self, tmpdir):
+        """ Absent a server, the command is left to run in-process. """
+        assert forward(["fetch"], path=str(tmpdir.join("none.sock"))) is None
+
+
+    @pytest.mark.parametrize(
+            argnames=["result", "expected"],
+            argvalues=[(True, ["True"]), (3, ["3"]), (None, ["None"]),
+                       (iter(["a", {"b": 1}]), ["a", str({"b": 1})])]
+    )
+    def test_result_lines(self, result, expected):
+        """ Output is rendered as by the executable itself. """
+        assert expected == list(result_lines(result))
+
+
+
+class TestServe:
+    """ Tests for the server with the real CLI and client. """
+
+
+    def test_index_exists(self, es_client, tmpdir):
+        """ A served command sees the same cluster as one run directly. """
+        index = make_index_name("daemon")
+        call_cli_func("index create {}".format(index), client=es_client)
+        server = _start(str(tmpdir.join("esprov.sock")), es_client,
+                        cli.CLIFactory.get_parser())
+        try:
+            out = io.StringIO()
+            assert 0 == forward(["index", "exists", index],
+                                path=server.server_address, stdout=out)
+            assert "True" == out.getvalue().strip()
+        finally:
+            server.shutdown()
+            server.server_close()
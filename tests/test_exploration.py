@@ -0,0 +1,123 @@
+""" Tests for reconstruction of provenance documents as graphs. """
+
+import pytest
+
+from .data import *
+from esprov import DOCTYPE_KEY, DOCUMENT_KEY
+from esprov.graph.edges import edge_endpoints, record_edges
+from exploration import \
+    build_document, build_documents, DocumentMismatchException
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_exploration"
+
+
+
+class TestEdges:
+    """ Tests for extraction of edges from edge records. """
+
+
+    def test_endpoints(self):
+        """ Edge runs from the dependent to what it depends on. """
+        assert ("a", "e") == edge_endpoints(
+                "used", {"prov:activity": "a", "prov:entity": "e"})
+
+
+    @pytest.mark.parametrize(
+            argnames=["edge_type", "attributes"],
+            argvalues=[("used", {"prov:activity": "a"}),
+                       ("bogus", {"prov:activity": "a", "prov:entity": "e"})]
+    )
+    def test_illegal_edge(self, edge_type, attributes):
+        """ Edge type must be known, with both endpoints given. """
+        with pytest.raises(ValueError):
+            edge_endpoints(edge_type, attributes)
+
+
+    def test_repeated_id(self):
+        """ Edges sharing an ID are told apart by position. """
+        record = next(record for record in NON_ENTITY_NON_ACTIVITY_LOGS
+                      if record[DOCTYPE_KEY] == "wasInfluencedBy")
+        keys = [key for key, _, _, _ in record_edges(record)]
+        assert [("_:id7", 0), ("_:id7", 1), ("_:id7", 2)] == keys
+
+
+
+class TestBuildDocument:
+    """ Tests for reconstruction of a single document. """
+
+
+    def test_empty(self):
+        """ No records, no graph. """
+        assert 0 == len(build_document([]))
+
+
+    def test_nodes_and_edges(self):
+        """ Node records become vertices and edge records typed edges. """
+        graph = build_document(document_records(DOCUMENT))
+        assert DOCUMENT == graph.graph[DOCUMENT_KEY]
+        assert "agent" == graph.nodes["people:vr24"][DOCTYPE_KEY]
+        assert "Vincent Reuter" == \
+            graph.nodes["people:vr24"]["unk:fullname"]
+        assert "foaf" not in graph
+        edge_types = {data[DOCTYPE_KEY] for _, _, data
+                      in graph.edges(data=True)}
+        assert {"used", "wasGeneratedBy", "wasAssociatedWith"} == edge_types
+        assert graph.has_edge(ACTIVITY, "code:tests/make_history.py")
+        assert graph.has_edge("doc:paf/first_history_test0/cvd_ihd.hdf",
+                              ACTIVITY)
+
+
+    def test_edges_not_repeated(self):
+        """ An edge record seen again adds no edge. """
+        records = document_records(DOCUMENT)
+        assert build_document(records).number_of_edges() == \
+            build_document(records + records).number_of_edges()
+
+
+    def test_document_mismatch(self):
+        """ Records must all be from the same document. """
+        with pytest.raises(DocumentMismatchException):
+            build_document(CODE_LOGS[:2])
+
+
+
+class TestBuildDocuments:
+    """ Tests for reconstruction of documents from a stream of records. """
+
+
+    def test_one_graph_per_document(self):
+        """ Each document's graph is produced, in order of appearance. """
+        records = sorted(ALL_LOGS, key=lambda record: record[DOCUMENT_KEY])
+        documents = list(build_documents(records))
+        assert sorted({record[DOCUMENT_KEY] for record in ALL_LOGS}) == \
+            [docid for docid, _ in documents]
+        for docid, graph in documents:
+            assert docid == graph.graph[DOCUMENT_KEY]
+
+
+    def test_streamed(self):
+        """ A document is produced before later records are read. """
+        read = []
+
+        def records():
+            for record in sorted(
+                    ALL_LOGS, key=lambda record: record[DOCUMENT_KEY]):
+                read.append(record)
+                yield record
+
+        documents = build_documents(records())
+        docid, _ = next(documents)
+        assert all(record[DOCUMENT_KEY] == docid for record in read[:-1])
+        assert read[-1][DOCUMENT_KEY] != docid
+
+
+    def test_not_contiguous(self):
+        """ A document's records must be together. """
+        with pytest.raises(ValueError):
+            list(build_documents([CODE_LOGS[0], CODE_LOGS[1], CODE_LOGS[0]]))
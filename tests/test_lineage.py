@@ -0,0 +1,140 @@
+""" Tests for tracing the lineage of provenance instances. """
+
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import DOCTYPE_KEY, INSTANCE_KEY
+from esprov.graph.edges import record_edges
+from esprov.graph.lineage import walk
+from esprov.options import LINEAGE_RELATIONS
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_lineage"
+
+
+OUTPUT = "doc:paf/first_history_test0/cvd_ihd.hdf"
+SCRIPT = "code:tests/make_history.py"
+UPSTREAM_OF_OUTPUT = {
+    ACTIVITY: 1, SCRIPT: 2, "doc:gbd-read/schema/table": 2,
+    "doc:gbd/first_history_test0/cvd_ihd.hdf": 2
+}
+
+
+
+class _Neighbors(object):
+    """ Edges among the test records, counting the hops asked about. """
+
+    def __init__(self, downstream=False):
+        self.hops = 0
+        self.adjacency = {}
+        for record in ALL_LOGS:
+            if record[DOCTYPE_KEY] not in LINEAGE_RELATIONS:
+                continue
+            for _, source, target, _ in record_edges(record):
+                if downstream:
+                    source, target = target, source
+                self.adjacency.setdefault(source, []).append(
+                        (target, record[DOCTYPE_KEY]))
+
+
+    def __call__(self, frontier):
+        self.hops += 1
+        for node in frontier:
+            for neighbor, edge_type in self.adjacency.get(node, ()):
+                yield node, neighbor, edge_type
+
+
+
+class TestWalk:
+    """ Tests for breadth-first traversal, a hop at a time. """
+
+
+    def test_upstream(self):
+        """ Each instance is reached once, at its least depth. """
+        found = list(walk(_Neighbors(), [OUTPUT]))
+        assert UPSTREAM_OF_OUTPUT == \
+            {result[INSTANCE_KEY]: result["depth"] for result in found}
+        assert {"instance": ACTIVITY, "depth": 1, "from": OUTPUT,
+                "relation": "wasGeneratedBy"} == found[0]
+
+
+    def test_downstream(self):
+        """ Reversed edges lead from what's used to what depends on it. """
+        found = walk(_Neighbors(downstream=True), [SCRIPT])
+        assert {ACTIVITY: 1, OUTPUT: 2} == \
+            {result[INSTANCE_KEY]: result["depth"] for result in found}
+
+
+    def test_one_lookup_per_hop(self):
+        """ A hop's whole frontier is looked up at once. """
+        neighbors = _Neighbors()
+        list(walk(neighbors, [OUTPUT]))
+        # Two hops reach something, and a third finds nothing further.
+        assert 3 == neighbors.hops
+
+
+    def test_depth_limit(self):
+        """ No more hops are made than the depth limit allows. """
+        neighbors = _Neighbors()
+        found = list(walk(neighbors, [OUTPUT], max_depth=1))
+        assert [ACTIVITY] == [result[INSTANCE_KEY] for result in found]
+        assert 1 == neighbors.hops
+
+
+    def test_fanout_limit(self):
+        """ No more neighbors are followed from an instance than allowed. """
+        found = list(walk(_Neighbors(), [ACTIVITY], max_fanout=1))
+        assert 1 == len([result for result in found
+                         if result["from"] == ACTIVITY])
+
+
+    def test_streamed(self):
+        """ A hop's instances are produced before the next hop is made. """
+        neighbors = _Neighbors()
+        found = walk(neighbors, [OUTPUT])
+        next(found)
+        assert 1 == neighbors.hops
+
+
+    @pytest.mark.parametrize(
+            argnames=["max_depth", "max_fanout"],
+            argvalues=[(0, None), (None, 0), (-1, 1)]
+    )
+    def test_illegal_limit(self, max_depth, max_fanout):
+        """ Limits must allow at least one hop and one neighbor. """
+        with pytest.raises(ValueError):
+            walk(_Neighbors(), [OUTPUT], max_depth, max_fanout)
+
+
+
+class TestLineage:
+    """ Tests for the lineage subcommand, against loaded records. """
+
+
+    def test_upstream(self, es_client, loaded_index):
+        """ Lineage from loaded records matches that from the records. """
+        found = call_cli_func("lineage upstream {} -i {}".format(
+                OUTPUT, loaded_index), client=es_client)
+        assert UPSTREAM_OF_OUTPUT == \
+            {result[INSTANCE_KEY]: result["depth"] for result in found}
+
+
+    def test_relations(self, es_client, loaded_index):
+        """ Only the relationship types named are followed. """
+        found = call_cli_func(
+                "lineage downstream {} -i {} --relations used".format(
+                        SCRIPT, loaded_index), client=es_client)
+        assert [ACTIVITY] == [result[INSTANCE_KEY] for result in found]
+
+
+    def test_unknown_relation(self, es_client, loaded_index):
+        """ Relationship types followed must be known. """
+        with pytest.raises(ValueError):
+            call_cli_func("lineage upstream {} -i {} --relations bogus".format(
+                    OUTPUT, loaded_index), client=es_client)
@@ -15,7 +15,7 @@ from esprov.provda_record import ProvdaRecord
 from .data import *
 
 __author__ = "Vince Reuter"
-__modified__ = "2016-11-21"
+__modified__ = "2026-10-18"
 __credits__ = ["Vince Reuter"]
 __maintainer__ = "Vince Reuter"
 __email__ = "vr24@uw.edu"
@@ -194,4 +194,81 @@ class TestListStagesBasic(RawAndCliValidator):
 
 class TestListStagesCustom:
     """ Tests for nice-to-have sort of features for stage run query. """
-    pass
+
+
+    @pytest.fixture(scope="function")
+    def duplicated_stages(self, es_client):
+        """
+        Upload the activity records twice, once into each of two indices,
+        so that each stage has a duplicate record.
+
+        :param elasticsearch.client.Elasticsearch es_client: ES client
+        :return set[str]: instance of each stage uploaded
+        """
+        upload_records(client=es_client, records_by_index={
+            make_index_name("stages1"): ACTIVITY_LOGS,
+            make_index_name("stages2"): ACTIVITY_LOGS
+        })
+        es_client.indices.refresh(index="_all")
+        return {record["instance"] for record in ACTIVITY_LOGS}
+
+
+    def test_distinct_by_default(self, es_client, duplicated_stages):
+        """ Without --duplicate, each stage is listed once. """
+        observed = list(call_cli_func("list_stages --id", client=es_client))
+        assert duplicated_stages == set(observed)
+        assert len(duplicated_stages) == len(observed)
+
+
+    def test_duplicates_retained(self, es_client, duplicated_stages):
+        """ With --duplicate, every matching record is listed. """
+        observed = list(call_cli_func("list_stages --id --duplicate",
+                                      client=es_client))
+        assert 2 * len(duplicated_stages) == len(observed)
+        assert duplicated_stages == set(observed)
+
+
+    def test_distinct_records(self, es_client, duplicated_stages):
+        """ Without --id, each distinct stage comes as a full record. """
+        observed = list(call_cli_func("list_stages", client=es_client))
+        assert duplicated_stages == {record["instance"]
+                                     for record in observed}
+        assert len(duplicated_stages) == len(observed)
+
+
+    def test_stats(self, es_client, duplicated_stages):
+        """ Stats give each stage's record count and time bounds. """
+        observed = list(call_cli_func("list_stages --id --stats",
+                                      client=es_client))
+        assert duplicated_stages == {stats["instance"] for stats in observed}
+        for stats in observed:
+            assert 2 == stats["count"]
+            assert stats["first_seen"] <= stats["last_seen"]
+
+
+    @pytest.mark.parametrize(argnames=["flags", "factor"],
+                             argvalues=[("", 1), (" --duplicate", 2)])
+    def test_count(self, es_client, duplicated_stages, flags, factor):
+        """ Count is of distinct stages, or of all records with --duplicate """
+        observed = call_cli_func("list_stages --count{}".format(flags),
+                                 client=es_client)
+        assert factor * len(duplicated_stages) == observed
+
+
+    def test_exists(self, es_client, duplicated_stages):
+        """ Existence check reports whether any stage matches. """
+        assert call_cli_func("list_stages --exists", client=es_client) is True
+        assert call_cli_func("list_stages --exists --minutes 0",
+                             client=es_client) is False
+
+
+    def test_count_or_exists(self, es_client):
+        """ Count and existence are alternatives. """
+        with pytest.raises(ValueError):
+            call_cli_func("list_stages --count --exists", client=es_client)
+
+
+    def test_ordered_requires_duplicate(self, es_client, duplicated_stages):
+        """ Distinct stages have no time order to page through. """
+        with pytest.raises(ValueError):
+            list(call_cli_func("list_stages --ordered", client=es_client))
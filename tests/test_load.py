@@ -0,0 +1,194 @@
+""" Tests for bulk loading of provda JSON-lines output into an index. """
+
+import json
+
+from elasticsearch_dsl import Search
+import pytest
+
+from .conftest import call_cli_func, make_index_name, write_records
+from .data import *
+from esprov import DOCTYPE_KEY, TIMESTAMP_KEY
+from esprov.ingestion import \
+    chunked, load_records, read_records, shard_offsets, unroutable
+from esprov.provda_record import record_id
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_load"
+
+
+
+class TestReadRecords:
+    """ Tests for parsing of the JSON-lines records file. """
+
+
+    def test_skips_blank_and_non_provenance(self, tmpdir):
+        """ Only lines encoding a provenance record are produced. """
+        noise = ["", json.dumps({"message": "logstash noise"})]
+        path = write_records(str(tmpdir.join("records.log")),
+                             ACTIVITY_LOGS, extra_lines=noise)
+        records = list(read_records(path))
+        assert ACTIVITY_LOGS == records
+        assert all(DOCTYPE_KEY in record for record in records)
+
+
+    @pytest.mark.parametrize(argnames="num_shards",
+                             argvalues=[1, 2, 3, 8, 1000])
+    def test_shards_cover_all_records(self, num_shards, tmpdir):
+        """ Newline-aligned shards together yield each record exactly once. """
+        path = write_records(str(tmpdir.join("records.log")), ALL_LOGS)
+        shards = shard_offsets(path, num_shards)
+        assert len(shards) <= num_shards
+        records = [record for start, end in shards
+                   for record in read_records(path, start=start, end=end)]
+        assert ALL_LOGS == records
+
+
+    @pytest.mark.parametrize(argnames="size", argvalues=[1, 3, 100])
+    def test_chunked_preserves_items(self, size):
+        """ Chunking partitions items without loss or reordering. """
+        chunks = list(chunked(range(10), size))
+        assert list(range(10)) == [i for chunk in chunks for i in chunk]
+        assert all(len(chunk) <= size for chunk in chunks)
+
+
+    @pytest.mark.parametrize(argnames="size", argvalues=[0, -1])
+    def test_chunked_nonpositive_size(self, size):
+        """ A chunk must be able to hold at least one item. """
+        with pytest.raises(ValueError):
+            list(chunked(range(10), size))
+
+
+
+class TestUnroutable:
+    """ Tests for records that can't be routed to a daily partition. """
+
+    BAD_RECORDS = [
+        {key: value for key, value in CODE_LOGS[0].items()
+         if key != TIMESTAMP_KEY},
+        dict(CODE_LOGS[1], **{TIMESTAMP_KEY: "yesterday"})
+    ]
+
+
+    def test_separated(self):
+        """ A missing or garbage timestamp is an error for its record. """
+        routable, errors = unroutable(CODE_LOGS[2:4] + self.BAD_RECORDS,
+                                      index=None)
+        assert CODE_LOGS[2:4] == routable
+        assert [record_id(record) for record in self.BAD_RECORDS] == \
+            [error["create"]["_id"] for error in errors]
+
+
+    def test_named_index(self):
+        """ Records bound for a named index need no timestamp. """
+        assert (self.BAD_RECORDS, []) == \
+            unroutable(self.BAD_RECORDS, index="provda")
+
+
+    def test_failed_without_aborting(self):
+        """ Unroutable records fail in the load's summary. """
+        summary, = load_records(None, self.BAD_RECORDS, index=None)
+        assert 2 == summary["failed"]
+        assert 0 == summary["indexed"]
+        assert 2 == len(summary["errors"])
+
+
+
+class TestRecordId:
+    """ Tests for derivation of document ID from record identity. """
+
+
+    def test_stable_across_copies(self):
+        """ Copies of a record, e.g. from a replayed log, share an ID. """
+        record = ACTIVITY_LOGS[0]
+        assert record_id(record) == record_id(dict(record))
+
+
+    def test_ignores_non_identity_fields(self):
+        """ Fields like source port don't bear on record identity. """
+        record = ACTIVITY_LOGS[0]
+        assert record_id(record) == record_id(dict(record, port=1))
+
+
+    def test_distinct_on_timestamp(self):
+        """ Repeated runs of the same stage are distinct records. """
+        record = ACTIVITY_LOGS[0]
+        rerun = dict(record, **{TIMESTAMP_KEY: "2016-11-07T11:00:24.199Z"})
+        assert record_id(record) != record_id(rerun)
+
+
+
+class TestLoad:
+    """ Tests for the 'load' subcommand. """
+
+
+    @pytest.mark.parametrize(argnames="chunk_size", argvalues=[1, 7, 500])
+    def test_all_records_loaded(self, chunk_size, es_client, tmpdir):
+        """ Every record in the file is indexed, regardless of chunking. """
+        index = make_index_name("load")
+        path = write_records(str(tmpdir.join("records.log")), ALL_LOGS)
+        command = "load {} --index {} --chunk_size {}".\
+                  format(path, index, chunk_size)
+        summaries = list(call_cli_func(command, client=es_client))
+        overall = summaries[-1]
+        assert NUM_UNIQUE_LOGS == overall["indexed"]
+        assert len(ALL_LOGS) - NUM_UNIQUE_LOGS == overall["duplicates"]
+        assert 0 == overall["failed"]
+        assert NUM_UNIQUE_LOGS == \
+               Search(using=es_client, index=index).count()
+
+
+    @pytest.mark.parametrize(argnames="workers", argvalues=[2, 4])
+    def test_parallel_load(self, workers, es_client, tmpdir):
+        """ Sharded load across processes indexes every record once. """
+        index = make_index_name("load-parallel")
+        path = write_records(str(tmpdir.join("records.log")), ALL_LOGS)
+        command = "load {} --index {} --chunk_size 5 --workers {}".\
+                  format(path, index, workers)
+        summaries = list(call_cli_func(command, client=es_client))
+        overall = summaries[-1]
+        assert workers == overall["workers"]
+        assert NUM_UNIQUE_LOGS == overall["indexed"]
+        assert NUM_UNIQUE_LOGS == \
+               Search(using=es_client, index=index).count()
+
+
+    def test_reload_is_noop(self, es_client, tmpdir):
+        """ Loading the same records again adds no documents. """
+        index = make_index_name("load-twice")
+        path = write_records(str(tmpdir.join("records.log")), ALL_LOGS)
+        command = "load {} --index {}".format(path, index)
+        list(call_cli_func(command, client=es_client))
+        overall = list(call_cli_func(command, client=es_client))[-1]
+        assert 0 == overall["indexed"]
+        assert len(ALL_LOGS) == overall["duplicates"]
+        assert 0 == overall["failed"]
+        assert NUM_UNIQUE_LOGS == \
+               Search(using=es_client, index=index).count()
+
+
+    def test_failures_reported_per_chunk(self, es_client, tmpdir):
+        """ Records violating the strict mapping fail without aborting. """
+        index = make_index_name("load-failures")
+        bad_record = dict(ACTIVITY_LOGS[0], unmapped_field="oops")
+        records = CODE_LOGS[:2] + [bad_record] + CODE_LOGS[2:4]
+        path = write_records(str(tmpdir.join("records.log")), records)
+        command = "load {} --index {} --chunk_size 2".format(path, index)
+        summaries = list(call_cli_func(command, client=es_client))
+        chunk_summaries, overall = summaries[:-1], summaries[-1]
+        assert [0, 1, 0] == [s["failed"] for s in chunk_summaries]
+        assert 4 == overall["indexed"]
+        assert 1 == overall["failed"]
+
+
+    @pytest.mark.parametrize(argnames="index", argvalues=["_all", "prov*"])
+    def test_multi_index_target(self, index, es_client, tmpdir):
+        """ Load must target a single concrete index. """
+        path = write_records(str(tmpdir.join("records.log")), CODE_LOGS)
+        command = "load {} --index {}".format(path, index)
+        with pytest.raises(ValueError):
+            list(call_cli_func(command, client=es_client))
@@ -0,0 +1,91 @@
+""" Tests for batched fetch lookups by doctype and by instance. """
+
+import argparse
+
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import DOCTYPE_KEY, INSTANCE_KEY
+from esprov.provda_record import record_id
+from esprov.utilities import parse_doctypes, read_instances
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_multi_search"
+
+
+LOOKUP_DOCTYPES = ["activity", "entity", "agent"]
+
+
+
+class TestLookupParsing:
+    """ Tests for parsing the doctypes and instances to look up. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["text", "expected"],
+            argvalues=[(None, None), ("activity", ["activity"]),
+                       ("activity, entity", ["activity", "entity"])]
+    )
+    def test_doctypes(self, text, expected):
+        """ Doctypes are comma-separated. """
+        assert expected == parse_doctypes(argparse.Namespace(doctype=text))
+
+
+    @pytest.mark.parametrize(
+            argnames="text",
+            argvalues=["", " ", "activity,", "activity,bogus"]
+    )
+    def test_unknown_doctype(self, text):
+        """ Each doctype named must be known. """
+        with pytest.raises(ValueError):
+            parse_doctypes(argparse.Namespace(doctype=text))
+
+
+    def test_instances(self, tmpdir):
+        """ Instances are listed once each, in order, blanks ignored. """
+        path = tmpdir.join("instances.txt")
+        path.write("b\na\n\n  b \nc\n")
+        assert ["b", "a", "c"] == read_instances(str(path))
+
+
+
+class TestBatchedLookups:
+    """ Tests for results of lookups batched into multi-search requests. """
+
+
+    def test_by_doctype(self, es_client, loaded_index):
+        """ Each doctype's results are reported separately, in order. """
+        command = "fetch -i {} -n 100 --doctype {}".format(
+                loaded_index, ",".join(LOOKUP_DOCTYPES))
+        results = list(call_cli_func(command, client=es_client))
+        assert LOOKUP_DOCTYPES == [result[DOCTYPE_KEY] for result in results]
+        for result in results:
+            expected = {record_id(record) for record in ALL_LOGS
+                        if record[DOCTYPE_KEY] == result[DOCTYPE_KEY]}
+            assert len(expected) == result["total"]
+            assert expected == {record_id(document)
+                                for document in result["documents"]}
+
+
+    @pytest.mark.parametrize(argnames="chunk_size", argvalues=[1, 2, 100])
+    def test_by_instance(self, es_client, loaded_index, tmpdir,
+                         monkeypatch, chunk_size):
+        """ Each instance's results are reported, however they're chunked. """
+        from esprov import utilities
+        monkeypatch.setattr(utilities, "MSEARCH_CHUNK_SIZE", chunk_size)
+        instances = [record[INSTANCE_KEY] for record in ACTIVITY_LOGS[:3]]
+        path = tmpdir.join("instances.txt")
+        path.write("\n".join(instances + ["no-such-instance"]))
+        command = "fetch -i {} --instances {} --count".format(
+                loaded_index, str(path))
+        results = list(call_cli_func(command, client=es_client))
+        assert instances + ["no-such-instance"] == \
+            [result[INSTANCE_KEY] for result in results]
+        assert 0 == results[-1]["total"]
+        assert all(result["total"] > 0 for result in results[:-1])
@@ -0,0 +1,99 @@
+""" Tests for ordered, cursor-paged search results. """
+
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import TIMESTAMP_KEY
+from esprov.provda_record import record_id
+from esprov.utilities import \
+    decode_cursor, encode_cursor, with_cursor, CURSOR_KEY
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_pagination"
+
+
+
+class TestCursor:
+    """ Tests for encoding and decoding of cursor tokens. """
+
+
+    @pytest.mark.parametrize(
+            argnames="sort_values",
+            argvalues=[[1479081600000, "ProvdaRecord#abc"],
+                       [0, u"ProvdaRecord#é"]]
+    )
+    def test_roundtrip(self, sort_values):
+        """ Decoding a token yields the sort values that it encodes. """
+        assert sort_values == decode_cursor(encode_cursor(sort_values))
+
+
+    @pytest.mark.parametrize(
+            argnames="cursor",
+            argvalues=["not a cursor", encode_cursor([1]),
+                       encode_cursor([1, "a", "b"])]
+    )
+    def test_invalid(self, cursor):
+        """ A token that doesn't encode a pair of sort values is rejected. """
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+
+class _Hit(object):
+    """ Stand-in for a search hit, with just its sort values. """
+
+    class _Meta(object):
+        def __init__(self, sort):
+            self.sort = sort
+
+    def __init__(self, *sort):
+        self.meta = self._Meta(list(sort))
+
+
+
+class TestWithCursor:
+    """ Tests for the cursor produced after ordered results. """
+
+
+    def test_cursor_last(self):
+        """ Results are followed by the cursor of the last hit. """
+        hits = [_Hit(1, "a"), _Hit(2, "b")]
+        results = list(with_cursor(hits, convert=lambda hit: hit.meta.sort))
+        assert [[1, "a"], [2, "b"]] == results[:-1]
+        assert {CURSOR_KEY: encode_cursor([2, "b"])} == results[-1]
+
+
+    def test_no_hits(self):
+        """ Without hits there's nothing to resume after. """
+        assert [] == list(with_cursor([], convert=lambda hit: hit))
+
+
+
+class TestOrderedFetch:
+    """ Tests for time-ordered fetching, resumed by cursor. """
+
+
+    @pytest.mark.parametrize(argnames="num_docs", argvalues=[1, 7, 100])
+    def test_resume_covers_all_in_order(self, loaded_index, num_docs):
+        """ Successive capped calls, each resumed by cursor, yield every
+        record exactly once and in time order. """
+        fetched = []
+        command = "fetch --ordered -i {} -n {}".format(loaded_index, num_docs)
+        while True:
+            page = list(call_cli_func(command))
+            if not page:
+                break
+            page, last = page[:-1], page[-1]
+            fetched.extend(page)
+            command = "fetch -i {} -n {} --cursor {}".format(
+                    loaded_index, num_docs, last[CURSOR_KEY])
+        timestamps = [record[TIMESTAMP_KEY] for record in fetched]
+        assert sorted(timestamps) == timestamps
+        assert len({record_id(record) for record in ALL_LOGS}) == \
+            len(fetched)
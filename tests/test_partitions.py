@@ -0,0 +1,137 @@
+""" Tests for daily partitioning of provenance record indices. """
+
+import datetime
+
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import TIMESTAMP_KEY
+from esprov.partitions import \
+    is_partition, lag_timedelta, partition_date, partition_name, \
+    partitions_between, pruned_index_expression, record_partition, \
+    template_body, PARTITION_PATTERN
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_partitions"
+
+
+NOW = datetime.datetime(2016, 11, 21, 1, 30)
+
+
+
+class TestPartitionNames:
+    """ Tests for mapping of timestamps to daily partitions. """
+
+
+    @pytest.mark.parametrize(
+            argnames="timestamp",
+            argvalues=["2016-11-06T10:45:51.927Z", "2016-11-06T23:59:59Z",
+                       datetime.datetime(2016, 11, 6, 0, 0)]
+    )
+    def test_partition_name(self, timestamp):
+        """ Partition is determined by UTC date alone. """
+        assert "provda-2016.11.06" == partition_name(timestamp)
+
+
+    def test_record_partition(self):
+        """ Records are routed according to their timestamp. """
+        assert {"provda-2016.11.06", "provda-2016.11.16"} == \
+               {record_partition(record) for record in ACTIVITY_LOGS}
+
+
+    @pytest.mark.parametrize(
+            argnames="timestamp",
+            argvalues=[None, "yesterday", 1478429151],
+            ids=["missing", "garbage", "number"]
+    )
+    def test_record_without_date(self, timestamp):
+        """ A record without a dated timestamp can't be routed. """
+        record = dict(ACTIVITY_LOGS[0])
+        if timestamp is None:
+            del record[TIMESTAMP_KEY]
+        else:
+            record[TIMESTAMP_KEY] = timestamp
+        with pytest.raises(ValueError):
+            record_partition(record)
+
+
+    @pytest.mark.parametrize(
+            argnames=["name", "expected"],
+            argvalues=[("provda-2016.11.06", True), ("provda", False),
+                       ("provda-latest", False), ("provda_edges", False)]
+    )
+    def test_is_partition(self, name, expected):
+        """ A partition is named for its day. """
+        assert expected is is_partition(name)
+        if expected:
+            assert datetime.date(2016, 11, 6) == partition_date(name)
+
+
+    def test_partitions_between(self):
+        """ Each day overlapping a timespan is included, in order. """
+        start = datetime.datetime(2016, 11, 29, 22)
+        end = datetime.datetime(2016, 12, 1, 2)
+        assert ["provda-2016.11.29", "provda-2016.11.30",
+                "provda-2016.12.01"] == partitions_between(start, end)
+
+
+
+class TestPruning:
+    """ Tests for narrowing of a search to relevant partitions. """
+
+
+    @pytest.mark.parametrize(
+            argnames="lag_kwargs,num_partitions",
+            argvalues=[({"hours": 1}, 1), ({"hours": 3}, 2),
+                       ({"days": 2}, 3), ({"weeks": 1, "days": 1}, 9),
+                       ({"months": 1}, 32)]
+    )
+    def test_partition_count(self, lag_kwargs, num_partitions):
+        """ Lag determines the (small) number of partitions to search. """
+        expression = pruned_index_expression(
+                PARTITION_PATTERN, lag=lag_timedelta(**lag_kwargs), now=NOW)
+        assert num_partitions == len(expression.split(","))
+
+
+    def test_all_retains_unpartitioned_indices(self):
+        """ Searching everything still searches non-partition indices. """
+        expression = pruned_index_expression(
+                "_all", lag=lag_timedelta(hours=3), now=NOW)
+        assert ["*", "-{}".format(PARTITION_PATTERN),
+                "provda-2016.11.20", "provda-2016.11.21"] == \
+               expression.split(",")
+
+
+    def test_lagged_listing_excludes_edges(self, monkeypatch):
+        """ A pruned search for stages still keeps out edge indices. """
+        from esprov import functions
+        monkeypatch.setattr(functions, "_stages_result",
+                            lambda search, args: search)
+        search = call_cli_func("list_stages --id --hours 3", client=None)
+        index = search._index[0].split(",")
+        assert "-*_edges" == index[-1]
+        assert "-{}".format(PARTITION_PATTERN) in index
+
+
+    def test_specific_index_not_pruned(self):
+        """ An explicitly named index is searched as given. """
+        assert pruned_index_expression(
+                "esprov-test-index", lag=lag_timedelta(hours=3), now=NOW) \
+               is None
+
+
+
+def test_template_matches_partitions():
+    """ Template applies the shared strict record mapping to partitions. """
+    body = template_body()
+    assert PARTITION_PATTERN == body["template"]
+    mapping = body["mappings"]["_default_"]
+    assert "strict" == mapping["dynamic"]
+    assert {"enabled": False, "type": "object"} == \
+           mapping["properties"]["@fields"]
@@ -0,0 +1,103 @@
+""" Tests for the choice of retrieval plan for a query's hits. """
+
+import argparse
+
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import TIMESTAMP_KEY
+from esprov.provda_record import record_id
+from esprov.utilities import \
+    parse_num_docs, plan_search, IllegalItemsLimitException, \
+    CURSOR_KEY, PLAN_SCROLL, PLAN_SEARCH, PLAN_SLICED_SCROLL, \
+    SINGLE_REQUEST_LIMIT, SLICED_SCROLL_THRESHOLD
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_planner"
+
+
+
+class TestPlan:
+    """ Tests for choosing plain search, scroll, or sliced scroll. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["limit", "estimate", "expected"],
+            argvalues=[
+                (3, None, PLAN_SEARCH),
+                (None, 50, PLAN_SEARCH),
+                (SINGLE_REQUEST_LIMIT + 1, 10, PLAN_SEARCH),
+                (SINGLE_REQUEST_LIMIT + 1, None, PLAN_SCROLL),
+                (None, SINGLE_REQUEST_LIMIT + 1, PLAN_SCROLL),
+                (None, None, PLAN_SCROLL),
+                (None, SLICED_SCROLL_THRESHOLD, PLAN_SLICED_SCROLL),
+                (SLICED_SCROLL_THRESHOLD, 10 * SLICED_SCROLL_THRESHOLD,
+                 PLAN_SLICED_SCROLL)
+            ]
+    )
+    def test_plan(self, limit, estimate, expected):
+        """ Plan follows the number of hits expected to be retrieved. """
+        assert expected == plan_search(limit=limit, estimate=estimate)
+
+
+    @pytest.mark.parametrize(argnames=["num_docs", "expected"],
+                             argvalues=[(None, None), (3, 3), ("12", 12)])
+    def test_num_docs(self, num_docs, expected):
+        """ Limit is given as-is, with no minimum imposed. """
+        assert expected == parse_num_docs(argparse.Namespace(
+                num_docs=num_docs))
+
+
+    @pytest.mark.parametrize(argnames="num_docs", argvalues=[-5, -1, 0])
+    def test_nonpositive_num_docs(self, num_docs):
+        """ A limit must be positive. """
+        with pytest.raises(IllegalItemsLimitException):
+            parse_num_docs(argparse.Namespace(num_docs=num_docs))
+
+
+
+class TestPlannedFetch:
+    """ Tests for the hits fetched under each plan. """
+
+
+    @pytest.mark.parametrize(argnames="num_docs", argvalues=[None, 1, 3, 100])
+    def test_limit(self, es_client, loaded_index, num_docs):
+        """ Each plan fetches all hits, up to the limit. """
+        index = loaded_index
+        command = "fetch -i {}".format(index)
+        if num_docs is not None:
+            command += " -n {}".format(num_docs)
+        num_unique = len({record_id(record) for record in ALL_LOGS})
+        observed = list(call_cli_func(command, client=es_client))
+        assert min(num_docs or num_unique, num_unique) == len(observed)
+
+
+    @pytest.mark.parametrize(argnames="slices", argvalues=[1, 2, 5])
+    @pytest.mark.parametrize(argnames="ordered", argvalues=[False, True])
+    def test_parallel(self, es_client, loaded_index, slices, ordered):
+        """ A sliced scan fetches every hit once, merged in order if asked. """
+        command = "fetch -i {} --parallel {}{}".format(
+                loaded_index, slices, " --ordered" if ordered else "")
+        observed = list(call_cli_func(command, client=es_client))
+        if ordered:
+            # Ordered hits end with the cursor after the last.
+            assert [CURSOR_KEY] == list(observed.pop())
+        assert len({record_id(record) for record in ALL_LOGS}) == \
+            len({record_id(record) for record in observed}) == len(observed)
+        if ordered:
+            timestamps = [record[TIMESTAMP_KEY] for record in observed]
+            assert sorted(timestamps) == timestamps
+
+
+    def test_parallel_no_cursor(self, es_client, loaded_index):
+        """ A sliced scan can't resume from a cursor. """
+        command = "fetch -i {} --parallel 2 --cursor WzAsImEiXQ==".format(
+                loaded_index)
+        with pytest.raises(ValueError):
+            list(call_cli_func(command, client=es_client))
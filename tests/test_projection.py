@@ -0,0 +1,111 @@
+""" Tests for projection of search hits to a subset of record fields. """
+
+import argparse
+
+from elasticsearch_dsl.response.hit import Hit
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import DOCUMENT_FIELDNAMES, INSTANCE_KEY, TIMESTAMP_KEY
+from esprov.provda_record import record_id
+from esprov.utilities import build_search, field_value, parse_fields
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_projection"
+
+
+
+class TestBuildSearch:
+    """ Tests for projection in the search built for a CLI query. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["text", "expected"],
+            argvalues=[(None, None), ("", None),
+                       ("instance", ["instance"]),
+                       ("instance, @timestamp,", ["instance", "@timestamp"])]
+    )
+    def test_parse_fields(self, text, expected):
+        """ Field names are comma-separated, with blanks ignored. """
+        assert expected == parse_fields(argparse.Namespace(fields=text))
+
+
+    def test_unknown_field(self):
+        """ Projection to a field that records lack is an error. """
+        with pytest.raises(ValueError):
+            parse_fields(argparse.Namespace(fields="instance,bogus"))
+
+
+    def test_source_includes(self):
+        """ Fields given with --fields limit the source retrieved. """
+        args = argparse.Namespace(index="_all", num_docs=10,
+                                  fields="instance,document")
+        body = build_search(None, args).to_dict()
+        assert {"includes": ["instance", "document"]} == body["_source"]
+
+
+    def test_docvalues_skip_source(self):
+        """ Reading from doc values retrieves no source at all. """
+        args = argparse.Namespace(index="_all", num_docs=10, fields=None)
+        body = build_search(None, args,
+                            docvalue_fields=[INSTANCE_KEY]).to_dict()
+        assert body["_source"] is False
+        assert [INSTANCE_KEY] == body["docvalue_fields"]
+
+
+    @pytest.mark.parametrize(
+            argnames="hit",
+            argvalues=[Hit({"_id": "a", "_source": {INSTANCE_KEY: "x"}}),
+                       Hit({"_id": "a", "fields": {INSTANCE_KEY: ["x"]}})]
+    )
+    def test_field_value(self, hit):
+        """ A field's value is the same from source or doc values. """
+        assert "x" == field_value(hit, INSTANCE_KEY)
+
+
+
+class TestProjectedQueries:
+    """ Tests for projected results of the query subcommands. """
+
+
+    def test_stage_ids(self, loaded_index):
+        """ ID-only listing produces each activity's instance. """
+        observed = list(call_cli_func(
+                "list_stages --id -i {} -n 100".format(loaded_index)))
+        assert {log[INSTANCE_KEY] for log in ACTIVITY_LOGS} == set(observed)
+
+
+    def test_fetch_fields(self, loaded_index):
+        """ Fetched documents have only the fields requested. """
+        fields = {INSTANCE_KEY, TIMESTAMP_KEY}
+        observed = list(call_cli_func(
+                "fetch -i {} -n 100 --fields {}".format(
+                        loaded_index, ",".join(fields))))
+        assert observed
+        assert all(fields == set(doc) for doc in observed)
+        assert fields < DOCUMENT_FIELDNAMES
+
+
+    @pytest.mark.parametrize(argnames=["doctype", "records"],
+                             argvalues=[(None, ALL_LOGS),
+                                        ("activity", ACTIVITY_LOGS)])
+    def test_fetch_count(self, loaded_index, doctype, records):
+        """ Count is determined without retrieving any document. """
+        command = "fetch -i {} --count".format(loaded_index)
+        if doctype:
+            command += " --doctype {}".format(doctype)
+        # The load stores a repeated record only once.
+        expected = len({record_id(record) for record in records})
+        assert expected == call_cli_func(command)
+
+
+    def test_fetch_exists(self, loaded_index):
+        """ Existence is determined without retrieving any document. """
+        command = "fetch -i {} --exists".format(loaded_index)
+        assert call_cli_func(command) is True
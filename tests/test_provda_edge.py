@@ -0,0 +1,222 @@
+""" Tests for the projection of relationship records into edge documents. """
+
+from elasticsearch_dsl import Search
+import pytest
+
+from .conftest import call_cli_func, make_index_name, write_records
+from .data import *
+from esprov import DOCTYPE_KEY, DOCUMENT_KEY, EDGE_NAMES, TIMESTAMP_KEY
+from esprov.catalog import index_catalog
+from esprov.functions import _lineage_edges
+from esprov.graph.lineage import IndexedEdges, RecordEdges
+from esprov.provda_edge import \
+    delete_partition_edges, edge_documents, edge_index, \
+    edge_index_expression, record_index_expression, source_record_id, \
+    RELATION_KEY, SOURCE_KEY, TARGET_KEY
+from esprov.provda_record import record_id
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_provda_edge"
+
+
+EDGE_LOGS = [record for record in ALL_LOGS
+             if record[DOCTYPE_KEY] in EDGE_NAMES]
+NUM_UNIQUE_EDGES = len({document_id for record in EDGE_LOGS
+                        for document_id, _ in edge_documents(record)})
+
+
+
+class TestEdgeDocuments:
+    """ Tests for the edge documents that a record projects to. """
+
+
+    def test_node_record(self):
+        """ A record that isn't a relationship has no edges. """
+        assert [] == list(edge_documents(CODE_LOGS[0]))
+
+
+    def test_edge_record(self):
+        """ Each edge of a record has its endpoints, type, and document. """
+        record = next(record for record in EDGE_LOGS
+                      if record[DOCTYPE_KEY] == "wasGeneratedBy")
+        (document_id, document), = edge_documents(record)
+        assert record_id(record) == source_record_id(document_id)
+        assert "doc:paf/first_history_test0/cvd_ihd.hdf" == \
+            document[SOURCE_KEY]
+        assert record[DOCUMENT_KEY] == document[TARGET_KEY]
+        assert "wasGeneratedBy" == document[RELATION_KEY]
+
+
+    def test_repeated_edge_id(self):
+        """ Edges sharing an ID within a record are distinct documents. """
+        record = next(record for record in EDGE_LOGS
+                      if record[DOCTYPE_KEY] == "wasInfluencedBy")
+        document_ids = [document_id for document_id, _
+                        in edge_documents(record)]
+        assert 3 == len(set(document_ids))
+
+
+    def test_record_id_of_record(self):
+        """ A record's own ID is its source record ID. """
+        assert record_id(CODE_LOGS[0]) == \
+            source_record_id(record_id(CODE_LOGS[0]))
+
+
+
+class TestEdgeIndexNames:
+    """ Tests for naming the edge indices that correspond to records'. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["index", "expected"],
+            argvalues=[(None, "provda_edges"), ("provda", "provda_edges"),
+                       ("esprov-test-x", "esprov-test-x_edges")]
+    )
+    def test_edge_index(self, index, expected):
+        """ Edges are kept in the records' index name, suffixed. """
+        assert expected == edge_index(index)
+
+
+    @pytest.mark.parametrize(
+            argnames=["expression", "expected"],
+            argvalues=[("_all", "*_edges"), ("provda-*", "provda_edges"),
+                       ("a, b*", "a_edges,b*_edges"),
+                       ("provda-2016.11.06", "provda_edges"),
+                       ("provda-2016.11.*", "provda_edges"),
+                       ("provda-2016.11.05,provda-2016.11.06,a",
+                        "provda_edges,a_edges")]
+    )
+    def test_edge_index_expression(self, expression, expected):
+        """ Each part of a records' index expression maps to its edges',
+        and partitions' to the one edge index they share. """
+        assert expected == edge_index_expression(expression)
+
+
+    @pytest.mark.parametrize(
+            argnames=["expression", "expected"],
+            argvalues=[("_all", "*,-*_edges"), ("a", "a"),
+                       ("provda-*", "provda-*,-*_edges"),
+                       ("a,b*", "a,b*,-*_edges")]
+    )
+    def test_record_index_expression(self, expression, expected):
+        """ Edge indices are excluded from wildcard searches of records. """
+        assert expected == record_index_expression(expression)
+
+
+
+class _Client(object):
+    """ Stand-in for a client, with a fixed set of indices. """
+
+    class _Indices(object):
+        def __init__(self, names):
+            self.names = names
+
+        def get_alias(self):
+            return {name: {"aliases": {}} for name in self.names}
+
+    def __init__(self, *names):
+        self.indices = self._Indices(names)
+        self.deletions = []
+
+    def delete_by_query(self, index, body, **kwargs):
+        self.deletions.append((index, body))
+        return {"deleted": len(body["query"]["bool"]["should"])}
+
+
+
+class TestEdgeSources:
+    """ Tests for the choice of where to find a lineage's edges. """
+
+
+    def test_all_indexed(self):
+        """ Indices that all have edge indices are traced from those. """
+        client = _Client("a", "a_edges", "provda-2016.11.06", "provda_edges")
+        edges, edge_indices = _lineage_edges(
+                client, "a,provda-2016.11.06", "upstream", ["used"])
+        assert isinstance(edges, IndexedEdges)
+        assert "a_edges,provda_edges" == edge_indices == edges.index
+
+
+    def test_none_indexed(self):
+        """ Without edge indices, edges are read from records. """
+        edges, edge_indices = _lineage_edges(
+                _Client("a"), "a", "upstream", ["used"])
+        assert isinstance(edges, RecordEdges)
+        assert edge_indices is None
+
+
+    def test_partly_indexed(self):
+        """ An index without an edge index has its records read, while
+        another's edges are still looked up. """
+        edges, edge_indices = _lineage_edges(
+                _Client("a", "a_edges", "b"), "a,b", "upstream", ["used"])
+        assert not isinstance(edges, (IndexedEdges, RecordEdges))
+        assert edge_indices is None
+
+
+
+class TestPartitionEdgeDeletion:
+    """ Tests for deletion of the edges of daily partitions. """
+
+
+    def test_by_day(self):
+        """ A partition's edges are those of its day's records. """
+        client = _Client()
+        assert 2 == delete_partition_edges(
+                client, ["provda-2016.11.06", "provda-2016.11.30"])
+        (index, body), = client.deletions
+        assert edge_index() == index
+        spans = [clause["range"][TIMESTAMP_KEY]
+                 for clause in body["query"]["bool"]["should"]]
+        assert [{"gte": "2016-11-06", "lt": "2016-11-07"},
+                {"gte": "2016-11-30", "lt": "2016-12-01"}] == spans
+
+
+    def test_not_partition(self):
+        """ Only partitions share an edge index. """
+        with pytest.raises(ValueError):
+            delete_partition_edges(_Client(), ["provda"])
+
+
+
+class TestEdgeIngestion:
+    """ Tests for storage of edges as records are loaded. """
+
+
+    def test_edges_loaded(self, es_client, tmpdir):
+        """ Each edge is stored once, even if its record is reloaded. """
+        index = make_index_name("edges")
+        path = write_records(str(tmpdir.join("records.log")), ALL_LOGS)
+        command = "load {} --index {}".format(path, index)
+        overall = list(call_cli_func(command, client=es_client))[-1]
+        assert NUM_UNIQUE_EDGES == overall["edges"]
+        assert 0 == overall["edges_failed"]
+        overall = list(call_cli_func(command, client=es_client))[-1]
+        assert 0 == overall["edges"]
+        assert NUM_UNIQUE_EDGES == \
+            Search(using=es_client, index=edge_index(index)).count()
+
+
+    def test_edges_not_fetched_as_records(self, es_client, load_index):
+        """ Searches for records by wildcard don't hit edges. """
+        index = load_index("edges-hidden")
+        es_client.indices.refresh(index="{}*".format(index))
+        assert NUM_UNIQUE_LOGS == call_cli_func(
+                "fetch -i {}* --count".format(index), client=es_client)
+
+
+    def test_lineage_without_edge_index(self, es_client, load_index):
+        """ Records without an edge index still have their lineage read. """
+        index = load_index("no-edges")
+        es_client.indices.delete(index=edge_index(index))
+        index_catalog(es_client).invalidate()
+        found = call_cli_func("lineage downstream {} -i {}".format(
+                "code:tests/make_history.py", index), client=es_client)
+        assert {"is:0a16324a-0017-47e9-a727-199d1f3e0fce": 1,
+                "doc:paf/first_history_test0/cvd_ihd.hdf": 2} == \
+            {result["instance"]: result["depth"] for result in found}
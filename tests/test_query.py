@@ -0,0 +1,90 @@
+""" Tests for compilation of query criteria into filter clauses. """
+
+import pytest
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import DOCTYPE_KEY, INSTANCE_KEY, TIMESTAMP_KEY
+from esprov.provda_record import record_id
+from esprov.query import round_date, QuerySpec
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_query"
+
+
+
+class TestCompile:
+    """ Tests for the clauses compiled from each criterion. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["expression", "unit", "expected"],
+            argvalues=[("now-3d", "m", "now-3d/m"), ("now", "d", "now/d"),
+                       ("now-1H/H", "m", "now-1H/H"),
+                       ("2016-11-06", "m", "2016-11-06"),
+                       ("now-3d", None, "now-3d")]
+    )
+    def test_round_date(self, expression, unit, expected):
+        """ Only relative, unrounded times are rounded. """
+        assert expected == round_date(expression, unit)
+
+
+    def test_no_criteria(self):
+        """ Absent criteria, everything matches. """
+        assert {"match_all": {}} == QuerySpec().to_dict()
+
+
+    @pytest.mark.parametrize(
+            argnames=["spec", "expected"],
+            argvalues=[
+                (QuerySpec(doctypes="activity"),
+                 {"term": {DOCTYPE_KEY: "activity"}}),
+                (QuerySpec(doctypes=["activity", "entity"]),
+                 {"terms": {DOCTYPE_KEY: ["activity", "entity"]}}),
+                (QuerySpec(namespace="code"),
+                 {"prefix": {INSTANCE_KEY: "code:"}}),
+                (QuerySpec(since="now-1d", until="now"),
+                 {"range": {TIMESTAMP_KEY: {"gte": "now-1d/m",
+                                            "lte": "now/m"}}})
+            ]
+    )
+    def test_single_criterion(self, spec, expected):
+        """ Each criterion is a single filter clause; nothing is scored. """
+        assert {"bool": {"filter": [expected]}} == spec.to_dict()
+
+
+    def test_criteria_combined(self):
+        """ Records must meet every criterion given. """
+        spec = QuerySpec(doctypes=["activity"], instances=["a", "b"],
+                         documents=["d"], since="now-2H")
+        clauses = spec.to_dict()["bool"]["filter"]
+        assert 4 == len(clauses)
+        assert {"terms": {INSTANCE_KEY: ["a", "b"]}} in clauses
+
+
+    def test_repeated_query_stable(self):
+        """ A relative timespan compiles to bounds rounded to the minute, so
+        that repetitions within a minute share cached filter results. """
+        clause, = QuerySpec(since="now-3d", until="now").clauses()
+        assert {"range": {TIMESTAMP_KEY: {"gte": "now-3d/m",
+                                          "lte": "now/m"}}} == \
+            clause.to_dict()
+
+
+
+class TestFilteredFetch:
+    """ Tests for fetches confined by filter criteria. """
+
+
+    def test_namespace(self, es_client, loaded_index):
+        """ Namespace restricts hits to instances with its prefix. """
+        command = "fetch -i {} -n 100 --namespace code".format(loaded_index)
+        observed = list(call_cli_func(command, client=es_client))
+        expected = {record_id(record) for record in ALL_LOGS
+                    if record[INSTANCE_KEY].startswith("code:")}
+        assert expected == {record_id(record) for record in observed}
@@ -0,0 +1,358 @@
+""" Tests for the cache of traced lineages. """
+
+import sqlite3
+
+import pytest
+
+from .conftest import call_cli_func
+from esprov import INSTANCE_KEY
+from esprov.graph.reachability import \
+    cached_walk, forget_edge_indices, reachability_cache, ReachabilityCache
+from esprov.result_cache import CACHE_DIR_VARNAME
+from esprov.options import DOWNSTREAM_NAME, UPSTREAM_NAME
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_reachability"
+
+
+SCOPE = "esprov-test_edges"
+RELATIONS = ("used", "wasGeneratedBy")
+
+# Output derives from an activity, which used two inputs, one of them
+# itself derived from a raw input.
+UPSTREAM_EDGES = {
+    "doc:output": [("is:activity", "wasGeneratedBy")],
+    "is:activity": [("doc:input", "used"), ("doc:derived", "used")],
+    "doc:derived": [("doc:raw", "wasGeneratedBy")]
+}
+
+
+
+class _Neighbors(object):
+    """ Source of edges for a lineage walk that counts its hops. """
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.hops = 0
+
+
+    def __call__(self, frontier):
+        self.hops += 1
+        for node in frontier:
+            for neighbor, edge_type in self.edges.get(node, []):
+                yield node, neighbor, edge_type
+
+
+
+class _Client(object):
+    """ Stand-in for a client, with the one index to remove. """
+
+    class _Indices(object):
+        def get_alias(self):
+            return {"esprov-test": {"aliases": {}}, SCOPE: {"aliases": {}}}
+
+        def delete(self, index, ignore=None):
+            pass
+
+    def __init__(self):
+        self.indices = self._Indices()
+
+
+
+@pytest.fixture
+def cache(tmpdir):
+    """ Provide an empty cache, in a temporary folder. """
+    cache = ReachabilityCache(str(tmpdir.join("reachability.sqlite")))
+    yield cache
+    cache.close()
+
+
+
+def _instances(found):
+    return {result[INSTANCE_KEY]: result["depth"] for result in found}
+
+
+
+def _cache_upstream(cache, start="doc:output", max_depth=None):
+    return list(cached_walk(cache, SCOPE, _Neighbors(UPSTREAM_EDGES),
+                            [start], UPSTREAM_NAME, RELATIONS,
+                            max_depth=max_depth))
+
+
+
+class TestLookup:
+    """ Tests for storage and lookup of lineages. """
+
+
+    def test_miss(self, cache):
+        """ A lineage that's not been traced isn't cached. """
+        assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                             RELATIONS) is None
+
+
+    def test_traced_then_served(self, cache):
+        """ Once traced, a lineage is served without following edges. """
+        expected = {"is:activity": 1, "doc:input": 2, "doc:derived": 2,
+                    "doc:raw": 3}
+        assert expected == _instances(_cache_upstream(cache))
+        neighbors = _Neighbors(UPSTREAM_EDGES)
+        found = list(cached_walk(cache, SCOPE, neighbors, ["doc:output"],
+                                 UPSTREAM_NAME, reversed(RELATIONS)))
+        assert 0 == neighbors.hops
+        assert expected == _instances(found)
+        assert [1, 2, 2, 3] == [result["depth"] for result in found]
+
+
+    def test_max_depth(self, cache):
+        """ A cached lineage is limited to the depth asked for. """
+        _cache_upstream(cache)
+        found = cached_walk(cache, SCOPE, _Neighbors(UPSTREAM_EDGES),
+                            ["doc:output"], UPSTREAM_NAME, RELATIONS,
+                            max_depth=2)
+        assert {"is:activity": 1, "doc:input": 2, "doc:derived": 2} == \
+            _instances(found)
+
+
+    def test_multiple_starts(self, cache):
+        """ An instance reached from more than one start is at its least
+        depth, and the starts themselves aren't produced. """
+        _cache_upstream(cache)
+        found = cached_walk(cache, SCOPE, _Neighbors(UPSTREAM_EDGES),
+                            ["doc:output", "doc:derived"], UPSTREAM_NAME,
+                            RELATIONS)
+        assert {"is:activity": 1, "doc:input": 2, "doc:raw": 1} == \
+            _instances(found)
+
+
+    def test_multiple_starts_order(self, cache):
+        """ Lineages traced from more than one start are merged by depth. """
+        found = cached_walk(cache, SCOPE, _Neighbors(UPSTREAM_EDGES),
+                            ["doc:output", "doc:derived"], UPSTREAM_NAME,
+                            RELATIONS)
+        assert [1, 1, 2] == [result["depth"] for result in found]
+
+
+    def test_streamed(self, cache):
+        """ A lineage that's traced is produced as it's found, and cached
+        only once traced to its end. """
+        neighbors = _Neighbors(UPSTREAM_EDGES)
+        found = cached_walk(cache, SCOPE, neighbors, ["doc:output"],
+                            UPSTREAM_NAME, RELATIONS)
+        assert 0 == neighbors.hops
+        assert "is:activity" == next(found)[INSTANCE_KEY]
+        assert 1 == neighbors.hops
+        assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                             RELATIONS) is None
+        list(found)
+        assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                             RELATIONS) is not None
+
+
+    def test_bounded_miss(self, cache):
+        """ A lineage not cached is traced, and cached, only to the depth
+        asked for, serving later walks that go no deeper. """
+        neighbors = _Neighbors(UPSTREAM_EDGES)
+        found = list(cached_walk(cache, SCOPE, neighbors, ["doc:output"],
+                                 UPSTREAM_NAME, RELATIONS, max_depth=1))
+        assert {"is:activity": 1} == _instances(found)
+        assert 1 == neighbors.hops
+        assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                             RELATIONS, max_depth=1) is not None
+        for max_depth in [None, 2]:
+            assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                                 RELATIONS, max_depth=max_depth) is None
+
+
+    def test_deeper_replaces_bounded(self, cache):
+        """ A walk deeper than a lineage's bound traces it again. """
+        _cache_upstream(cache, max_depth=1)
+        assert {"is:activity": 1, "doc:input": 2, "doc:derived": 2,
+                "doc:raw": 3} == _instances(_cache_upstream(cache))
+        assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                             RELATIONS) is not None
+
+
+    def test_bounded_lineage_ends(self, cache):
+        """ A lineage that ends short of the depth asked for is complete. """
+        _cache_upstream(cache, start="doc:derived", max_depth=3)
+        assert [{INSTANCE_KEY: "doc:raw", "depth": 1, "from": "doc:derived",
+                 "relation": "wasGeneratedBy"}] == \
+            cache.lineage(SCOPE, "doc:derived", UPSTREAM_NAME, RELATIONS)
+
+
+    @pytest.mark.parametrize(
+            argnames=["scope", "direction", "relations"],
+            argvalues=[("other_edges", UPSTREAM_NAME, RELATIONS),
+                       (SCOPE, DOWNSTREAM_NAME, RELATIONS),
+                       (SCOPE, UPSTREAM_NAME, ("used", ))]
+    )
+    def test_distinct_keys(self, cache, scope, direction, relations):
+        """ Lineages are cached by scope, direction, and relationships. """
+        _cache_upstream(cache)
+        assert cache.lineage(scope, "doc:output", direction,
+                             relations) is None
+
+
+    def test_older_schema_emptied(self, tmpdir):
+        """ A database of an older schema is emptied rather than used. """
+        path = str(tmpdir.join("reachability.sqlite"))
+        connection = sqlite3.connect(path)
+        connection.executescript(
+                "CREATE TABLE lineages (id INTEGER PRIMARY KEY, scope TEXT, "
+                "node TEXT, direction TEXT, relations TEXT); "
+                "INSERT INTO lineages VALUES "
+                "(1, 'esprov-test_edges', 'doc:output', 'upstream', 'used');")
+        connection.close()
+        cache = ReachabilityCache(path)
+        try:
+            assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                                 ("used", )) is None
+            assert _cache_upstream(cache)
+        finally:
+            cache.close()
+
+
+    def test_invalid_depth(self, cache):
+        """ Depth limit must be positive. """
+        with pytest.raises(ValueError):
+            cached_walk(cache, SCOPE, _Neighbors(UPSTREAM_EDGES),
+                        ["doc:output"], UPSTREAM_NAME, RELATIONS,
+                        max_depth=0)
+
+
+
+class TestInvalidation:
+    """ Tests for dropping only the lineages that new edges extend. """
+
+
+    @pytest.fixture
+    def cached(self, cache):
+        """ Cache the upstream lineages of output and of input. """
+        _cache_upstream(cache)
+        _cache_upstream(cache, start="doc:input")
+        return cache
+
+
+    @pytest.mark.parametrize(
+            argnames="source",
+            argvalues=["doc:output", "doc:raw"],
+            ids=["start", "reached"]
+    )
+    def test_upstream_extended(self, cached, source):
+        """ An edge from an instance in a lineage invalidates it. """
+        edge = (source, "doc:new", "used")
+        assert 1 == cached.invalidate(SCOPE, [edge])
+        assert cached.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                              RELATIONS) is None
+        assert cached.lineage(SCOPE, "doc:input", UPSTREAM_NAME,
+                              RELATIONS) is not None
+
+
+    def test_edge_into_lineage(self, cached):
+        """ An edge to an instance extends only lineages downstream. """
+        assert 0 == cached.invalidate(SCOPE, [("doc:new", "doc:raw", "used")])
+        assert cached.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                              RELATIONS) is not None
+
+
+    def test_downstream_extended(self, cache):
+        """ A downstream lineage is invalidated by an edge to it. """
+        downstream = {neighbor: [(node, edge_type)]
+                      for node, edges in UPSTREAM_EDGES.items()
+                      for neighbor, edge_type in edges}
+        list(cached_walk(cache, SCOPE, _Neighbors(downstream), ["doc:raw"],
+                         DOWNSTREAM_NAME, RELATIONS))
+        assert 1 == cache.invalidate(
+                SCOPE, [("doc:new", "is:activity", "used")])
+
+
+    def test_other_relation(self, cached):
+        """ An edge of a type a lineage doesn't follow doesn't extend it. """
+        assert 0 == cached.invalidate(
+                SCOPE, [("doc:raw", "doc:new", "hadMember")])
+
+
+    def test_other_scope(self, cached):
+        """ An edge in other indices doesn't extend a lineage. """
+        assert 0 == cached.invalidate(
+                "other_edges", [("doc:raw", "doc:new", "used")])
+
+
+
+class TestForget:
+    """ Tests for dropping the lineages of removed edge indices. """
+
+
+    @pytest.mark.parametrize(
+            argnames=["scope", "forgotten"],
+            argvalues=[(SCOPE, True), ("*_edges", True),
+                       ("esprov-*_edges,-provda_edges", True),
+                       ("*_edges,-esprov-*", False), ("other_edges", False)]
+    )
+    def test_covering_scopes(self, cache, scope, forgotten):
+        """ Every scope that may include a removed index is dropped. """
+        list(cached_walk(cache, scope, _Neighbors(UPSTREAM_EDGES),
+                         ["doc:output"], UPSTREAM_NAME, RELATIONS))
+        cache.synced(scope, [], latest=10 ** 6, now=0)
+        assert (1 if forgotten else 0) == cache.forget([SCOPE])
+        assert forgotten == (cache.lineage(
+                scope, "doc:output", UPSTREAM_NAME, RELATIONS) is None)
+        assert forgotten == (cache.sync_due(scope, now=1) == (True, None))
+
+
+    def test_index_removal(self, tmpdir, monkeypatch):
+        """ Removing an index via the CLI drops lineages of its edges. """
+        monkeypatch.setenv(CACHE_DIR_VARNAME, str(tmpdir))
+        cache = reachability_cache()
+        try:
+            _cache_upstream(cache)
+        finally:
+            cache.close()
+        call_cli_func("index remove esprov-test", client=_Client())
+        cache = reachability_cache()
+        try:
+            assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                                 RELATIONS) is None
+        finally:
+            cache.close()
+
+
+    def test_no_cache(self, tmpdir, monkeypatch):
+        """ Without a cache, there's nothing to drop, nor to create. """
+        monkeypatch.setenv(CACHE_DIR_VARNAME, str(tmpdir))
+        assert 0 == forget_edge_indices([SCOPE])
+        assert [] == tmpdir.listdir()
+
+
+
+class TestSync:
+    """ Tests for the bookkeeping of checks for new edges. """
+
+
+    def test_first_sync(self, cache):
+        """ A first check marks the latest edge, and the next is throttled
+        until the interval passes, then reaches back by the margin. """
+        assert (True, None) == cache.sync_due(SCOPE, now=0)
+        cache.synced(SCOPE, [], latest=10 ** 6, now=0)
+        assert (False, None) == cache.sync_due(SCOPE, now=1)
+        assert (True, 10 ** 6 - cache.sync_margin) == \
+            cache.sync_due(SCOPE, now=cache.sync_interval)
+
+
+    def test_edges_applied_once(self, cache):
+        """ An edge seen by more than one check invalidates only once. """
+        cache.synced(SCOPE, [], latest=10 ** 6, now=0)
+        edge = ("edge-1", 10 ** 6 + 1, "doc:raw", "doc:new", "used")
+        _cache_upstream(cache)
+        assert 1 == cache.synced(SCOPE, [edge], now=60)
+        _cache_upstream(cache)
+        assert 0 == cache.synced(SCOPE, [edge], now=120)
+        assert cache.lineage(SCOPE, "doc:output", UPSTREAM_NAME,
+                             RELATIONS) is not None
+        assert (True, 10 ** 6 + 1 - cache.sync_margin) == \
+            cache.sync_due(SCOPE, now=180)
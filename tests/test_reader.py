@@ -0,0 +1,99 @@
+""" Tests for the memory-mapped JSON-lines reader. """
+
+import json
+
+import pytest
+
+from .data import *
+from esprov.reader import JsonLinesReader
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_reader"
+
+
+
+@pytest.fixture(scope="function")
+def logfile(tmpdir):
+    """
+    Write all test records to a JSON-lines file, with a blank line and no
+    trailing newline to exercise the edge cases.
+
+    :param py.path.local tmpdir: temporary directory for the test case
+    :return str: path to the JSON-lines file
+    """
+    lines = [json.dumps(record) for record in ALL_LOGS]
+    lines.insert(3, "")
+    path = tmpdir.join("records.log")
+    path.write("\n".join(lines))
+    return str(path)
+
+
+
+class TestJsonLinesReader:
+    """ Tests for zero-copy line access and lazy record decoding. """
+
+
+    def test_all_records(self, logfile):
+        """ Iteration decodes every record, skipping blank lines. """
+        with JsonLinesReader(logfile) as reader:
+            assert ALL_LOGS == list(reader)
+
+
+    def test_lines_are_memoryviews(self, logfile):
+        """ Lines are slices of the mapping rather than copies. """
+        with JsonLinesReader(logfile) as reader:
+            offset, line = next(reader.lines())
+            assert 0 == offset
+            assert isinstance(line, memoryview)
+            assert ALL_LOGS[0] == json.loads(line.tobytes().decode("utf-8"))
+            del line
+
+
+    @pytest.mark.parametrize(argnames="offset", argvalues=[1, 50, 1000])
+    def test_seek_aligns_to_line(self, logfile, offset):
+        """ Seeking mid-line resumes at the beginning of the next line. """
+        with JsonLinesReader(logfile) as reader:
+            starts = [start for start, _ in reader.lines(start=0)]
+            aligned = reader.seek(offset)
+            assert aligned == min(start for start in starts if start >= offset)
+            assert aligned == next(reader.lines())[0]
+
+
+    def test_adjacent_ranges_partition_records(self, logfile):
+        """ Each record falls in exactly one of a set of adjacent ranges. """
+        with JsonLinesReader(logfile) as reader:
+            cuts = [0, reader.size // 3, reader.size // 2, reader.size]
+            records = [record for start, end in zip(cuts, cuts[1:])
+                       for record in reader.records(start=start, end=end)]
+        assert ALL_LOGS == records
+
+
+    def test_resume_after_interruption(self, logfile):
+        """ Reader position tracks consumption so iteration can resume. """
+        with JsonLinesReader(logfile) as reader:
+            records = reader.records()
+            first = [next(records) for _ in range(5)]
+            rest = list(reader.records())
+        assert ALL_LOGS == first + rest
+
+
+    def test_empty_file(self, tmpdir):
+        """ An empty file has no lines and no records. """
+        path = tmpdir.join("empty.log")
+        path.write("")
+        with JsonLinesReader(str(path)) as reader:
+            assert 0 == reader.size
+            assert [] == list(reader)
+            assert 0 == reader.seek(10)
+
+
+    def test_close_unmaps(self, logfile):
+        """ Closing the reader closes its mapping, once lines are done. """
+        with JsonLinesReader(logfile) as reader:
+            list(reader)
+        assert reader._map.closed
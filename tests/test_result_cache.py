@@ -0,0 +1,166 @@
+""" Tests for the on-disk cache of CLI query results. """
+
+import argparse
+import os
+
+import pytest
+from elasticsearch_dsl import Search
+
+from .conftest import call_cli_func
+from .data import *
+from esprov import result_cache
+from esprov.provda_record import record_id
+from esprov.query import QuerySpec
+from esprov.result_cache import cached_result, query_key, ResultCache
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_result_cache"
+
+
+GENERATION = [10, 1478390400000.0]
+
+
+
+@pytest.fixture(scope="function")
+def cache(tmpdir):
+    """
+    Provide an empty cache in a temporary folder.
+
+    :param py.path.local tmpdir: temporary directory for the test case
+    :return esprov.result_cache.ResultCache: empty cache
+    """
+    return ResultCache(str(tmpdir.join("cache")))
+
+
+
+class TestResultCache:
+    """ Tests for storage, validity and eviction of cache entries. """
+
+
+    def test_roundtrip(self, cache):
+        """ An entry is served for the generation with which it's stored. """
+        cache.put("key", GENERATION, [{"a": 1}, "b"])
+        assert (True, [{"a": 1}, "b"]) == cache.get("key", GENERATION)
+
+
+    def test_new_generation_invalidates(self, cache):
+        """ An entry isn't served once the indices have changed. """
+        cache.put("key", GENERATION, 3)
+        assert (False, None) == cache.get("key", [11, GENERATION[1]])
+
+
+    def test_miss(self, cache):
+        """ A key never stored isn't served. """
+        assert (False, None) == cache.get("key", GENERATION)
+
+
+    def test_oversized_not_stored(self, tmpdir):
+        """ A value larger than the cache itself isn't stored. """
+        cache = ResultCache(str(tmpdir), max_bytes=10)
+        cache.put("key", GENERATION, ["x" * 100])
+        assert (False, None) == cache.get("key", GENERATION)
+
+
+    def test_least_recently_used_evicted(self, tmpdir):
+        """ Entries used least recently are evicted to stay within bound. """
+        entry_size = len('{"generation": [10, 1478390400000.0], "value": 0}')
+        cache = ResultCache(str(tmpdir), max_bytes=2 * entry_size)
+        cache.put("first", GENERATION, 0)
+        cache.put("second", GENERATION, 0)
+        # Make "second" the older entry, then use "first".
+        os.utime(str(tmpdir.join("second.json")), (0, 0))
+        os.utime(str(tmpdir.join("first.json")), (1, 1))
+        assert cache.get("first", GENERATION)[0]
+        cache.put("third", GENERATION, 0)
+        assert cache.get("first", GENERATION)[0]
+        assert not cache.get("second", GENERATION)[0]
+        assert cache.get("third", GENERATION)[0]
+
+
+
+class TestCachedResult:
+    """ Tests for serving query results through the cache. """
+
+
+    @staticmethod
+    def _search(since=None):
+        return QuerySpec(doctypes="activity", since=since).apply(
+                Search(index="provda"))
+
+
+    def test_key_follows_options(self):
+        """ Options that shape the result distinguish keys. """
+        search = self._search()
+        assert query_key(search, argparse.Namespace(count=False)) != \
+            query_key(search, argparse.Namespace(count=True))
+        assert query_key(search, argparse.Namespace(count=True)) == \
+            query_key(search, argparse.Namespace(count=True, cache=True))
+
+
+    def test_relative_time_keyed_by_period(self, monkeypatch):
+        """ A query relative to now means something new each period. """
+        search = self._search(since="now-1d")
+        args = argparse.Namespace()
+        monkeypatch.setattr(result_cache.time, "time", lambda: 60.0)
+        first = query_key(search, args)
+        monkeypatch.setattr(result_cache.time, "time", lambda: 119.0)
+        assert first == query_key(search, args)
+        monkeypatch.setattr(result_cache.time, "time", lambda: 120.0)
+        assert first != query_key(search, args)
+
+
+    def test_served_until_generation_changes(self, cache, monkeypatch):
+        """ The query is run again only once the indices change. """
+        generations = [GENERATION]
+        monkeypatch.setattr(result_cache, "index_generation",
+                            lambda search: generations[-1])
+        calls = []
+
+        def produce():
+            calls.append(None)
+            return iter(["stage-a", "stage-b"])
+
+        search, args = self._search(), argparse.Namespace()
+        for _ in range(2):
+            assert ["stage-a", "stage-b"] == \
+                list(cached_result(search, args, produce, cache=cache))
+        assert 1 == len(calls)
+        generations.append([11, GENERATION[1]])
+        list(cached_result(search, args, produce, cache=cache))
+        assert 2 == len(calls)
+
+
+    def test_partial_consumption_not_cached(self, cache, monkeypatch):
+        """ Hits are cached only once they've all been produced. """
+        monkeypatch.setattr(result_cache, "index_generation",
+                            lambda search: GENERATION)
+        search, args = self._search(), argparse.Namespace()
+        hits = cached_result(search, args, lambda: iter(["a", "b"]),
+                             cache=cache)
+        next(hits)
+        assert (False, None) == cache.get(query_key(search, args), GENERATION)
+
+
+
+class TestCachedFetch:
+    """ Tests for fetches served from the cache. """
+
+
+    def test_fetch(self, es_client, load_index, tmpdir, monkeypatch):
+        """ Cached fetch matches uncached, and follows new records. """
+        monkeypatch.setenv(result_cache.CACHE_DIR_VARNAME,
+                           str(tmpdir.join("cache")))
+        half = len(ALL_LOGS) // 2
+        index = load_index("cache", records=ALL_LOGS[:half])
+        command = "fetch -i {} -n 100 --cache".format(index)
+        first = list(call_cli_func(command, client=es_client))
+        assert first == list(call_cli_func(command, client=es_client))
+        load_index("cache", records=ALL_LOGS[half:])
+        observed = list(call_cli_func(command, client=es_client))
+        assert {record_id(record) for record in ALL_LOGS} == \
+            {record_id(record) for record in observed}
@@ -0,0 +1,101 @@
+""" Tests for the durable spool of records awaiting storage. """
+
+import os
+
+import pytest
+
+from .data import *
+from esprov.spool import Spool
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_spool"
+
+
+
+def replay_all(spool, limit=5):
+    """
+    Replay and acknowledge every committed record in a spool.
+
+    :param esprov.spool.Spool spool: spool to drain
+    :param int limit: number of records per replayed batch
+    :return list[dict]: records replayed, in order
+    """
+    replayed = []
+    while True:
+        records, position = spool.replay(limit)
+        if not records:
+            return replayed
+        replayed.extend(records)
+        spool.acknowledge(position)
+
+
+
+class TestSpool:
+    """ Tests for durable appends and ordered, checkpointed replay. """
+
+
+    def test_uncommitted_not_replayed(self, tmpdir):
+        """ Only committed records are available to replay. """
+        with Spool(str(tmpdir)) as spool:
+            spool.append(ALL_LOGS[:3])
+            assert ([], spool.checkpoint) == spool.replay(10)
+            spool.commit()
+            assert ALL_LOGS[:3] == spool.replay(10)[0]
+
+
+    @pytest.mark.parametrize(argnames="segment_bytes",
+                             argvalues=[1, 2048, 1024 * 1024])
+    @pytest.mark.parametrize(argnames="limit", argvalues=[1, 4, 100])
+    def test_replay_in_order(self, tmpdir, segment_bytes, limit):
+        """ Replay yields records in append order, across segments. """
+        with Spool(str(tmpdir), segment_bytes=segment_bytes) as spool:
+            for start in range(0, len(ALL_LOGS), 7):
+                spool.append(ALL_LOGS[start:(start + 7)])
+                spool.commit()
+            assert ALL_LOGS == replay_all(spool, limit)
+
+
+    def test_replayed_segments_removed(self, tmpdir):
+        """ Acknowledged segments are deleted; the newest one remains. """
+        with Spool(str(tmpdir), segment_bytes=1) as spool:
+            spool.append(ALL_LOGS)
+            spool.commit()
+            replay_all(spool)
+        segments = [name for name in os.listdir(str(tmpdir))
+                    if name.startswith("segment-")]
+        assert 1 == len(segments)
+
+
+    def test_restart_resumes_after_checkpoint(self, tmpdir):
+        """ Acknowledged records aren't replayed again after a restart. """
+        with Spool(str(tmpdir), segment_bytes=2048) as spool:
+            spool.append(ALL_LOGS)
+            spool.commit()
+            records, position = spool.replay(10)
+            spool.acknowledge(position)
+            # Replayed but unacknowledged; these must come back.
+            spool.replay(10)
+        with Spool(str(tmpdir), segment_bytes=2048) as spool:
+            assert ALL_LOGS[10:] == replay_all(spool)
+            spool.append(ALL_LOGS[:2])
+            spool.commit()
+            assert ALL_LOGS[:2] == replay_all(spool)
+
+
+    def test_partial_record_discarded(self, tmpdir):
+        """ A record torn by a crash mid-write is dropped on reopening. """
+        with Spool(str(tmpdir)) as spool:
+            spool.append(ALL_LOGS[:2])
+        segment, = [name for name in os.listdir(str(tmpdir))
+                    if name.startswith("segment-")]
+        with open(os.path.join(str(tmpdir), segment), 'ab') as segment_file:
+            segment_file.write(b'{"prov": "act')
+        with Spool(str(tmpdir)) as spool:
+            spool.append(ALL_LOGS[2:3])
+            spool.commit()
+            assert ALL_LOGS[:3] == replay_all(spool)
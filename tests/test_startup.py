@@ -0,0 +1,96 @@
+""" Tests guarding the time that the CLI takes to start up. """
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+
+__author__ = "Vince Reuter"
+__modified__ = "2026-10-18"
+__credits__ = ["Vince Reuter"]
+__maintainer__ = "Vince Reuter"
+__email__ = "vr24@uw.edu"
+__modname__ = "esprov.tests.test_startup"
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only a command that's actually run should need
+HEAVY_MODULES = ("elasticsearch", "elasticsearch_dsl", "esprov.functions")
+
+# Seconds beyond bare interpreter startup allowed for --help
+HELP_OVERHEAD_LIMIT = 0.5
+
+
+
+def _run(code):
+    """
+    Run Python code in a fresh interpreter.
+
+    :param str code: code to run
+    :return (int, str, float): exit status, standard output, and seconds
+        that the interpreter took to run
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT,
+               ESPROV_SOCKET=os.path.join(REPO_ROOT, "no-such.sock"))
+    start = time.time()
+    process = subprocess.Popen([sys.executable, "-c", code],
+                               cwd=REPO_ROOT, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    return process.returncode, out.decode("utf-8"), time.time() - start
+
+
+
+def _loaded_modules(code):
+    returncode, out, _ = _run(
+            "import json, sys\n{}\nprint(json.dumps(sorted(sys.modules)))"
+            .format(code))
+    assert 0 == returncode
+    return set(json.loads(out.strip().splitlines()[-1]))
+
+
+
+class TestStartup:
+    """ Tests for what's imported, and how long it takes, to start up. """
+
+
+    @pytest.mark.parametrize(
+            argnames="code",
+            argvalues=[
+                "import esprov",
+                "from bin import cli\ncli.CLIFactory.get_parser()",
+                "from bin import cli\n"
+                "try:\n    cli.main(['fetch', '--bogus'])\n"
+                "except SystemExit:\n    pass",
+                "from bin import cli\n"
+                "try:\n    cli.main(['--help'])\n"
+                "except SystemExit:\n    pass"
+            ]
+    )
+    def test_no_heavy_imports(self, code):
+        """ Parsing, help, and argument errors needn't import ES. """
+        assert not _loaded_modules(code) & set(HEAVY_MODULES)
+
+
+    def test_import_leaves_logging_alone(self):
+        """ Importing the package doesn't configure logging. """
+        returncode, out, _ = _run(
+                "import logging, esprov\n"
+                "print(len(logging.getLogger('esprov').handlers))")
+        assert 0 == returncode
+        assert "0" == out.strip()
+
+
+    def test_help_time(self):
+        """ Help costs little more than starting the interpreter. """
+        _, _, bare = _run("pass")
+        returncode, out, elapsed = _run(
+                "import sys\nfrom bin import cli\nsys.exit(cli.main(['-h']))")
+        assert 0 == returncode
+        assert "fetch" in out
+        assert elapsed - bare < HELP_OVERHEAD_LIMIT